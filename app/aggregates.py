@@ -0,0 +1,226 @@
+"""Resumo de uma métrica por modelo e janela de tempo, agregado no banco.
+
+count/mean/min/max vêm de um GROUP BY. Percentis: no Postgres,
+percentile_cont; nos demais bancos, um histograma de _HIST_BINS faixas por
+grupo também é calculado no banco (GROUP BY da faixa), e o percentil é
+interpolado dentro da faixa. Só volta ao Python uma linha por grupo (e por faixa).
+"""
+
+import math
+from datetime import datetime
+from typing import Dict, List, Mapping, Tuple
+
+from sqlalchemy import Integer, and_, case, cast, func, select
+from sqlalchemy.orm import Session
+
+from . import partitioning, rollups
+from .config import Settings
+from .export import parse_time
+from .services import BadRequest
+
+settings = Settings()
+
+BUCKETS = ("minute", "hour", "day")
+
+_SQLITE_FORMATS = {
+    "minute": "%Y-%m-%dT%H:%M:00",
+    "hour": "%Y-%m-%dT%H:00:00",
+    "day": "%Y-%m-%d",
+}
+
+_HIST_BINS = 100
+
+
+class SummaryRequest:
+    def __init__(self, args: Mapping):
+        self.name = args.get("name")
+        if not self.name:
+            raise BadRequest("name is required")
+        self.bucket = args.get("bucket", "hour")
+        if self.bucket not in BUCKETS:
+            raise BadRequest("bucket must be one of %s" % ", ".join(BUCKETS))
+        self.model_id = None
+        if args.get("model_id"):
+            try:
+                self.model_id = int(args["model_id"])
+            except ValueError:
+                raise BadRequest("model_id must be integer")
+        self.start = parse_time(args, "start")
+        self.end = parse_time(args, "end")
+        raw = args.get("percentiles", "0.5,0.9,0.99")
+        try:
+            self.percentiles = [float(q) for q in raw.split(",") if q]
+        except ValueError:
+            raise BadRequest("percentiles must be numbers between 0 and 1")
+        if any(not 0.0 <= q <= 1.0 for q in self.percentiles):
+            raise BadRequest("percentiles must be numbers between 0 and 1")
+
+    def bucket_expr(self, dialect: str, created_at):
+        if dialect == "postgresql":
+            return func.date_trunc(self.bucket, created_at)
+        if dialect == "sqlite":
+            return func.strftime(_SQLITE_FORMATS[self.bucket], created_at)
+        raise BadRequest("metrics summary is not supported on %s" % dialect, 501)
+
+    def base(self, dialect: str):
+        """Linhas (model_id, bucket, value) da métrica, já filtradas."""
+        p, m = partitioning.read_tables()
+        stmt = (
+            select(
+                p.c.model_id.label("model_id"),
+                self.bucket_expr(dialect, p.c.created_at).label("bucket"),
+                m.c.value.label("value"),
+            )
+            .select_from(m.join(p, partitioning.metric_join(p, m)))
+            .where(m.c.name == self.name)
+        )
+        if self.model_id is not None:
+            stmt = stmt.where(p.c.model_id == self.model_id)
+        # No Postgres particionado o filtro em m.created_at poda as partições
+        times = [p.c.created_at]
+        if partitioning.backend() == "postgresql":
+            times.append(m.c.created_at)
+        for created_at in times:
+            if self.start is not None:
+                stmt = stmt.where(created_at >= self.start)
+            if self.end is not None:
+                stmt = stmt.where(created_at < self.end)
+        return stmt.subquery("base")
+
+    def stats_statement(self, dialect: str):
+        base = self.base(dialect)
+        columns = [
+            base.c.model_id,
+            base.c.bucket,
+            func.count().label("count"),
+            func.avg(base.c.value).label("mean"),
+            func.avg(base.c.value * base.c.value).label("mean_sq"),
+            func.min(base.c.value).label("min"),
+            func.max(base.c.value).label("max"),
+        ]
+        if dialect == "postgresql":
+            columns += [
+                func.percentile_cont(q).within_group(base.c.value).label("p%d" % i)
+                for i, q in enumerate(self.percentiles)
+            ]
+        return (
+            select(*columns)
+            .group_by(base.c.model_id, base.c.bucket)
+            .order_by(base.c.model_id, base.c.bucket)
+        )
+
+    def histogram_statement(self, dialect: str):
+        base = self.base(dialect)
+        stats = (
+            select(
+                base.c.model_id,
+                base.c.bucket,
+                func.min(base.c.value).label("lo"),
+                func.max(base.c.value).label("hi"),
+            )
+            .group_by(base.c.model_id, base.c.bucket)
+            .subquery("stats")
+        )
+        width = stats.c.hi - stats.c.lo
+        scaled = cast((base.c.value - stats.c.lo) * _HIST_BINS / width, Integer)
+        bin_expr = case(
+            (stats.c.hi == stats.c.lo, 0),
+            (scaled >= _HIST_BINS, _HIST_BINS - 1),
+            else_=scaled,
+        ).label("bin")
+        return (
+            select(base.c.model_id, base.c.bucket, bin_expr, func.count().label("n"))
+            .select_from(
+                base.join(
+                    stats,
+                    and_(
+                        base.c.model_id == stats.c.model_id,
+                        base.c.bucket == stats.c.bucket,
+                    ),
+                )
+            )
+            .group_by(base.c.model_id, base.c.bucket, bin_expr)
+        )
+
+
+def _percentile_from_histogram(
+    bins: Dict[int, int], count: int, lo: float, hi: float, q: float
+) -> float:
+    if hi == lo:
+        return lo
+    width = (hi - lo) / _HIST_BINS
+    target = q * count
+    seen = 0
+    for b in sorted(bins):
+        n = bins[b]
+        if seen + n >= target:
+            frac = (target - seen) / n if n else 0.0
+            return min(max(lo + (b + frac) * width, lo), hi)
+        seen += n
+    return hi
+
+
+def _bucket_label(value) -> str:
+    return value.isoformat() if isinstance(value, datetime) else str(value)
+
+
+def _summarize_rollups(session: Session, req: SummaryRequest) -> Dict:
+    # Rollups são por hora; para "day" as horas do dia são mescladas
+    fmt = "%Y-%m-%dT%H:00:00" if req.bucket == "hour" else "%Y-%m-%d"
+    groups: Dict[Tuple, List] = {}
+    for row in rollups.read(session, req.name, req.model_id, req.start, req.end):
+        key = (row.model_id, row.bucket_start.strftime(fmt))
+        groups.setdefault(key, []).append(row)
+    series = [
+        {
+            "model_id": model_id,
+            "bucket": bucket,
+            **rollups.summarize_rows(rows, req.percentiles),
+        }
+        for (model_id, bucket), rows in groups.items()
+    ]
+    return {
+        "name": req.name,
+        "bucket": req.bucket,
+        "source": "rollup",
+        "series": series,
+    }
+
+
+def summarize(session: Session, req: SummaryRequest) -> Dict:
+    if settings.rollups_enabled and req.bucket != "minute":
+        return _summarize_rollups(session, req)
+    dialect = session.get_bind().dialect.name
+    rows = session.execute(req.stats_statement(dialect)).all()
+
+    histograms: Dict[Tuple, Dict[int, int]] = {}
+    if dialect != "postgresql" and rows and req.percentiles:
+        hist = session.execute(req.histogram_statement(dialect))
+        for model_id, bucket, b, n in hist:
+            histograms.setdefault((model_id, bucket), {})[int(b)] = n
+
+    series: List[Dict] = []
+    for row in rows:
+        item = {
+            "model_id": row.model_id,
+            "bucket": _bucket_label(row.bucket),
+            "count": row.count,
+            "mean": float(row.mean),
+            "std": math.sqrt(max(float(row.mean_sq) - float(row.mean) ** 2, 0.0)),
+            "min": float(row.min),
+            "max": float(row.max),
+        }
+        for i, q in enumerate(req.percentiles):
+            if dialect == "postgresql":
+                value = float(getattr(row, "p%d" % i))
+            else:
+                value = _percentile_from_histogram(
+                    histograms.get((row.model_id, row.bucket), {}),
+                    row.count,
+                    float(row.min),
+                    float(row.max),
+                    q,
+                )
+            item["p%g" % (q * 100)] = value
+        series.append(item)
+    return {"name": req.name, "bucket": req.bucket, "source": "raw", "series": series}
@@ -0,0 +1,251 @@
+"""Variante ASGI (Starlette) da API, com os mesmos endpoints de routes.py.
+
+O acesso ao banco usa o engine async do SQLAlchemy, então uma requisição
+esperando o banco não ocupa uma thread. A pontuação (CPU) e o treino rodam em
+um pool de threads limitado: no máximo ASGI_SCORING_MAX_PENDING tarefas ficam
+em andamento ou na fila; as demais esperam no event loop.
+"""
+
+import asyncio
+import contextlib
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+from . import aggregates, export, httpcache, queries, retention, services
+from .config import Settings
+from .db import async_url_for, get_async_engine
+from .ml.registry import ActiveModel, active_model
+from .persistence import write_behind
+from .schemas import PredictRequest, PredictResponse
+from .services import BadRequest
+
+settings = Settings()
+
+
+class BoundedExecutor:
+    """ThreadPoolExecutor com limite de tarefas pendentes."""
+
+    def __init__(self, max_workers: int, max_pending: int):
+        self.max_workers = max(1, int(max_workers))
+        self.max_pending = max(self.max_workers, int(max_pending))
+        self._pool = None
+        self._semaphore = None
+
+    async def run(self, fn: Callable, *args, **kwargs):
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="asgi-scoring"
+            )
+            self._semaphore = asyncio.Semaphore(self.max_pending)
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self._pool, functools.partial(fn, *args, **kwargs)
+            )
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+            self._semaphore = None
+
+
+def create_asgi_app() -> Starlette:
+    db_url = settings.async_db_url or async_url_for(settings.db_url)
+    engine = get_async_engine(db_url)
+    SessionFactory = async_sessionmaker(engine, expire_on_commit=False)
+    executor = BoundedExecutor(
+        settings.asgi_scoring_threads, settings.asgi_scoring_max_pending
+    )
+
+    async def resolve(session: AsyncSession) -> ActiveModel:
+        return await session.run_sync(active_model.resolve, settings.model_flavor)
+
+    async def persist(
+        session: AsyncSession, pred_rows: List[Dict], metric_rows: List[Dict]
+    ) -> None:
+        if settings.write_behind_enabled:
+            # submit pode bloquear (política block): fora do event loop
+            await executor.run(write_behind.submit, pred_rows, metric_rows)
+        elif await session.run_sync(services.persist, pred_rows, metric_rows):
+            await session.commit()
+
+    async def health(request: Request):
+        return JSONResponse({"status": "ok", "env": settings.app_env})
+
+    async def stats(request: Request):
+        return JSONResponse(services.stats())
+
+    async def predict(request: Request):
+        payload = await request.json() or {}
+        y_true = payload.get("y_true")
+        data = PredictRequest(**{k: v for k, v in payload.items() if k == "features"})
+
+        async with SessionFactory() as session:
+            active = await resolve(session)
+            result = await executor.run(
+                services.score_one, active, data.features, y_true
+            )
+            pred_id, pred_rows, metric_rows = services.prediction_rows(
+                active, data.features, result
+            )
+            await persist(session, pred_rows, metric_rows)
+
+        resp = PredictResponse(
+            prediction_id=pred_id,
+            prediction=result.prediction,
+            model_id=active.id,
+            metrics=[
+                {"name": k, "value": float(v)} for k, v in result.metrics.items()
+            ],
+            cached=result.cached_id is not None,
+        )
+        return JSONResponse(resp.model_dump())
+
+    async def predict_batch(request: Request):
+        payload = await request.json() or {}
+        batch = services.parse_batch(payload)
+        async with SessionFactory() as session:
+            active = await resolve(session)
+            pred_rows, metric_rows, resp = await executor.run(
+                services.score_batch, active, batch
+            )
+            await persist(session, pred_rows, metric_rows)
+        return JSONResponse(resp.model_dump(exclude_none=True))
+
+    def listing(build_query: Callable, to_dict: Callable, table: Optional[str] = None):
+        # Com table: ETag/Last-Modified pelo contador da tabela (ver httpcache)
+        async def handler(request: Request):
+            query = build_query(request.query_params)
+            async with SessionFactory() as session:
+                if table is None:
+                    result = await session.execute(query.stmt)
+                    rows, cursor = query.page(result.scalars())
+                    headers = {queries.NEXT_CURSOR_HEADER: cursor} if cursor else None
+                    return JSONResponse([to_dict(r) for r in rows], headers=headers)
+
+                def render(sync_session):
+                    result = sync_session.execute(query.stmt)
+                    rows, cursor = query.page(result.scalars())
+                    return JSONResponse([to_dict(r) for r in rows]).body, cursor
+
+                status, body, cursor, headers = await session.run_sync(
+                    httpcache.respond,
+                    table,
+                    request.query_params,
+                    request.headers,
+                    render,
+                )
+            if cursor:
+                headers[queries.NEXT_CURSOR_HEADER] = cursor
+            media_type = "application/json" if body is not None else None
+            return Response(
+                body, status_code=status, headers=headers, media_type=media_type
+            )
+
+        return handler
+
+    async def metrics_summary(request: Request):
+        req = aggregates.SummaryRequest(request.query_params)
+        async with SessionFactory() as session:
+            summary = await session.run_sync(aggregates.summarize, req)
+        return JSONResponse(summary)
+
+    async def export_predictions(request: Request):
+        req = export.ExportRequest(request.query_params)
+        return StreamingResponse(
+            export.astream_export(engine, req),
+            media_type=req.media_type,
+            headers=export.content_disposition(req),
+        )
+
+    async def delete_record(request: Request):
+        table = request.path_params["table"]
+        item_id = request.path_params["item_id"]
+        async with SessionFactory() as session:
+            deleted = await session.run_sync(services.delete_record, table, item_id)
+        return JSONResponse({"deleted": deleted})
+
+    async def switch_model(request: Request):
+        body = await request.json() or {}
+        new_flavor = body.get("flavor")
+        if new_flavor not in {"sklearn"}:
+            return JSONResponse({"error": "flavor must be sklearn"}, status_code=400)
+        async with SessionFactory() as session:
+            result = await session.run_sync(services.switch_model, new_flavor)
+            return JSONResponse(result)
+
+    async def train(request: Request):
+        result = await executor.run(services.run_training_kedro, settings.model_flavor)
+        async with SessionFactory() as session:
+            body = await session.run_sync(services.register_training, result)
+            return JSONResponse(body)
+
+    async def admin_purge(request: Request):
+        services.check_admin(request.headers.get("X-Admin-Token"))
+        try:
+            payload = await request.json()
+        except ValueError:
+            payload = None
+        return JSONResponse(retention.start_purge(payload or {}), status_code=202)
+
+    async def admin_purge_status(request: Request):
+        services.check_admin(request.headers.get("X-Admin-Token"))
+        return JSONResponse(retention.purge_status(request.path_params["job_id"]))
+
+    async def bad_request(request: Request, exc: BadRequest):
+        return JSONResponse({"error": exc.error}, status_code=exc.status)
+
+    routes = [
+        Route("/health", health, methods=["GET"]),
+        Route("/stats", stats, methods=["GET"]),
+        Route("/predict", predict, methods=["POST"]),
+        Route("/predict/batch", predict_batch, methods=["POST"]),
+        Route(
+            "/predictions",
+            listing(queries.predictions_query, queries.prediction_to_dict),
+            methods=["GET"],
+        ),
+        Route(
+            "/metrics",
+            listing(queries.metrics_query, queries.metric_to_dict),
+            methods=["GET"],
+        ),
+        Route("/metrics/summary", metrics_summary, methods=["GET"]),
+        Route(
+            "/models",
+            listing(queries.models_query, queries.model_to_dict, "models"),
+            methods=["GET"],
+        ),
+        Route(
+            "/retrainings",
+            listing(
+                queries.retrainings_query, queries.retraining_to_dict, "retrainings"
+            ),
+            methods=["GET"],
+        ),
+        Route("/export/predictions", export_predictions, methods=["GET"]),
+        Route("/records/{table}/{item_id}", delete_record, methods=["DELETE"]),
+        Route("/admin/purge", admin_purge, methods=["POST"]),
+        Route("/admin/purge/{job_id}", admin_purge_status, methods=["GET"]),
+        Route("/switch-model", switch_model, methods=["POST"]),
+        Route("/train", train, methods=["POST"]),
+    ]
+
+    @contextlib.asynccontextmanager
+    async def lifespan(app: Starlette):
+        yield
+        executor.shutdown()
+
+    return Starlette(
+        routes=routes,
+        exception_handlers={BadRequest: bad_request},
+        lifespan=lifespan,
+    )
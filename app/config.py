@@ -13,6 +13,136 @@ class Settings(BaseSettings):
         default="", validation_alias="AWS_SECRET_ACCESS_KEY"
     )
     model_flavor: str = Field(default="sklearn", validation_alias="MODEL_FLAVOR")
+    db_pool_size: int = Field(default=5, validation_alias="DB_POOL_SIZE")
+    db_max_overflow: int = Field(default=10, validation_alias="DB_MAX_OVERFLOW")
+    db_pool_timeout_s: float = Field(default=30.0, validation_alias="DB_POOL_TIMEOUT_S")
+    db_pool_pre_ping: bool = Field(default=True, validation_alias="DB_POOL_PRE_PING")
+    db_pool_recycle_s: int = Field(default=1800, validation_alias="DB_POOL_RECYCLE_S")
+    sqlite_journal_mode: str = Field(
+        default="WAL", validation_alias="SQLITE_JOURNAL_MODE"
+    )
+    sqlite_synchronous: str = Field(
+        default="NORMAL", validation_alias="SQLITE_SYNCHRONOUS"
+    )
+    sqlite_busy_timeout_ms: int = Field(
+        default=5000, validation_alias="SQLITE_BUSY_TIMEOUT_MS"
+    )
+    sqlite_mmap_size: int = Field(
+        default=268435456, validation_alias="SQLITE_MMAP_SIZE"
+    )  # bytes
+    sqlite_cache_size: int = Field(
+        default=-65536, validation_alias="SQLITE_CACHE_SIZE"
+    )  # negativo = KiB (64 MiB)
+    sqlite_temp_store: str = Field(
+        default="MEMORY", validation_alias="SQLITE_TEMP_STORE"
+    )
+    model_cache_size: int = Field(default=4, validation_alias="MODEL_CACHE_SIZE")
+    model_mmap_mode: str = Field(default="r", validation_alias="MODEL_MMAP_MODE")
+    prediction_cache_enabled: bool = Field(
+        default=False, validation_alias="PREDICTION_CACHE_ENABLED"
+    )
+    prediction_cache_max_entries: int = Field(
+        default=100000, validation_alias="PREDICTION_CACHE_MAX_ENTRIES"
+    )
+    prediction_cache_ttl_s: float = Field(
+        default=300.0, validation_alias="PREDICTION_CACHE_TTL_S"
+    )  # 0 = sem expiração
+    prediction_cache_max_bytes: int = Field(
+        default=33554432, validation_alias="PREDICTION_CACHE_MAX_BYTES"
+    )  # orçamento aproximado de memória (0 = sem limite)
+    prediction_cache_persist_hits: bool = Field(
+        default=True, validation_alias="PREDICTION_CACHE_PERSIST_HITS"
+    )  # false: acerto no cache só retorna o valor, sem gravar Prediction
+    predict_batch_max_rows: int = Field(
+        default=10000, validation_alias="PREDICT_BATCH_MAX_ROWS"
+    )
+    microbatch_enabled: bool = Field(
+        default=False, validation_alias="MICROBATCH_ENABLED"
+    )
+    microbatch_max_batch_size: int = Field(
+        default=32, validation_alias="MICROBATCH_MAX_BATCH_SIZE"
+    )
+    microbatch_max_wait_us: int = Field(
+        default=2000, validation_alias="MICROBATCH_MAX_WAIT_US"
+    )
+    write_behind_enabled: bool = Field(
+        default=False, validation_alias="WRITE_BEHIND_ENABLED"
+    )
+    write_behind_queue_size: int = Field(
+        default=10000, validation_alias="WRITE_BEHIND_QUEUE_SIZE"
+    )
+    write_behind_batch_size: int = Field(
+        default=500, validation_alias="WRITE_BEHIND_BATCH_SIZE"
+    )
+    write_behind_policy: str = Field(
+        default="block", validation_alias="WRITE_BEHIND_POLICY"
+    )  # drop | block | spill
+    write_behind_spill_path: str = Field(
+        default="./write_behind_spill.jsonl", validation_alias="WRITE_BEHIND_SPILL_PATH"
+    )
+    write_behind_flush_timeout_s: float = Field(
+        default=10.0, validation_alias="WRITE_BEHIND_FLUSH_TIMEOUT_S"
+    )
+    prediction_id_format: str = Field(
+        default="uuid4", validation_alias="PREDICTION_ID_FORMAT"
+    )  # uuid4 | uuid7 (ordenado pelo tempo)
+    export_yield_per: int = Field(
+        default=1000, validation_alias="EXPORT_YIELD_PER"
+    )  # linhas lidas por vez do cursor em /export/predictions
+    active_model_check_interval_ms: int = Field(
+        default=1000, validation_alias="ACTIVE_MODEL_CHECK_INTERVAL_MS"
+    )
+    async_db_url: str = Field(
+        default="", validation_alias="ASYNC_DB_URL"
+    )  # vazio = derivada de DB_URL (aiosqlite / asyncpg)
+    rollups_enabled: bool = Field(
+        default=False, validation_alias="ROLLUPS_ENABLED"
+    )  # mantém metric_rollups a cada INSERT de métricas
+    response_cache_enabled: bool = Field(
+        default=False, validation_alias="RESPONSE_CACHE_ENABLED"
+    )  # cache em memória das respostas de /models e /retrainings
+    response_cache_max_entries: int = Field(
+        default=512, validation_alias="RESPONSE_CACHE_MAX_ENTRIES"
+    )
+    retention_days: int = Field(
+        default=0, validation_alias="RETENTION_DAYS"
+    )  # padrão do purge; 0 = exige days explícito
+    retention_chunk_size: int = Field(
+        default=1000, validation_alias="RETENTION_CHUNK_SIZE"
+    )
+    retention_pause_ms: int = Field(
+        default=50, validation_alias="RETENTION_PAUSE_MS"
+    )  # pausa entre blocos, para não segurar o lock de escrita
+    retention_archive_dir: str = Field(
+        default="", validation_alias="RETENTION_ARCHIVE_DIR"
+    )  # vazio = só apaga; senão grava NDJSON antes de apagar
+    feature_storage: str = Field(
+        default="json", validation_alias="FEATURE_STORAGE"
+    )  # json | float32 | float64 (features empacotadas, ver app.features)
+    partitioning_enabled: bool = Field(
+        default=False, validation_alias="PARTITIONING_ENABLED"
+    )  # predictions/prediction_metrics particionadas por mês (app.partitioning)
+    partition_months_ahead: int = Field(
+        default=2, validation_alias="PARTITION_MONTHS_AHEAD"
+    )  # Postgres: partições criadas à frente do mês corrente
+    sqlite_partition_dir: str = Field(
+        default="./partitions", validation_alias="SQLITE_PARTITION_DIR"
+    )
+    sqlite_partition_attach_months: int = Field(
+        default=6, validation_alias="SQLITE_PARTITION_ATTACH_MONTHS"
+    )  # meses anexados por conexão (o SQLite aceita até 10 ATTACH por padrão)
+    admin_token: str = Field(
+        default="", validation_alias="ADMIN_TOKEN"
+    )  # exigido no header X-Admin-Token de /admin/* (vazio: /admin/* responde 403)
+    asgi_scoring_threads: int = Field(
+        default=4, validation_alias="ASGI_SCORING_THREADS"
+    )
+    asgi_scoring_max_pending: int = Field(
+        default=64, validation_alias="ASGI_SCORING_MAX_PENDING"
+    )
+    server_workers: int = Field(
+        default=1, validation_alias="SERVER_WORKERS"
+    )  # definido por serve/run-asgi; /admin/purge só roda com um worker
 
     class Config:
         env_file = ".env"
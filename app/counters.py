@@ -0,0 +1,43 @@
+from datetime import datetime
+from typing import Optional, Tuple
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from .models import ChangeCounter
+
+ACTIVE_MODEL = "active_model"
+# Um contador por tabela listada com GET condicional (httpcache)
+MODELS = "models"
+RETRAININGS = "retrainings"
+
+
+def read_counter(session: Session, name: str) -> int:
+    value = session.execute(
+        select(ChangeCounter.value).where(ChangeCounter.name == name)
+    ).scalar()
+    return int(value or 0)
+
+
+def read_counter_state(session: Session, name: str) -> Tuple[int, Optional[datetime]]:
+    """(valor, momento da última alteração); (0, None) se o contador não existe."""
+    row = session.execute(
+        select(ChangeCounter.value, ChangeCounter.updated_at).where(
+            ChangeCounter.name == name
+        )
+    ).first()
+    if row is None:
+        return 0, None
+    return int(row.value), row.updated_at
+
+
+def bump_counter(session: Session, name: str) -> None:
+    """Incrementa o contador na transação corrente (o commit fica com quem chamou)."""
+    now = datetime.utcnow()
+    res = session.execute(
+        update(ChangeCounter)
+        .where(ChangeCounter.name == name)
+        .values(value=ChangeCounter.value + 1, updated_at=now)
+    )
+    if res.rowcount == 0:
+        session.add(ChangeCounter(name=name, value=1, updated_at=now))
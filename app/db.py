@@ -1,5 +1,14 @@
-from sqlalchemy import create_engine
+import time
+from typing import Dict
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from sqlalchemy.orm import DeclarativeBase, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from .config import Settings
+from .telemetry import Histogram
 
 
 class Base(DeclarativeBase):
@@ -7,15 +16,185 @@ class Base(DeclarativeBase):
 
 
 _engine_cache = {}
+_async_engine_cache = {}
+
+# Driver síncrono -> driver async equivalente
+_ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "postgresql+psycopg": "postgresql+psycopg",
+    "mysql": "mysql+aiomysql",
+    "mysql+pymysql": "mysql+aiomysql",
+}
 _SessionFactory = None
 
 
+class PoolMetrics:
+    """Tempo de espera no checkout de conexões do pool e timeouts."""
+
+    def __init__(self):
+        self.checkout_wait_ms = Histogram([0.1, 1, 5, 10, 50, 100, 500, 1000, 5000])
+        self.timeouts = 0
+
+
+class _TimedPoolMixin:
+    metrics: PoolMetrics = None
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            if self.metrics is not None:
+                self.metrics.timeouts += 1
+            raise
+        finally:
+            if self.metrics is not None:
+                self.metrics.checkout_wait_ms.observe(
+                    (time.perf_counter() - start) * 1000.0
+                )
+
+    def recreate(self):
+        # dispose() recria o pool: as métricas continuam no novo
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+class TimedQueuePool(_TimedPoolMixin, QueuePool):
+    pass
+
+
+class TimedAsyncQueuePool(_TimedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def _is_memory_sqlite(url) -> bool:
+    return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+
+
+def _engine_options(db_url: str, poolclass) -> Dict:
+    """Parâmetros de pool conforme o backend (via Settings)."""
+    url = make_url(db_url)
+    if _is_memory_sqlite(url):
+        # Banco em memória vive em uma única conexão: mantém o pool padrão
+        return {}
+    settings = Settings()
+    options = {
+        "poolclass": poolclass,
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout_s,
+    }
+    if url.get_backend_name() != "sqlite":
+        options["pool_pre_ping"] = settings.db_pool_pre_ping
+        options["pool_recycle"] = settings.db_pool_recycle_s
+    return options
+
+
+def _sqlite_pragmas() -> Dict[str, str]:
+    settings = Settings()
+    pragmas = {
+        "journal_mode": settings.sqlite_journal_mode,
+        "synchronous": settings.sqlite_synchronous,
+        "busy_timeout": settings.sqlite_busy_timeout_ms,
+        "mmap_size": settings.sqlite_mmap_size,
+        "cache_size": settings.sqlite_cache_size,
+        "temp_store": settings.sqlite_temp_store,
+    }
+    return {k: str(v) for k, v in pragmas.items() if v not in ("", None)}
+
+
+def _configure(engine, db_url: str) -> None:
+    url = make_url(db_url)
+    if url.get_backend_name() == "sqlite":
+        pragmas = _sqlite_pragmas()
+
+        # WAL: leitores (/predictions) não bloqueiam o escritor (/predict)
+        @event.listens_for(engine, "connect")
+        def _set_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            for name, value in pragmas.items():
+                cursor.execute("PRAGMA %s=%s" % (name, value))
+            cursor.close()
+
+        if Settings().partitioning_enabled and not _is_memory_sqlite(url):
+            # Import tardio: partitioning importa models, que importa este módulo
+            from .partitioning import sqlite_attach
+
+            @event.listens_for(engine, "connect")
+            def _attach_months(dbapi_connection, connection_record):
+                sqlite_attach(dbapi_connection, connection_record.info)
+
+            # Meses rotacionados por outro processo entram no próximo checkout
+            @event.listens_for(engine, "checkout")
+            def _refresh_months(dbapi_connection, connection_record, proxy):
+                sqlite_attach(dbapi_connection, connection_record.info)
+
+    if isinstance(engine.pool, _TimedPoolMixin):
+        engine.pool.metrics = PoolMetrics()
+
+
 def get_engine(db_url: str):
     if db_url not in _engine_cache:
-        _engine_cache[db_url] = create_engine(db_url, echo=False, future=True)
+        engine = create_engine(
+            db_url, echo=False, future=True, **_engine_options(db_url, TimedQueuePool)
+        )
+        _configure(engine, db_url)
+        _engine_cache[db_url] = engine
     return _engine_cache[db_url]
 
 
+def async_url_for(db_url: str) -> str:
+    """Converte a URL síncrona (DB_URL) para o driver async correspondente."""
+    url = make_url(db_url)
+    if url.drivername not in _ASYNC_DRIVERS:
+        raise ValueError("No async driver for %s; set ASYNC_DB_URL" % url.drivername)
+    return url.set(drivername=_ASYNC_DRIVERS[url.drivername]).render_as_string(
+        hide_password=False
+    )
+
+
+def get_async_engine(db_url: str):
+    # Import tardio: só a API ASGI precisa do engine async
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    if db_url not in _async_engine_cache:
+        engine = create_async_engine(
+            db_url, echo=False, **_engine_options(db_url, TimedAsyncQueuePool)
+        )
+        _configure(engine.sync_engine, db_url)
+        _async_engine_cache[db_url] = engine
+    return _async_engine_cache[db_url]
+
+
+def dispose_engines(close: bool = True) -> None:
+    """Descarta os pools de conexão (close=False no processo filho após um fork)."""
+    for engine in _engine_cache.values():
+        engine.dispose(close=close)
+
+
+def pool_stats() -> Dict:
+    """Conexões em uso e espera no checkout, por engine (sem senha na chave)."""
+    out = {}
+    engines = [("sync", e) for e in _engine_cache.values()]
+    engines += [("async", e.sync_engine) for e in _async_engine_cache.values()]
+    for kind, engine in engines:
+        pool = engine.pool
+        if not isinstance(pool, _TimedPoolMixin):
+            continue
+        out["%s:%s" % (kind, engine.url.render_as_string(hide_password=True))] = {
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "overflow": max(pool.overflow(), 0),
+            "checkout_wait_ms": pool.metrics.checkout_wait_ms.snapshot(),
+            "timeouts": pool.metrics.timeouts,
+        }
+    return out
+
+
 def get_session_factory(db_url: str):
     global _SessionFactory
     if _SessionFactory is None:
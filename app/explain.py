@@ -0,0 +1,94 @@
+"""Planos (EXPLAIN) das consultas quentes dos endpoints.
+
+Usado pelo `manage.py check-indexes` e pelos testes: cada consulta deve ser
+atendida por um índice, sem varrer a tabela e, no SQLite, sem ordenar numa
+B-tree temporária (USE TEMP B-TREE FOR ORDER BY). GROUP BY em B-tree
+temporária é esperado nos agregados e não conta como problema.
+"""
+
+from datetime import datetime
+from typing import List, NamedTuple
+
+from sqlalchemy import select, text
+
+from . import aggregates, queries
+from .db import Base
+from .models import MetricRollup, ModelRegistry
+
+
+class HotQuery(NamedTuple):
+    label: str
+    stmt: object
+    # Ordena pela PK inteira: percorrer a tabela pela PK é ok
+    pk_order: bool = False
+
+
+def hot_queries(dialect: str, prediction_id_format: str) -> List[HotQuery]:
+    if prediction_id_format == "uuid7":
+        pred_cursor = queries.encode_cursor(["0" * 32])
+    else:
+        pred_cursor = queries.encode_cursor([datetime.utcnow(), "0" * 32])
+    summary = aggregates.SummaryRequest({"name": "error_abs"})
+    return [
+        HotQuery(
+            "/predict (modelo ativo)",
+            select(ModelRegistry.id).order_by(ModelRegistry.id.desc()).limit(1),
+            True,
+        ),
+        HotQuery("/predictions", queries.predictions_query({})),
+        HotQuery("/predictions?model_id", queries.predictions_query({"model_id": "1"})),
+        HotQuery(
+            "/predictions?cursor", queries.predictions_query({"cursor": pred_cursor})
+        ),
+        HotQuery("/metrics", queries.metrics_query({}), True),
+        HotQuery(
+            "/metrics?prediction_id", queries.metrics_query({"prediction_id": "x"})
+        ),
+        HotQuery("/metrics?name", queries.metrics_query({"name": "error_abs"})),
+        HotQuery(
+            "/metrics?prediction_id&name",
+            queries.metrics_query({"prediction_id": "x", "name": "error_abs"}),
+        ),
+        HotQuery("/models", queries.models_query({})),
+        HotQuery("/models?flavor", queries.models_query({"flavor": "sklearn"})),
+        HotQuery("/retrainings", queries.retrainings_query({})),
+        HotQuery("/metrics/summary", summary.stats_statement(dialect)),
+        HotQuery("/metrics/summary (hist.)", summary.histogram_statement(dialect)),
+        HotQuery(
+            "/metrics/summary (rollup)",
+            select(MetricRollup)
+            .where(MetricRollup.name == "error_abs", MetricRollup.model_id == 1)
+            .order_by(MetricRollup.model_id, MetricRollup.bucket_start),
+        ),
+    ]
+
+
+def plan(conn, stmt) -> List[str]:
+    """Linhas do EXPLAIN (QUERY PLAN, no SQLite) da consulta."""
+    if isinstance(stmt, queries.ListQuery):
+        stmt = stmt.stmt
+    compiled = stmt.compile(compile_kwargs={"render_postcompile": True})
+    prefix = "EXPLAIN QUERY PLAN " if conn.dialect.name == "sqlite" else "EXPLAIN "
+    rows = conn.execute(text(prefix + str(compiled)), compiled.params).all()
+    return [str(r[-1]) for r in rows]
+
+
+def problems(lines: List[str], dialect: str, pk_order: bool = False) -> List[str]:
+    """O que falta de índice no plano: varredura da tabela e ordenação extra."""
+    out = []
+    if dialect == "sqlite":
+        for line in lines:
+            words = line.split()
+            # SCAN de CTE/subconsulta (ex.: "SCAN stats") não é varredura de tabela
+            if (
+                words[:1] == ["SCAN"]
+                and words[1] in Base.metadata.tables
+                and "USING" not in line
+                and not pk_order
+            ):
+                out.append(line)
+            elif line.startswith("USE TEMP B-TREE FOR ORDER BY"):
+                out.append(line)
+    else:
+        out = [line for line in lines if "Seq Scan" in line]
+    return out
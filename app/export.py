@@ -0,0 +1,226 @@
+"""Exportação em streaming de predições com as métricas pivotadas em colunas.
+
+Uma única consulta (predictions LEFT JOIN prediction_metrics, ordenada por
+predição) é lida com cursor no servidor em blocos de EXPORT_YIELD_PER linhas;
+as linhas consecutivas da mesma predição viram um registro. Nada é acumulado
+além do bloco corrente, então a memória não depende do tamanho da exportação.
+Features empacotadas (app.features) são decodificadas por chunk, de uma vez.
+"""
+
+import csv
+import io
+import json
+from datetime import datetime
+from typing import AsyncIterator, Dict, Iterator, List, Mapping, Optional
+
+from sqlalchemy import select
+
+from . import partitioning
+from .config import Settings
+from .features import packer
+from .ml.metrics import METRIC_NAMES
+from .services import BadRequest
+
+settings = Settings()
+
+FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+# Registros por chunk enviado ao cliente
+_CHUNK_RECORDS = 500
+
+_BASE_COLUMNS = ["id", "model_id", "created_at", "prediction", "features"]
+
+
+def parse_time(args: Mapping, name: str) -> Optional[datetime]:
+    """Parâmetro ISO 8601 da query (None se ausente); inválido vira 400."""
+    value = args.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise BadRequest("%s must be an ISO datetime" % name)
+
+
+class ExportRequest:
+    def __init__(self, args: Mapping):
+        self.format = args.get("format", "ndjson")
+        if self.format not in FORMATS:
+            raise BadRequest("format must be one of %s" % ", ".join(sorted(FORMATS)))
+        self.model_id = None
+        if args.get("model_id"):
+            try:
+                self.model_id = int(args["model_id"])
+            except ValueError:
+                raise BadRequest("model_id must be integer")
+        self.start = parse_time(args, "start")
+        self.end = parse_time(args, "end")
+        names = args.get("metrics")
+        self.metric_names = (
+            [n for n in names.split(",") if n] if names else list(METRIC_NAMES)
+        )
+
+    @property
+    def media_type(self) -> str:
+        return FORMATS[self.format]
+
+    @property
+    def filename(self) -> str:
+        return "predictions.%s" % self.format
+
+    def statement(self):
+        p, m = partitioning.read_tables()
+        stmt = (
+            select(
+                p.c.id,
+                p.c.model_id,
+                p.c.created_at,
+                p.c.prediction,
+                p.c.features,
+                p.c.feature_schema_id,
+                p.c.features_packed,
+                m.c.name,
+                m.c.value,
+            )
+            .select_from(p.outerjoin(m, partitioning.metric_join(p, m)))
+            # Linhas da mesma predição chegam juntas (índice created_at, id)
+            .order_by(p.c.created_at, p.c.id)
+        )
+        if self.model_id is not None:
+            stmt = stmt.where(p.c.model_id == self.model_id)
+        if self.start is not None:
+            stmt = stmt.where(p.c.created_at >= self.start)
+        if self.end is not None:
+            stmt = stmt.where(p.c.created_at < self.end)
+        return stmt
+
+
+class Pivot:
+    """Agrupa as linhas do JOIN (uma por métrica) em um registro por predição."""
+
+    def __init__(self):
+        self._current: Optional[Dict] = None
+
+    def feed(self, row) -> Optional[Dict]:
+        """Consome uma linha; devolve o registro anterior quando a predição muda."""
+        done = None
+        if self._current is None or self._current["id"] != row.id:
+            done = self._current
+            self._current = {
+                "id": row.id,
+                "model_id": row.model_id,
+                "created_at": row.created_at.isoformat(),
+                "prediction": row.prediction,
+                "features": row.features,
+                "metrics": {},
+            }
+            if row.feature_schema_id is not None:
+                # Decodificado em lote depois (FeaturePacker.decode_records)
+                self._current["_packed"] = (row.feature_schema_id, row.features_packed)
+        if row.name is not None:
+            self._current["metrics"][row.name] = row.value
+        return done
+
+    def flush(self) -> Optional[Dict]:
+        done, self._current = self._current, None
+        return done
+
+
+class Encoder:
+    """Serializa registros em NDJSON ou CSV (cabeçalho no primeiro chunk)."""
+
+    def __init__(self, request: ExportRequest):
+        self.request = request
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer) if request.format == "csv" else None
+        self._pending: List[Dict] = []
+        if self._writer is not None:
+            self._writer.writerow(_BASE_COLUMNS + request.metric_names)
+
+    def add(self, record: Dict) -> Optional[str]:
+        """Acrescenta um registro; devolve um chunk pronto a cada _CHUNK_RECORDS."""
+        self._pending.append(record)
+        if len(self._pending) >= _CHUNK_RECORDS:
+            return self.drain()
+        return None
+
+    def _write(self, record: Dict) -> None:
+        if self._writer is not None:
+            metrics = record["metrics"]
+            self._writer.writerow(
+                [
+                    record["id"],
+                    record["model_id"],
+                    record["created_at"],
+                    record["prediction"],
+                    json.dumps(record["features"], separators=(",", ":")),
+                ]
+                + [metrics.get(n, "") for n in self.request.metric_names]
+            )
+        else:
+            self._buffer.write(json.dumps(record, separators=(",", ":")))
+            self._buffer.write("\n")
+
+    def drain(self) -> str:
+        packer.decode_records(self._pending)
+        for record in self._pending:
+            self._write(record)
+        self._pending = []
+        chunk = self._buffer.getvalue()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return chunk
+
+
+class Exporter:
+    """Pivot + Encoder: recebe as linhas do JOIN em ordem e devolve chunks prontos."""
+
+    def __init__(self, request: ExportRequest):
+        self._pivot = Pivot()
+        self._encoder = Encoder(request)
+
+    def feed(self, row) -> Optional[str]:
+        record = self._pivot.feed(row)
+        return self._encoder.add(record) if record is not None else None
+
+    def finish(self) -> str:
+        record = self._pivot.flush()
+        if record is not None:
+            self._encoder.add(record)
+        return self._encoder.drain()
+
+
+def stream_export(engine, request: ExportRequest) -> Iterator[str]:
+    exporter = Exporter(request)
+    with engine.connect() as conn:
+        result = conn.execution_options(
+            stream_results=True, yield_per=settings.export_yield_per
+        ).execute(request.statement())
+        for row in result:
+            chunk = exporter.feed(row)
+            if chunk:
+                yield chunk
+    tail = exporter.finish()
+    if tail:
+        yield tail
+
+
+async def astream_export(engine, request: ExportRequest) -> AsyncIterator[str]:
+    """Versão async (engine async do SQLAlchemy) para a API ASGI."""
+    exporter = Exporter(request)
+    async with engine.connect() as conn:
+        result = await conn.stream(
+            request.statement(),
+            execution_options={"yield_per": settings.export_yield_per},
+        )
+        async for row in result:
+            chunk = exporter.feed(row)
+            if chunk:
+                yield chunk
+    tail = exporter.finish()
+    if tail:
+        yield tail
+
+
+def content_disposition(request: ExportRequest) -> Dict[str, str]:
+    return {"Content-Disposition": 'attachment; filename="%s"' % request.filename}
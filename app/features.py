@@ -0,0 +1,186 @@
+"""Armazenamento compacto das features das predições (FEATURE_STORAGE).
+
+Com "json" (padrão) cada predição guarda o dict inteiro em predictions.features.
+Com "float32"/"float64" as linhas cujas features são todas numéricas guardam
+só os valores, num array little-endian em predictions.features_packed, e
+feature_schema_id aponta para a linha de feature_schemas com os nomes (uma
+por combinação de nomes e dtype). predictions.features fica com JSON null.
+
+A codificação é por lote: linhas com os mesmos nomes viram uma matriz numpy e
+cada linha é uma fatia dos bytes dela. A decodificação de várias linhas do
+mesmo schema junta os blobs num único np.frombuffer. A API continua
+devolvendo nome -> valor; inteiros voltam como float, e float32 guarda cerca
+de 7 dígitos significativos. Linhas com valores não numéricos (texto, None,
+bool, listas) continuam em JSON.
+"""
+
+import hashlib
+import json
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from .config import Settings
+from .db import get_engine
+from .models import FeatureSchema
+
+settings = Settings()
+
+FORMATS = ("json", "float32", "float64")
+
+_DTYPES = {"float32": np.dtype("<f4"), "float64": np.dtype("<f8")}
+
+_SCHEMAS = FeatureSchema.__table__
+
+_Key = Tuple[Tuple[str, ...], str]
+
+
+def _packable(features) -> bool:
+    if not isinstance(features, dict) or not features:
+        return False
+    for v in features.values():
+        # bool é int em Python, mas voltaria como 0.0/1.0
+        if isinstance(v, bool) or not isinstance(v, (int, float)):
+            return False
+    return True
+
+
+def _digest(names: Sequence[str], dtype: str) -> str:
+    raw = json.dumps([dtype, list(names)], separators=(",", ":"))
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class FeaturePacker:
+    """Codifica/decodifica features empacotadas; cacheia os schemas por processo."""
+
+    def __init__(self, storage: str = "json"):
+        if storage not in FORMATS:
+            raise ValueError("Unsupported feature storage: %s" % storage)
+        self.storage = storage
+        self._ids: Dict[_Key, int] = {}
+        self._schemas: Dict[int, Tuple[List[str], np.dtype]] = {}
+        self._lock = threading.Lock()
+
+    def clear(self) -> None:
+        """Esquece os schemas em cache (banco recriado, testes)."""
+        with self._lock:
+            self._ids.clear()
+            self._schemas.clear()
+
+    def _remember(self, schema_id: int, names: Sequence[str], dtype: str) -> None:
+        with self._lock:
+            self._ids[(tuple(names), dtype)] = schema_id
+            self._schemas[schema_id] = (list(names), _DTYPES[dtype])
+
+    def schema_id(self, session: Session, names: Sequence[str], dtype: str) -> int:
+        """Id do schema (nomes, dtype), criado na transação da sessão se faltar.
+
+        Só ids já commitados entram no cache: um schema criado numa transação
+        que depois sofre rollback não fica apontado por linhas futuras.
+        """
+        cached = self._ids.get((tuple(names), dtype))
+        if cached is not None:
+            return cached
+        digest = _digest(names, dtype)
+        lookup = select(_SCHEMAS.c.id).where(_SCHEMAS.c.digest == digest)
+        found = session.execute(lookup).scalar()
+        if found is not None:
+            self._remember(found, names, dtype)
+            return found
+        row = {
+            "digest": digest,
+            "names": list(names),
+            "dtype": dtype,
+            "created_at": datetime.utcnow(),
+        }
+        dialect = session.get_bind().dialect.name
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        elif dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            session.execute(_SCHEMAS.insert(), [row])
+            return session.execute(lookup).scalar()
+        # Outro processo pode criar o mesmo schema ao mesmo tempo
+        session.execute(insert(_SCHEMAS).on_conflict_do_nothing(), [row])
+        return session.execute(lookup).scalar()
+
+    def pack_rows(self, session: Session, pred_rows: List[Dict]) -> List[Dict]:
+        """Linhas prontas para o INSERT em predictions (as originais não mudam)."""
+        if self.storage == "json":
+            return pred_rows
+        dtype = _DTYPES[self.storage]
+        groups: Dict[Tuple[str, ...], List[int]] = {}
+        for i, row in enumerate(pred_rows):
+            if _packable(row["features"]):
+                groups.setdefault(tuple(row["features"]), []).append(i)
+        out = [
+            {**row, "features_packed": None, "feature_schema_id": None}
+            for row in pred_rows
+        ]
+        for names, idx in groups.items():
+            schema_id = self.schema_id(session, names, self.storage)
+            matrix = np.array(
+                [list(pred_rows[i]["features"].values()) for i in idx], dtype=dtype
+            )
+            raw, step = matrix.tobytes(), len(names) * dtype.itemsize
+            for j, i in enumerate(idx):
+                out[i]["features"] = None  # JSON null: a coluna é NOT NULL
+                out[i]["features_packed"] = raw[j * step : (j + 1) * step]
+                out[i]["feature_schema_id"] = schema_id
+        return out
+
+    def _schema(self, schema_id: int) -> Tuple[List[str], np.dtype]:
+        schema = self._schemas.get(schema_id)
+        if schema is not None:
+            return schema
+        # Schema criado por outro processo: recarrega todos (são poucos)
+        with get_engine(settings.db_url).connect() as conn:
+            for row in conn.execute(select(_SCHEMAS)):
+                self._remember(row.id, row.names, row.dtype)
+        schema = self._schemas.get(schema_id)
+        if schema is None:
+            raise LookupError("feature schema %s not found" % schema_id)
+        return schema
+
+    def unpack(self, schema_id: int, blob: bytes) -> Dict[str, float]:
+        names, dtype = self._schema(schema_id)
+        return dict(zip(names, np.frombuffer(blob, dtype=dtype).tolist()))
+
+    def unpack_many(
+        self, schema_ids: Sequence[int], blobs: Sequence[bytes]
+    ) -> List[Dict[str, float]]:
+        """Decodifica várias linhas: um np.frombuffer por schema."""
+        out: List[Optional[Dict]] = [None] * len(blobs)
+        groups: Dict[int, List[int]] = {}
+        for i, schema_id in enumerate(schema_ids):
+            groups.setdefault(schema_id, []).append(i)
+        for schema_id, idx in groups.items():
+            names, dtype = self._schema(schema_id)
+            raw = b"".join(blobs[i] for i in idx)
+            matrix = np.frombuffer(raw, dtype=dtype).reshape(len(idx), len(names))
+            for i, values in zip(idx, matrix.tolist()):
+                out[i] = dict(zip(names, values))
+        return out
+
+    def decode_records(self, records: List[Dict]) -> None:
+        """Preenche "features" dos registros do Pivot que vieram empacotados."""
+        packed = [r for r in records if "_packed" in r]
+        if not packed:
+            return
+        schema_ids, blobs = zip(*(r.pop("_packed") for r in packed))
+        for record, features in zip(packed, self.unpack_many(schema_ids, blobs)):
+            record["features"] = features
+
+    def features_of(self, row) -> Dict:
+        """Features de uma linha de predictions (ORM ou Row), em qualquer formato."""
+        if row.feature_schema_id is None:
+            return row.features
+        return self.unpack(row.feature_schema_id, row.features_packed)
+
+
+packer = FeaturePacker(settings.feature_storage)
@@ -0,0 +1,148 @@
+"""GET condicional (ETag / Last-Modified) e cache de respostas das listagens.
+
+/models e /retrainings mudam pouco e são consultados o tempo todo. O validador
+de cada resposta vem do ChangeCounter da tabela (uma leitura por PK),
+incrementado na mesma transação de toda escrita feita pela API: o ETag combina
+tabela, geração e parâmetros da query. Com If-None-Match (ou If-Modified-Since)
+ainda válido a resposta é 304 sem consultar a tabela. Last-Modified tem só
+segundos inteiros: enquanto o segundo da última escrita não terminou ele não é
+enviado nem aceito, senão outra escrita no mesmo segundo daria um 304 velho
+(o ETag não tem esse problema). O cache opcional guarda o
+corpo já serializado por ETag; como a geração faz parte da chave, escritas de
+outros processos também o invalidam.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Callable, Dict, Mapping, NamedTuple, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from .config import Settings
+from .counters import read_counter_state
+
+settings = Settings()
+
+
+class Validator(NamedTuple):
+    etag: str
+    last_modified: Optional[datetime]
+
+
+def validator_for(session: Session, table: str, args: Mapping) -> Validator:
+    generation, updated_at = read_counter_state(session, table)
+    items = sorted((k, args.get(k)) for k in args.keys())
+    digest = hashlib.blake2b(repr(items).encode("utf-8"), digest_size=6).hexdigest()
+    return Validator('"%s-%d-%s"' % (table, generation, digest), updated_at)
+
+
+def _settled(last_modified: Optional[datetime]) -> Optional[datetime]:
+    """last_modified em segundos inteiros (UTC), ou None se o segundo não acabou."""
+    if last_modified is None:
+        return None
+    second = last_modified.replace(tzinfo=timezone.utc, microsecond=0)
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    return second if second < now else None
+
+
+def headers(v: Validator) -> Dict[str, str]:
+    # no-cache: o cliente pode guardar, mas revalida a cada uso
+    out = {"ETag": v.etag, "Cache-Control": "no-cache"}
+    changed = _settled(v.last_modified)
+    if changed is not None:
+        out["Last-Modified"] = format_datetime(changed, usegmt=True)
+    return out
+
+
+def not_modified(
+    v: Validator, if_none_match: Optional[str], if_modified_since: Optional[str]
+) -> bool:
+    if if_none_match:
+        # If-None-Match tem precedência sobre If-Modified-Since (RFC 9110)
+        tags = [t.strip() for t in if_none_match.split(",")]
+        return "*" in tags or v.etag in tags or "W/" + v.etag in tags
+    changed = _settled(v.last_modified)
+    if if_modified_since and changed is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        return changed <= since
+    return False
+
+
+class ResponseCache:
+    """LRU de corpos já serializados: etag -> (corpo, cursor da próxima página)."""
+
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max(1, int(max_entries))
+        self._entries: "OrderedDict[str, Tuple[bytes, Optional[str]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, etag: str) -> Optional[Tuple[bytes, Optional[str]]]:
+        with self._lock:
+            entry = self._entries.get(etag)
+            if entry is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(etag)
+            self._hits += 1
+            return entry
+
+    def put(self, etag: str, body: bytes, cursor: Optional[str]) -> None:
+        with self._lock:
+            self._entries[etag] = (body, cursor)
+            self._entries.move_to_end(etag)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, table: str) -> None:
+        """Descarta as respostas da tabela (chamado após escritas locais)."""
+        prefix = '"%s-' % table
+        with self._lock:
+            for etag in [k for k in self._entries if k.startswith(prefix)]:
+                del self._entries[etag]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self._hits,
+                "misses": self._misses,
+            }
+
+
+response_cache = ResponseCache(settings.response_cache_max_entries)
+
+
+def respond(
+    session: Session,
+    table: str,
+    args: Mapping,
+    request_headers: Mapping,
+    render: Callable[[Session], Tuple[bytes, Optional[str]]],
+) -> Tuple[int, Optional[bytes], Optional[str], Dict[str, str]]:
+    """(status, corpo, cursor, headers): 304 sem corpo, ou 200 do cache ou de render."""
+    v = validator_for(session, table, args)
+    out = headers(v)
+    if not_modified(
+        v,
+        request_headers.get("If-None-Match"),
+        request_headers.get("If-Modified-Since"),
+    ):
+        return 304, None, None, out
+    entry = response_cache.get(v.etag) if settings.response_cache_enabled else None
+    if entry is None:
+        entry = render(session)
+        if settings.response_cache_enabled:
+            response_cache.put(v.etag, *entry)
+    body, cursor = entry
+    return 200, body, cursor, out
@@ -0,0 +1,158 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ..config import Settings
+from ..telemetry import Histogram
+from .metrics import compute_batch_metrics, split_batch_metrics
+
+
+@dataclass
+class _Pending:
+    adapter: Any
+    model: Any
+    features: Dict[str, Any]
+    y_true: Optional[float] = None
+    enqueued_at: float = field(default_factory=time.perf_counter)
+    future: Future = field(default_factory=Future)
+
+
+class MicroBatcher:
+    """Agrupa chamadas concorrentes de predict em uma única chamada a model.predict.
+
+    A primeira requisição abre uma janela de até max_wait_us microssegundos; o
+    que chegar nesse intervalo (até max_batch_size itens) é empilhado em uma
+    matriz e pontuado de uma vez por uma thread dedicada.
+    """
+
+    def __init__(self, max_batch_size: int = 32, max_wait_us: int = 2000):
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0, int(max_wait_us)) / 1e6
+        self.batch_sizes = Histogram([1, 2, 4, 8, 16, 32, 64, 128, 256])
+        self.queue_wait_us = Histogram(
+            [50, 100, 250, 500, 1000, 2500, 5000, 10000, 25000, 50000]
+        )
+        self._lock = threading.Lock()
+        self._queue: "queue.Queue[_Pending]" = queue.Queue()
+        self._thread = None
+        self._pid = None
+
+    def _ensure_worker(self) -> None:
+        # Threads não sobrevivem a um fork: cada processo sobe o seu worker
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._queue = queue.Queue()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(
+                target=self._run, name="micro-batcher", daemon=True
+            )
+            self._thread.start()
+
+    def submit(
+        self, adapter, model, features: Dict[str, Any], y_true: Optional[float] = None
+    ) -> Tuple[float, Dict[str, float]]:
+        """(predição, métricas por predição), calculadas junto com o lote."""
+        self._ensure_worker()
+        item = _Pending(adapter=adapter, model=model, features=features, y_true=y_true)
+        self._queue.put(item)
+        return item.future.result()
+
+    def _run(self) -> None:
+        q = self._queue
+        while True:
+            first = q.get()
+            batch = [first]
+            deadline = first.enqueued_at + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - time.perf_counter()
+                try:
+                    if timeout <= 0:
+                        batch.append(q.get_nowait())
+                    else:
+                        batch.append(q.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            self._score(batch)
+
+    def _score(self, batch: List[_Pending]) -> None:
+        started = time.perf_counter()
+        self.batch_sizes.observe(len(batch))
+        for item in batch:
+            self.queue_wait_us.observe((started - item.enqueued_at) * 1e6)
+
+        # Itens de modelos diferentes (troca no meio da janela) são pontuados à parte
+        groups: Dict[int, List[_Pending]] = {}
+        for item in batch:
+            groups.setdefault(id(item.model), []).append(item)
+        for items in groups.values():
+            adapter, model = items[0].adapter, items[0].model
+            try:
+                xs = adapter.build_matrix([it.features for it in items], model=model)
+            except Exception as e:
+                for it in items:
+                    it.future.set_exception(e)
+                continue
+            # Um item ruim (feature "nan"/"inf", y_true não numérico) não derruba
+            # o grupo: falha sozinho ou é pontuado à parte
+            ok, y_true = [], []
+            for j, it in enumerate(items):
+                try:
+                    y = None if it.y_true is None else float(it.y_true)
+                except (TypeError, ValueError) as e:
+                    it.future.set_exception(e)
+                    continue
+                if np.isfinite(xs[j]).all():
+                    ok.append(j)
+                    y_true.append(y)
+                else:
+                    self._score_group(adapter, model, [it], xs[j : j + 1], [y])
+            if ok:
+                group = [items[j] for j in ok]
+                self._score_group(adapter, model, group, xs[ok], y_true)
+
+    @staticmethod
+    def _score_group(
+        adapter, model, items: List[_Pending], xs: np.ndarray, y_true: List
+    ) -> None:
+        try:
+            ys = adapter.predict_batch(model, xs)
+            has_y = [y is not None for y in y_true]
+            metrics = split_batch_metrics(
+                compute_batch_metrics(
+                    ys,
+                    adapter.build_matrix([it.features for it in items]),
+                    np.array([y if h else np.nan for y, h in zip(y_true, has_y)]),
+                ),
+                has_y,
+            )
+        except Exception as e:
+            for it in items:
+                it.future.set_exception(e)
+            return
+        for it, y, m in zip(items, ys, metrics):
+            it.future.set_result((float(y), m))
+
+    def stats(self) -> Dict:
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_us": int(self.max_wait * 1e6),
+            "pending": self._queue.qsize(),
+            "batch_size": self.batch_sizes.snapshot(),
+            "queue_wait_us": self.queue_wait_us.snapshot(),
+        }
+
+
+_settings = Settings()
+micro_batcher = MicroBatcher(
+    max_batch_size=_settings.microbatch_max_batch_size,
+    max_wait_us=_settings.microbatch_max_wait_us,
+)
@@ -0,0 +1,105 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from ..config import Settings
+
+
+class ModelCache:
+    """Cache LRU de modelos carregados, compartilhado por todas as threads do processo.
+
+    A chave inclui o id do modelo, o caminho do arquivo e o mtime/tamanho do
+    arquivo, então um artefato sobrescrito em disco gera uma nova entrada.
+    """
+
+    def __init__(self, max_size: int = 4):
+        self.max_size = max(1, int(max_size))
+        self._entries: "OrderedDict[Tuple, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Um lock por chave em carregamento: só uma thread faz o joblib.load,
+        # as demais esperam e reaproveitam o resultado (evita thundering herd)
+        self._loading: Dict[Tuple, threading.Lock] = {}
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+        self._load_errors = 0
+
+    @staticmethod
+    def key_for(
+        model_id: Optional[int], flavor: str, model_path: Optional[str]
+    ) -> Tuple[Hashable, ...]:
+        mtime_ns = size = None
+        if model_path:
+            try:
+                st = os.stat(model_path)
+                mtime_ns, size = st.st_mtime_ns, st.st_size
+            except OSError:
+                pass
+        return (model_id, flavor, model_path, mtime_ns, size)
+
+    def get_or_load(self, key: Tuple, loader: Callable[[], Any]) -> Any:
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return self._entries[key]
+            key_lock = self._loading.setdefault(key, threading.Lock())
+
+        with key_lock:
+            # Outra thread pode ter carregado enquanto esperávamos o lock
+            with self._lock:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return self._entries[key]
+                self._misses += 1
+            try:
+                value = loader()
+            except Exception:
+                with self._lock:
+                    self._load_errors += 1
+                    self._loading.pop(key, None)
+                raise
+            with self._lock:
+                self._drop_stale(key)
+                self._entries[key] = value
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+                    self._evictions += 1
+                self._loading.pop(key, None)
+            return value
+
+    def _drop_stale(self, key: Tuple) -> None:
+        # Versões antigas do mesmo modelo (arquivo alterado) não serão mais usadas
+        for other in [k for k in self._entries if k[:3] == key[:3] and k != key]:
+            del self._entries[other]
+            self._invalidations += 1
+
+    def invalidate(self, model_id: Optional[int] = None) -> int:
+        """Remove as entradas de um modelo (ou todas, se model_id for None)."""
+        with self._lock:
+            if model_id is None:
+                keys = list(self._entries)
+            else:
+                keys = [k for k in self._entries if k[0] == model_id]
+            for k in keys:
+                del self._entries[k]
+            self._invalidations += len(keys)
+            return len(keys)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "invalidations": self._invalidations,
+                "load_errors": self._load_errors,
+            }
+
+
+model_cache = ModelCache(max_size=Settings().model_cache_size)
@@ -0,0 +1,75 @@
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+_lock = threading.Lock()
+
+
+def _uuid7_hex(unix_ms: int, seq: int) -> str:
+    # 48 bits de timestamp | versão 7 | 12 bits de sequência | variante |
+    # 62 bits aleatórios
+    rand = int.from_bytes(os.urandom(8), "big") & ((1 << 62) - 1)
+    value = (unix_ms & ((1 << 48) - 1)) << 80
+    value |= 0x7 << 76
+    value |= (seq & 0xFFF) << 64
+    value |= 0b10 << 62
+    value |= rand
+    return "%032x" % value
+
+
+class Uuid7Clock:
+    """Último (ms, sequência) emitido: mantém os ids estritamente crescentes.
+
+    Ids no mesmo milissegundo (ou num anterior) usam o contador de 12 bits;
+    quando ele estoura, o timestamp avança 1 ms.
+    """
+
+    def __init__(self):
+        self.last_ms = 0
+        self.seq = 0
+
+    def seed(self, value: str) -> None:
+        """Continua depois de um id UUIDv7 já existente."""
+        n = int(value, 16)
+        self.last_ms = n >> 80
+        self.seq = (n >> 64) & 0xFFF
+
+    def next(self, unix_ms: int) -> str:
+        if unix_ms <= self.last_ms:
+            self.seq += 1
+            if self.seq > 0xFFF:
+                self.last_ms += 1
+                self.seq = 0
+        else:
+            self.last_ms, self.seq = unix_ms, 0
+        return _uuid7_hex(self.last_ms, self.seq)
+
+
+_clock = Uuid7Clock()
+
+
+def uuid7_hex() -> str:
+    """UUIDv7 em hex (32 caracteres), crescente dentro do processo.
+
+    Ids gerados no mesmo milissegundo usam um contador de 12 bits, então a
+    ordem lexicográfica acompanha a ordem de criação e os INSERTs caem no fim
+    do índice da chave primária.
+    """
+    with _lock:
+        return _clock.next(time.time_ns() // 1_000_000)
+
+
+def unix_ms(dt: datetime) -> int:
+    """Milissegundos Unix de dt (datetime UTC ingênuo, como created_at)."""
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp() * 1000)
+
+
+def uuid7_hex_at(dt: datetime, clock: Optional[Uuid7Clock] = None) -> str:
+    """UUIDv7 com o timestamp de dt; com clock, crescente entre chamadas."""
+    if clock is not None:
+        return clock.next(unix_ms(dt))
+    return _uuid7_hex(unix_ms(dt), 0)
@@ -0,0 +1,128 @@
+import hashlib
+import json
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from ..config import Settings
+
+# Estimativa por entrada: chave (tupla + digest), valor (tupla + float + id) e
+# o nó do OrderedDict
+_ENTRY_OVERHEAD = 96
+
+
+def _canonical(value: Any) -> Any:
+    # 1 e 1.0 viram a mesma predição: números são normalizados para float
+    if isinstance(value, (int, float)):
+        return float(value)
+    return value
+
+
+class PredictionCache:
+    """Cache LRU + TTL de predições por (id do modelo, hash canônico das features).
+
+    Limitado por número de entradas e por um orçamento aproximado de memória.
+    Entradas expiradas são descartadas na leitura.
+    """
+
+    def __init__(
+        self, max_entries: int = 100000, ttl_s: float = 300.0, max_bytes: int = 0
+    ):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl_s = float(ttl_s)
+        self.max_bytes = int(max_bytes)
+        # chave -> (momento da gravação, predição, id da predição, bytes)
+        self._entries: "OrderedDict[Tuple, Tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._expired = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    @staticmethod
+    def key_for(
+        model_id: Optional[int], features: Dict[str, Any], by_name: bool
+    ) -> Tuple:
+        """Chave canônica das features.
+
+        by_name=True quando o modelo casa features por nome (schema): a ordem
+        das chaves não importa. No alinhamento posicional a ordem faz parte da
+        predição e entra no hash.
+        """
+        items = [(k, _canonical(v)) for k, v in features.items()]
+        if by_name:
+            items.sort(key=lambda kv: kv[0])
+        payload = json.dumps(items, separators=(",", ":"), default=str)
+        digest = hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+        return (model_id, digest)
+
+    def get(self, key: Tuple) -> Optional[Tuple[float, str]]:
+        """Retorna (predição, id da predição original) ou None."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            stored_at, y_pred, pred_id, size = entry
+            if self.ttl_s > 0 and now - stored_at > self.ttl_s:
+                del self._entries[key]
+                self._bytes -= size
+                self._expired += 1
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return y_pred, pred_id
+
+    def put(self, key: Tuple, y_pred: float, pred_id: str) -> None:
+        size = sys.getsizeof(key[1]) + sys.getsizeof(pred_id) + _ENTRY_OVERHEAD
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[3]
+            self._entries[key] = (time.monotonic(), float(y_pred), pred_id, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or (
+                self.max_bytes > 0 and self._bytes > self.max_bytes and self._entries
+            ):
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted[3]
+                self._evictions += 1
+
+    def invalidate(self, model_id: Optional[int] = None) -> None:
+        """Remove as entradas de um modelo (ou todas, com model_id=None)."""
+        with self._lock:
+            if model_id is None:
+                self._entries.clear()
+                self._bytes = 0
+            else:
+                for key in [k for k in self._entries if k[0] == model_id]:
+                    self._bytes -= self._entries.pop(key)[3]
+            self._invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "expired": self._expired,
+                "evictions": self._evictions,
+                "invalidations": self._invalidations,
+            }
+
+
+_settings = Settings()
+prediction_cache = PredictionCache(
+    max_entries=_settings.prediction_cache_max_entries,
+    ttl_s=_settings.prediction_cache_ttl_s,
+    max_bytes=_settings.prediction_cache_max_bytes,
+)
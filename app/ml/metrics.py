@@ -1,36 +1,80 @@
-import math
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Sequence
 
+import numpy as np
 
-def compute_per_prediction_metrics(
-    y_pred: float, features: Dict, y_true: Optional[float] = None
-) -> Dict[str, float]:
+ERROR_METRICS = ("error_abs", "error_sq")
+# Todas as métricas gravadas por predição, na ordem de compute_batch_metrics
+METRIC_NAMES = (
+    "prediction_abs",
+    "features_l2",
+    "error_abs",
+    "error_sq",
+    "robust_is_prediction_large",
+    "robust_has_nan_feature",
+)
+
+
+def compute_batch_metrics(
+    y_pred: np.ndarray, xs: np.ndarray, y_true: Optional[np.ndarray] = None
+) -> Dict[str, np.ndarray]:
+    """Métricas por predição para um lote inteiro, em forma colunar.
+
+    xs é a matriz de features (uma linha por predição). Em y_true, NaN indica
+    linha sem valor real; as métricas de erro dessas linhas saem NaN.
+    """
+    y_pred = np.asarray(y_pred, dtype=np.float64)
+    n = len(y_pred)
+    xs = np.asarray(xs, dtype=np.float64)
+    if xs.ndim != 2:
+        # reshape(n, -1) falha com n == 0: a largura vem do tamanho conhecido
+        xs = xs.reshape(n, xs.size // n if n else 0)
+    if n == 0:
+        names = [
+            m for m in METRIC_NAMES if y_true is not None or m not in ERROR_METRICS
+        ]
+        return {name: np.zeros(0) for name in names}
     metrics = {
-        "prediction_abs": abs(y_pred),
-        "features_l2": math.sqrt(sum((float(v) ** 2 for v in features.values()))),
+        "prediction_abs": np.abs(y_pred),
+        "features_l2": np.sqrt(np.einsum("ij,ij->i", xs, xs)),
     }
     if y_true is not None:
-        err = float(y_pred - float(y_true))
-        metrics.update(
-            {
-                "error_abs": abs(err),
-                "error_sq": err * err,
-            }
-        )
+        err = y_pred - np.asarray(y_true, dtype=np.float64)
+        metrics["error_abs"] = np.abs(err)
+        metrics["error_sq"] = err * err
     # robustez simples: faixa e NaNs
-    try:
-        is_large = abs(y_pred) > 1e6
-        metrics["robust_is_prediction_large"] = 1.0 if is_large else 0.0
-    except Exception:
-        metrics["robust_is_prediction_large"] = 1.0
-    metrics["robust_has_nan_feature"] = (
-        1.0 if any(_is_nan(v) for v in features.values()) else 0.0
-    )
+    metrics["robust_is_prediction_large"] = (np.abs(y_pred) > 1e6).astype(np.float64)
+    metrics["robust_has_nan_feature"] = np.isnan(xs).any(axis=1).astype(np.float64)
     return metrics
 
 
-def _is_nan(v) -> bool:
+def split_batch_metrics(
+    metrics: Dict[str, np.ndarray], has_y_true: Sequence[bool]
+) -> List[Dict[str, float]]:
+    """Resultado colunar -> um dict por linha (sem erro onde não há y_true)."""
+    names = list(metrics)
+    columns = [metrics[n].tolist() for n in names]
+    return [
+        {
+            n: col[j]
+            for n, col in zip(names, columns)
+            if has_y_true[j] or n not in ERROR_METRICS
+        }
+        for j in range(len(has_y_true))
+    ]
+
+
+def compute_per_prediction_metrics(
+    y_pred: float, features: Dict, y_true: Optional[float] = None
+) -> Dict[str, float]:
+    xs = np.array([[_as_float(v) for v in features.values()]], dtype=np.float64)
+    y = None if y_true is None else np.array([float(y_true)])
+    metrics = compute_batch_metrics(np.array([float(y_pred)]), xs, y_true=y)
+    return {name: float(values[0]) for name, values in metrics.items()}
+
+
+def _as_float(v) -> float:
+    # Mesma conversão do ModelRegistryAdapter: não numéricos viram 0
     try:
-        return float(v) != float(v)
+        return float(v)
     except Exception:
-        return False
+        return 0.0
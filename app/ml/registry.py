@@ -1,24 +1,51 @@
+import json
 import os
+import threading
+import time
 import uuid
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional
 
 import joblib
 import numpy as np
 from sklearn.linear_model import LinearRegression
+from sqlalchemy import insert, literal, null, select
+from sqlalchemy.orm import Session
+
+from ..config import Settings
+from ..counters import ACTIVE_MODEL, MODELS, bump_counter, read_counter
+from ..models import ModelRegistry
+from .cache import model_cache
+from .ids import uuid7_hex
+from .memo import prediction_cache
+from .scoring import CompiledModel, compile_model, read_feature_schema, schema_path_for
+
+
+_settings = Settings()
+_ID_FORMAT = _settings.prediction_id_format
+_MMAP_MODE = _settings.model_mmap_mode or None
 
 
 class ModelRegistryAdapter:
-    def __init__(self, flavor: str, model_path: Optional[str] = None):
+    def __init__(
+        self,
+        flavor: str,
+        model_path: Optional[str] = None,
+        feature_schema: Optional[Dict] = None,
+    ):
         self.flavor = flavor
         self.model_path = model_path
+        self.feature_schema = feature_schema
 
     def load_active(self):
         # Se houver um model_path, tenta carregar do arquivo local
         if self.model_path and os.path.exists(self.model_path):
             try:
                 if self.flavor == "sklearn":
-                    return joblib.load(self.model_path)
+                    # Com mmap_mode os arrays do modelo são mapeados do arquivo e
+                    # compartilhados entre processos via page cache
+                    return joblib.load(self.model_path, mmap_mode=_MMAP_MODE)
                 else:
                     raise ValueError("Unsupported flavor: %s" % self.flavor)
             except Exception:
@@ -34,6 +61,16 @@ class ModelRegistryAdapter:
         else:
             raise ValueError("Unsupported flavor: %s" % self.flavor)
 
+    def load_cached(self, model_id: Optional[int] = None) -> CompiledModel:
+        """Como load_active, mas reaproveita o modelo compilado do cache do processo."""
+        key = model_cache.key_for(model_id, self.flavor, self.model_path)
+        return model_cache.get_or_load(key, self._compile)
+
+    def _compile(self) -> CompiledModel:
+        # Modelos antigos não têm schema: caem no alinhamento posicional
+        schema = self.feature_schema or read_feature_schema(self.model_path)
+        return compile_model(self.load_active(), feature_schema=schema)
+
     def _align_features(self, xs: np.ndarray, expected: int) -> np.ndarray:
         if xs.shape[1] > expected:
             return xs[:, :expected]
@@ -43,6 +80,11 @@ class ModelRegistryAdapter:
         return xs
 
     def predict(self, model, features: Dict[str, Any]) -> float:
+        if isinstance(model, CompiledModel) and model.vectorizer is not None:
+            x = model.vectorizer.transform(features)
+            if model.scorer is not None and self.flavor == "sklearn":
+                return model.scorer.score_vector(x)
+            return float(self.predict_batch(model.model, x[None, :])[0])
         # Converte valores numéricos; ignora não numéricos com fallback zero
         vals = []
         for v in features.values():
@@ -50,6 +92,10 @@ class ModelRegistryAdapter:
                 vals.append(float(v))
             except Exception:
                 vals.append(0.0)
+        if isinstance(model, CompiledModel):
+            if model.scorer is not None and self.flavor == "sklearn":
+                return model.scorer.score_row(vals)
+            model = model.model
         xs = np.array([vals], dtype=float)
         if self.flavor == "sklearn":
             expected = int(getattr(model, "n_features_in_", xs.shape[1]))
@@ -59,16 +105,197 @@ class ModelRegistryAdapter:
         else:
             raise ValueError("Invalid flavor. Only 'sklearn' is supported.")
 
+    def build_matrix(self, rows: List[Dict[str, Any]], model=None) -> np.ndarray:
+        """Matriz 2-D (linhas x features) com a mesma conversão de predict."""
+        if isinstance(model, CompiledModel) and model.vectorizer is not None:
+            return model.vectorizer.transform_batch(rows)
+        width = max((len(r) for r in rows), default=0)
+        xs = np.zeros((len(rows), width), dtype=float)
+        for i, r in enumerate(rows):
+            xs[i, : len(r)] = [_as_float(v) for v in r.values()]
+        return xs
+
+    def columns_to_matrix(
+        self, columns: Dict[str, List[Any]], model=None
+    ) -> np.ndarray:
+        """Monta a matriz a partir de um payload colunar (nome -> valores)."""
+        if isinstance(model, CompiledModel) and model.vectorizer is not None:
+            n_rows = len(next(iter(columns.values()), []))
+            return model.vectorizer.transform_columns(columns, n_rows)
+        cols = []
+        for values in columns.values():
+            try:
+                cols.append(np.asarray(values, dtype=float))
+            except (TypeError, ValueError):
+                cols.append(np.array([_as_float(v) for v in values], dtype=float))
+        if not cols:
+            return np.zeros((0, 0), dtype=float)
+        return np.column_stack(cols)
+
+    def predict_batch(self, model, xs: np.ndarray) -> np.ndarray:
+        """Pontua todas as linhas de xs com uma única chamada a model.predict."""
+        if isinstance(model, CompiledModel):
+            if model.scorer is not None and self.flavor == "sklearn":
+                return model.scorer.score_matrix(xs)
+            model = model.model
+        if self.flavor == "sklearn":
+            expected = int(getattr(model, "n_features_in_", xs.shape[1]))
+            xs = self._align_features(xs, expected)
+            return np.asarray(model.predict(xs), dtype=float)
+        else:
+            raise ValueError("Invalid flavor. Only 'sklearn' is supported.")
+
     def new_prediction_id(self) -> str:
+        if _ID_FORMAT == "uuid7":
+            return uuid7_hex()
         return uuid.uuid4().hex
 
     @staticmethod
-    def save_model(model, model_path: str, flavor: str = "sklearn"):
-        """Salva o modelo em um arquivo local usando joblib."""
+    def save_model(
+        model,
+        model_path: str,
+        flavor: str = "sklearn",
+        feature_names: Optional[List[str]] = None,
+    ):
+        """Salva o modelo (e o schema de features, se houver) com joblib."""
         if flavor == "sklearn":
             # Criar diretório se não existir
             Path(model_path).parent.mkdir(parents=True, exist_ok=True)
-            joblib.dump(model, model_path)
+            # Sem compressão: arrays ficam alinhados no arquivo e podem ser mapeados
+            joblib.dump(model, model_path, compress=0)
+            if feature_names:
+                Path(schema_path_for(model_path)).write_text(
+                    json.dumps({"names": list(feature_names), "default": 0.0}),
+                    encoding="utf-8",
+                )
             return model_path
         else:
             raise ValueError("Unsupported flavor: %s" % flavor)
+
+
+def _as_float(v) -> float:
+    try:
+        return float(v)
+    except Exception:
+        return 0.0
+
+
+@dataclass(frozen=True)
+class ActiveModel:
+    id: int
+    flavor: str
+    model_path: Optional[str]
+    feature_schema: Optional[Dict] = None
+
+    def adapter(self) -> "ModelRegistryAdapter":
+        return ModelRegistryAdapter(self.flavor, self.model_path, self.feature_schema)
+
+
+class ActiveModelResolver:
+    """Mantém em memória o modelo ativo (maior id em models).
+
+    Outros processos sinalizam trocas incrementando o contador ACTIVE_MODEL no
+    banco; ele só é consultado a cada check_interval segundos, então na maioria
+    das requisições nenhuma query é feita para descobrir o modelo.
+    """
+
+    def __init__(self, check_interval: float = 1.0):
+        self.check_interval = check_interval
+        # Protege só a troca dos campos abaixo, nunca uma ida ao banco
+        self._lock = threading.Lock()
+        self._active: Optional[ActiveModel] = None
+        self._generation: Optional[int] = None
+        self._checked_at = 0.0
+        self._refreshing = False
+        self._epoch = 0  # incrementado por invalidate()
+
+    def _fresh(self) -> bool:
+        return (
+            self._active is not None
+            and time.monotonic() - self._checked_at < self.check_interval
+        )
+
+    def resolve(self, session: Session, default_flavor: str) -> ActiveModel:
+        if self._fresh():
+            return self._active
+        with self._lock:
+            if self._fresh():
+                return self._active
+            if self._refreshing and self._generation is not None:
+                # Releitura periódica já em andamento: serve o modelo atual
+                # (depois de invalidate() cada chamador relê por conta própria)
+                return self._active
+            self._refreshing = True
+            current, generation, epoch = self._active, self._generation, self._epoch
+        # O banco é lido fora do lock: na API ASGI a sessão roda no event loop, e
+        # esperar o lock ali travaria as outras requisições do mesmo loop
+        loaded = None
+        try:
+            counter = read_counter(session, ACTIVE_MODEL)
+            if current is None or counter != generation:
+                loaded = self._load(session, default_flavor)
+        except BaseException:
+            with self._lock:
+                self._refreshing = False
+            raise
+        with self._lock:
+            self._refreshing = False
+            if loaded is not None:
+                self._active, self._generation = loaded, counter
+            if epoch == self._epoch:
+                self._checked_at = time.monotonic()
+            active = self._active
+        if current is not None and loaded is not None and loaded != current:
+            # Predições memorizadas do modelo anterior não servem mais
+            prediction_cache.invalidate()
+        return active
+
+    def _load(self, session: Session, default_flavor: str) -> ActiveModel:
+        latest = (
+            select(
+                ModelRegistry.id,
+                ModelRegistry.flavor,
+                ModelRegistry.model_path,
+                ModelRegistry.feature_schema,
+            )
+            .order_by(ModelRegistry.id.desc())
+            .limit(1)
+        )
+        row = session.execute(latest).first()
+        if row is None:
+            # Nenhum modelo registrado: cria o registro do modelo dummy. O INSERT
+            # só grava com a tabela vazia, então duas resolve concorrentes (a
+            # leitura é feita fora do lock) não criam dois dummies
+            res = session.execute(
+                insert(ModelRegistry).from_select(
+                    ["flavor", "version", "model_path"],
+                    select(
+                        literal(default_flavor), literal("v0"), null()
+                    ).where(~select(ModelRegistry.id).exists()),
+                )
+            )
+            if res.rowcount:
+                bump_counter(session, MODELS)
+            session.commit()
+            row = session.execute(latest).first()
+        return ActiveModel(
+            id=row[0], flavor=row[1], model_path=row[2], feature_schema=row[3]
+        )
+
+    @staticmethod
+    def mark_changed(session: Session) -> None:
+        """Avisa os demais processos (na transação corrente) da troca de modelo."""
+        bump_counter(session, ACTIVE_MODEL)
+
+    def invalidate(self) -> None:
+        # Força a releitura na próxima resolve (o modelo atual fica para
+        # comparação); uma releitura já em andamento não conta como recente
+        with self._lock:
+            self._generation = None
+            self._checked_at = 0.0
+            self._epoch += 1
+
+
+active_model = ActiveModelResolver(
+    check_interval=_settings.active_model_check_interval_ms / 1000.0
+)
@@ -0,0 +1,171 @@
+import json
+import os
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+from sklearn.linear_model import ElasticNet, Lasso, LinearRegression, Ridge
+
+# Estimadores cujo predict é exatamente X @ coef_ + intercept_
+_LINEAR_TYPES = (LinearRegression, Ridge, Lasso, ElasticNet)
+
+
+def _check_finite(x: np.ndarray) -> None:
+    # O check_array do sklearn rejeita NaN/inf; o caminho rápido não passa por ele
+    if np.isfinite(x).all():
+        return
+    if np.isnan(x).any():
+        raise ValueError("Input X contains NaN.")
+    raise ValueError(
+        "Input X contains infinity or a value too large for dtype('float64')."
+    )
+
+
+class LinearScorer:
+    """Pontuação direta de modelos lineares, sem a validação de entrada do sklearn.
+
+    Da validação só fica a checagem de NaN/inf (mesmo ValueError do sklearn).
+    Linhas mais curtas que o modelo equivalem a preencher com zeros e linhas
+    mais longas são truncadas, o mesmo que ModelRegistryAdapter._align_features
+    faz; por isso basta usar os primeiros min(n, n_features) coeficientes.
+    """
+
+    def __init__(self, coef: np.ndarray, intercept: float):
+        self.coef = np.ascontiguousarray(coef, dtype=np.float64).ravel()
+        self.intercept = float(intercept)
+        self.n_features = self.coef.shape[0]
+        self._local = threading.local()
+
+    @classmethod
+    def from_model(cls, model) -> Optional["LinearScorer"]:
+        # Tipo exato: uma subclasse pode ter outro predict
+        if type(model) not in _LINEAR_TYPES:
+            return None
+        coef = np.asarray(getattr(model, "coef_", None))
+        intercept = np.asarray(getattr(model, "intercept_", 0.0))
+        if coef.ndim != 1 or intercept.ndim != 0:
+            # multi-target: deixa com o model.predict
+            return None
+        return cls(coef, float(intercept))
+
+    def _buffer(self) -> np.ndarray:
+        # Buffer preallocado por thread (o scorer fica no cache compartilhado)
+        buf = getattr(self._local, "row", None)
+        if buf is None:
+            buf = self._local.row = np.zeros(self.n_features, dtype=np.float64)
+        return buf
+
+    def score_vector(self, x: np.ndarray) -> float:
+        k = min(x.shape[0], self.n_features)
+        _check_finite(x[:k])
+        return float(np.dot(x[:k], self.coef[:k]) + self.intercept)
+
+    def score_row(self, values: List[float]) -> float:
+        k = min(len(values), self.n_features)
+        buf = self._buffer()
+        buf[:k] = values[:k]
+        _check_finite(buf[:k])
+        return float(np.dot(buf[:k], self.coef[:k]) + self.intercept)
+
+    def score_matrix(self, xs: np.ndarray) -> np.ndarray:
+        k = min(xs.shape[1], self.n_features)
+        _check_finite(xs[:, :k])
+        return xs[:, :k] @ self.coef[:k] + self.intercept
+
+
+class FeatureVectorizer:
+    """Converte mapas nome -> valor no vetor na ordem usada no treino.
+
+    Nomes desconhecidos são ignorados e nomes ausentes (ou valores não
+    numéricos) ficam com o valor default, como no fillna do treino.
+    """
+
+    def __init__(self, names: Sequence[str], default: float = 0.0):
+        self.names = list(names)
+        self.index: Dict[str, int] = {n: i for i, n in enumerate(self.names)}
+        self.default = float(default)
+        self.n_features = len(self.names)
+        self._local = threading.local()
+
+    @classmethod
+    def from_schema(cls, schema: Optional[Dict]) -> Optional["FeatureVectorizer"]:
+        if not schema or not schema.get("names"):
+            return None
+        return cls(schema["names"], schema.get("default", 0.0))
+
+    def _fill(self, features: Dict[str, Any], out: np.ndarray) -> np.ndarray:
+        out.fill(self.default)
+        index = self.index
+        for name, value in features.items():
+            i = index.get(name)
+            if i is None:
+                continue
+            try:
+                out[i] = value
+            except (TypeError, ValueError):
+                pass
+        return out
+
+    def transform(self, features: Dict[str, Any]) -> np.ndarray:
+        """Preenche (e devolve) o buffer da thread: use antes da próxima chamada."""
+        buf = getattr(self._local, "row", None)
+        if buf is None:
+            buf = self._local.row = np.empty(self.n_features, dtype=np.float64)
+        return self._fill(features, buf)
+
+    def transform_batch(self, rows: List[Dict[str, Any]]) -> np.ndarray:
+        xs = np.empty((len(rows), self.n_features), dtype=np.float64)
+        for i, r in enumerate(rows):
+            self._fill(r, xs[i])
+        return xs
+
+    def transform_columns(
+        self, columns: Dict[str, List[Any]], n_rows: int
+    ) -> np.ndarray:
+        xs = np.full((n_rows, self.n_features), self.default, dtype=np.float64)
+        for name, values in columns.items():
+            i = self.index.get(name)
+            if i is None:
+                continue
+            try:
+                xs[:, i] = np.asarray(values, dtype=np.float64)
+            except (TypeError, ValueError):
+                for j, v in enumerate(values):
+                    try:
+                        xs[j, i] = v
+                    except (TypeError, ValueError):
+                        pass
+        return xs
+
+
+def schema_path_for(model_path: str) -> str:
+    """Arquivo do schema de features salvo ao lado do modelo (model_x.features.json)."""
+    return os.path.splitext(model_path)[0] + ".features.json"
+
+
+def read_feature_schema(model_path: Optional[str]) -> Optional[Dict]:
+    if not model_path:
+        return None
+    try:
+        with open(schema_path_for(model_path), encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+@dataclass
+class CompiledModel:
+    """Modelo carregado + scorer rápido e vetorizador opcionais, como fica no cache."""
+
+    model: Any
+    scorer: Optional[LinearScorer] = None
+    vectorizer: Optional[FeatureVectorizer] = None
+
+
+def compile_model(model, feature_schema: Optional[Dict] = None) -> CompiledModel:
+    return CompiledModel(
+        model=model,
+        scorer=LinearScorer.from_model(model),
+        vectorizer=FeatureVectorizer.from_schema(feature_schema),
+    )
@@ -0,0 +1,124 @@
+import math
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+# Valores com módulo abaixo disso contam como zero
+_MIN_INDEXABLE = 1e-9
+
+
+class QuantileSketch:
+    """Sketch de quantis mesclável no estilo DDSketch.
+
+    Cada valor cai em uma faixa logarítmica de razão gamma = (1 + a) / (1 - a),
+    então o quantil estimado tem erro relativo de no máximo `alpha`. Mesclar
+    dois sketches é somar as contagens das faixas, o que permite guardar um
+    sketch por hora e combinar horas em dias. Acima de max_bins faixas, as de
+    menor módulo são colapsadas (perde-se precisão só nos valores pequenos).
+    """
+
+    def __init__(self, alpha: float = 0.01, max_bins: int = 2048):
+        self.alpha = float(alpha)
+        self.max_bins = int(max_bins)
+        self._gamma = (1.0 + self.alpha) / (1.0 - self.alpha)
+        self._log_gamma = math.log(self._gamma)
+        self.positive: Dict[int, int] = {}
+        self.negative: Dict[int, int] = {}
+        self.zero = 0
+
+    @property
+    def count(self) -> int:
+        return self.zero + sum(self.positive.values()) + sum(self.negative.values())
+
+    def add_many(self, values: Iterable[float]) -> None:
+        """Acrescenta um lote de valores (NaN/inf são ignorados)."""
+        xs = np.asarray(values, dtype=np.float64)
+        xs = xs[np.isfinite(xs)]
+        small = np.abs(xs) < _MIN_INDEXABLE
+        self.zero += int(small.sum())
+        xs = xs[~small]
+        parts = ((self.positive, xs[xs > 0]), (self.negative, -xs[xs < 0]))
+        for store, part in parts:
+            if not len(part):
+                continue
+            idx = np.ceil(np.log(part) / self._log_gamma).astype(np.int64)
+            keys, counts = np.unique(idx, return_counts=True)
+            for k, c in zip(keys.tolist(), counts.tolist()):
+                store[k] = store.get(k, 0) + c
+        self._collapse()
+
+    def add(self, value: float) -> None:
+        self.add_many([value])
+
+    def merge(self, other: "QuantileSketch") -> None:
+        if other.alpha != self.alpha:
+            raise ValueError("cannot merge sketches with different alpha")
+        self.zero += other.zero
+        pairs = ((self.positive, other.positive), (self.negative, other.negative))
+        for store, src in pairs:
+            for k, c in src.items():
+                store[k] = store.get(k, 0) + c
+        self._collapse()
+
+    def _collapse(self) -> None:
+        for store in (self.positive, self.negative):
+            if len(store) <= self.max_bins:
+                continue
+            keys = sorted(store)
+            cut = keys[len(keys) - self.max_bins]
+            moved = sum(store.pop(k) for k in keys if k < cut)
+            store[cut] += moved
+
+    def _value(self, index: int) -> float:
+        return 2.0 * self._gamma**index / (self._gamma + 1.0)
+
+    def quantile(self, q: float) -> Optional[float]:
+        total = self.count
+        if total == 0:
+            return None
+        rank = q * (total - 1)
+        seen = 0
+        # Ordem crescente: negativos de maior módulo, zero, positivos
+        for k in sorted(self.negative, reverse=True):
+            seen += self.negative[k]
+            if seen > rank:
+                return -self._value(k)
+        seen += self.zero
+        if seen > rank:
+            return 0.0
+        for k in sorted(self.positive):
+            seen += self.positive[k]
+            if seen > rank:
+                return self._value(k)
+        return self._value(max(self.positive)) if self.positive else 0.0
+
+    def to_dict(self) -> Dict:
+        """Forma compacta para coluna JSON: faixas como pares [índice, contagem]."""
+        return {
+            "a": self.alpha,
+            "z": self.zero,
+            "p": sorted([k, c] for k, c in self.positive.items()),
+            "n": sorted([k, c] for k, c in self.negative.items()),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict], max_bins: int = 2048) -> "QuantileSketch":
+        if not data:
+            return cls(max_bins=max_bins)
+        sketch = cls(alpha=data["a"], max_bins=max_bins)
+        sketch.zero = int(data.get("z", 0))
+        sketch.positive = {int(k): int(c) for k, c in data.get("p", [])}
+        sketch.negative = {int(k): int(c) for k, c in data.get("n", [])}
+        return sketch
+
+
+def merged(sketches: List[Optional[Dict]]) -> QuantileSketch:
+    """Mescla sketches serializados (to_dict) em um só."""
+    out = None
+    for data in sketches:
+        sketch = QuantileSketch.from_dict(data)
+        if out is None:
+            out = sketch
+        else:
+            out.merge(sketch)
+    return out if out is not None else QuantileSketch()
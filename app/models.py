@@ -1,6 +1,17 @@
 from datetime import datetime
 
-from sqlalchemy import JSON, Column, DateTime, Float, ForeignKey, Integer, String
+from sqlalchemy import (
+    JSON,
+    Column,
+    DateTime,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    LargeBinary,
+    String,
+    UniqueConstraint,
+)
 from sqlalchemy.orm import relationship
 
 from .db import Base
@@ -13,14 +24,25 @@ class ModelRegistry(Base):
     version = Column(String(100), nullable=False)
     model_path = Column(String(500), nullable=True)  # Caminho do modelo salvo localmente
     mlflow_run_id = Column(String(100), nullable=True)  # Mantido apenas para compatibilidade com dados antigos
+    # {"names": [...], "default": 0.0} do treino
+    feature_schema = Column(JSON, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
+    __table_args__ = (
+        # /models: ordenação (created_at, id) com ou sem filtro por flavor
+        Index("ix_models_created_at_id", "created_at", "id"),
+        Index("ix_models_flavor_created_at_id", "flavor", "created_at", "id"),
+    )
+
 
 class Prediction(Base):
     __tablename__ = "predictions"
     id = Column(String(64), primary_key=True)
     model_id = Column(Integer, ForeignKey("models.id"), nullable=False)
-    features = Column(JSON, nullable=False)
+    features = Column(JSON, nullable=False)  # JSON null quando empacotadas
+    # FEATURE_STORAGE=float32/float64: valores em array little-endian (app.features)
+    features_packed = Column(LargeBinary, nullable=True)
+    feature_schema_id = Column(Integer, ForeignKey("feature_schemas.id"), nullable=True)
     prediction = Column(Float, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
@@ -31,6 +53,14 @@ class Prediction(Base):
         cascade="all, delete-orphan",
     )
 
+    __table_args__ = (
+        # /predictions: ordenação/cursor (created_at, id), com ou sem model_id
+        Index("ix_predictions_created_at_id", "created_at", "id"),
+        Index("ix_predictions_model_id_created_at_id", "model_id", "created_at", "id"),
+        # PREDICTION_ID_FORMAT=uuid7: a ordem por model_id vem só do id
+        Index("ix_predictions_model_id_id", "model_id", "id"),
+    )
+
 
 class PredictionMetric(Base):
     __tablename__ = "prediction_metrics"
@@ -38,9 +68,39 @@ class PredictionMetric(Base):
     prediction_id = Column(String(64), ForeignKey("predictions.id"), nullable=False)
     name = Column(String(100), nullable=False)
     value = Column(Float, nullable=False)
+    # Cópia de predictions.created_at: chave de partição (app.partitioning)
+    created_at = Column(DateTime, nullable=True)
 
     prediction_obj = relationship("Prediction", back_populates="metrics")
 
+    __table_args__ = (
+        # /metrics: filtros por prediction_id (e name) e por name, em ordem de id
+        Index("ix_prediction_metrics_prediction_id_name", "prediction_id", "name"),
+        Index("ix_prediction_metrics_prediction_id_id", "prediction_id", "id"),
+        Index("ix_prediction_metrics_name_id", "name", "id"),
+        # /metrics/summary: cobre (name -> prediction_id, value) sem ler a tabela
+        Index(
+            "ix_prediction_metrics_name_prediction_id_value",
+            "name",
+            "prediction_id",
+            "value",
+        ),
+        # SQLite particionado: ids movidos para os arquivos de mês não são
+        # reusados no banco principal (o cursor de /metrics segue o id)
+        {"sqlite_autoincrement": True},
+    )
+
+
+class FeatureSchema(Base):
+    """Nomes (em ordem) e dtype das features empacotadas, guardados uma vez só."""
+
+    __tablename__ = "feature_schemas"
+    id = Column(Integer, primary_key=True)
+    digest = Column(String(64), nullable=False, unique=True)  # blake2b de dtype+nomes
+    names = Column(JSON, nullable=False)
+    dtype = Column(String(10), nullable=False)  # "float32" ou "float64"
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
 
 class Retraining(Base):
     __tablename__ = "retrainings"
@@ -52,3 +112,37 @@ class Retraining(Base):
 
     model = relationship("ModelRegistry")
 
+    __table_args__ = (Index("ix_retrainings_created_at_id", "created_at", "id"),)
+
+
+class MetricRollup(Base):
+    """Agregado de uma métrica por modelo e hora, mantido junto com os INSERTs."""
+
+    __tablename__ = "metric_rollups"
+    id = Column(Integer, primary_key=True)
+    model_id = Column(Integer, ForeignKey("models.id"), nullable=False)
+    name = Column(String(100), nullable=False)
+    bucket_start = Column(DateTime, nullable=False)  # início da hora (UTC)
+    count = Column(Integer, nullable=False, default=0)
+    sum = Column(Float, nullable=False, default=0.0)
+    sum_sq = Column(Float, nullable=False, default=0.0)
+    min = Column(Float, nullable=True)
+    max = Column(Float, nullable=True)
+    sketch = Column(JSON, nullable=True)  # QuantileSketch.to_dict()
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        # Upsert por chave e leitura por (name, model_id) em ordem de hora
+        UniqueConstraint(
+            "name", "model_id", "bucket_start", name="uq_metric_rollups_key"
+        ),
+    )
+
+
+class ChangeCounter(Base):
+    """Contador de gerações por assunto (ex.: modelo ativo), lido pelos processos."""
+
+    __tablename__ = "change_counters"
+    name = Column(String(50), primary_key=True)
+    value = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
@@ -0,0 +1,574 @@
+"""Particionamento mensal de predictions e prediction_metrics (opcional).
+
+Postgres: particionamento declarativo por RANGE (created_at), uma partição por
+mês (predictions_y2026m10, ...) mais uma DEFAULT. `manage.py partition-tables`
+converte as tabelas existentes e `manage.py rotate-partitions` cria as
+partições dos próximos meses. Consultas com filtro em created_at só leem as
+partições do intervalo, e a retenção vira DETACH + DROP de partições inteiras.
+
+SQLite: o banco principal guarda o mês corrente; `rotate-partitions` move os
+meses fechados para arquivos <SQLITE_PARTITION_DIR>/<AAAA>_<MM>.db. Cada
+conexão anexa (ATTACH) os SQLITE_PARTITION_ATTACH_MONTHS meses mais recentes e
+lê tudo pelas views TEMP predictions_all / prediction_metrics_all (UNION ALL);
+meses mais antigos ficam fora das views, mas DELETE /records e a purga
+(month_engines) alcançam todos os arquivos. prediction_metrics usa
+AUTOINCREMENT para que o banco principal não reuse ids já movidos.
+
+prediction_metrics ganha created_at (cópia do created_at da predição) para
+ser particionada pela mesma chave e para o JOIN entre as duas casar partição
+com partição.
+"""
+
+import os
+import re
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import and_, column, create_engine, make_url, table
+from sqlalchemy.orm import aliased
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+from .config import Settings
+from .models import Prediction, PredictionMetric
+
+settings = Settings()
+
+TABLES = ("predictions", "prediction_metrics")
+_MODELS = {"predictions": Prediction, "prediction_metrics": PredictionMetric}
+
+_PARTITION = re.compile(r"_y(\d{4})m(\d{2})$")
+_MONTH_FILE = re.compile(r"^(\d{4})_(\d{2})\.db$")
+
+
+def month_start(d: datetime) -> datetime:
+    return d.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def next_month(d: datetime) -> datetime:
+    d = month_start(d)
+    return d.replace(year=d.year + d.month // 12, month=d.month % 12 + 1)
+
+
+def months_between(lo: datetime, hi: datetime) -> Iterator[datetime]:
+    """Inícios de mês de lo (inclusive) até hi (exclusive)."""
+    month = month_start(lo)
+    while month < hi:
+        yield month
+        month = next_month(month)
+
+
+def backend() -> str:
+    """"postgresql" ou "sqlite" quando o particionamento está ligado; senão ""."""
+    if not settings.partitioning_enabled:
+        return ""
+    name = make_url(settings.db_url).get_backend_name()
+    return name if name in ("postgresql", "sqlite") else ""
+
+
+# ---------------------------------------------------------------- leitura
+
+
+def _view(name: str):
+    columns = [column(c.name, c.type) for c in _MODELS[name].__table__.c]
+    return table(name + "_all", *columns)
+
+
+_VIEWS = {name: _view(name) for name in TABLES}
+_ENTITIES = {
+    name: aliased(_MODELS[name], _VIEWS[name], adapt_on_names=True) for name in TABLES
+}
+
+
+def read_tables():
+    """(predictions, prediction_metrics) para consultas de leitura.
+
+    No SQLite particionado são as views que juntam o banco principal e os meses
+    anexados; nos demais casos, as próprias tabelas.
+    """
+    if backend() == "sqlite":
+        return _VIEWS["predictions"], _VIEWS["prediction_metrics"]
+    return Prediction.__table__, PredictionMetric.__table__
+
+
+def prediction_entity():
+    """Prediction (ORM) para listagens, lida pela view no SQLite particionado."""
+    return _ENTITIES["predictions"] if backend() == "sqlite" else Prediction
+
+
+def metric_entity():
+    if backend() == "sqlite":
+        return _ENTITIES["prediction_metrics"]
+    return PredictionMetric
+
+
+def metric_join(p, m):
+    """JOIN métrica -> predição; no Postgres particionado casa também created_at.
+
+    Com a chave de partição no JOIN o planejador junta partição com partição
+    (enable_partitionwise_join). No SQLite não há poda nas views, e a condição
+    extra só tiraria o índice de cobertura de prediction_metrics.
+    """
+    cond = m.c.prediction_id == p.c.id
+    if backend() == "postgresql":
+        cond = and_(cond, m.c.created_at == p.c.created_at)
+    return cond
+
+
+# ---------------------------------------------------------------- Postgres
+
+
+def _partition_name(base: str, month: datetime) -> str:
+    return "%s_y%04dm%02d" % (base, month.year, month.month)
+
+
+def _pg_partitions(conn, parent: str) -> List[str]:
+    return list(
+        conn.exec_driver_sql(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = %(parent)s",
+            {"parent": parent},
+        ).scalars()
+    )
+
+
+def pg_is_partitioned(conn, name: str) -> bool:
+    kind = conn.exec_driver_sql(
+        "SELECT relkind FROM pg_class WHERE relname = %(name)s", {"name": name}
+    ).scalar()
+    return kind == "p"
+
+
+def _horizon(months_ahead: int) -> datetime:
+    """Fim (exclusive) do último mês coberto: o corrente mais months_ahead."""
+    end = month_start(datetime.utcnow())
+    for _ in range(months_ahead + 1):
+        end = next_month(end)
+    return end
+
+
+def _pg_create_partitions(
+    conn, parent: str, base: str, months: List[datetime]
+) -> List[str]:
+    existing = set(_pg_partitions(conn, parent))
+    created = []
+    for month in months:
+        name = _partition_name(base, month)
+        if name in existing:
+            continue
+        conn.exec_driver_sql(
+            "CREATE TABLE %s PARTITION OF %s FOR VALUES FROM ('%s') TO ('%s')"
+            % (name, parent, month.isoformat(), next_month(month).isoformat())
+        )
+        created.append(name)
+    if base + "_default" not in existing:
+        conn.exec_driver_sql(
+            "CREATE TABLE %s_default PARTITION OF %s DEFAULT" % (base, parent)
+        )
+        created.append(base + "_default")
+    return created
+
+
+def pg_ensure(conn, months_ahead: int) -> List[str]:
+    """Cria as partições do mês corrente e dos próximos months_ahead meses.
+
+    A partição DEFAULT deve ficar vazia: se tiver linhas do mês a criar, o
+    Postgres recusa a criação.
+    """
+    months = list(months_between(datetime.utcnow(), _horizon(months_ahead)))
+    created = []
+    for base in TABLES:
+        created += _pg_create_partitions(conn, base, base, months)
+    return created
+
+
+def pg_convert(conn, months_ahead: int) -> List[str]:
+    """Converte predictions/prediction_metrics em tabelas particionadas por mês.
+
+    Roda em uma única transação (conn vem de engine.begin()): cria as tabelas
+    particionadas com as partições que cobrem os dados existentes, copia as
+    linhas, troca os nomes e recria PKs, FKs e índices. A PK passa a ser
+    (id, created_at), e a FK prediction_metrics -> predictions vira
+    (prediction_id, created_at) -> (id, created_at). As tabelas ficam
+    bloqueadas durante a cópia: rode numa janela de manutenção.
+    """
+    if pg_is_partitioned(conn, "predictions"):
+        return []
+    conn.exec_driver_sql(
+        "UPDATE prediction_metrics m SET created_at = p.created_at "
+        "FROM predictions p WHERE p.id = m.prediction_id AND m.created_at IS NULL"
+    )
+    # Métricas órfãs (sem predição) não têm de onde herdar a data
+    conn.exec_driver_sql("DELETE FROM prediction_metrics WHERE created_at IS NULL")
+    oldest = conn.exec_driver_sql("SELECT min(created_at) FROM predictions").scalar()
+    months = list(months_between(oldest or datetime.utcnow(), _horizon(months_ahead)))
+
+    created = []
+    for base in TABLES:
+        conn.exec_driver_sql(
+            "CREATE TABLE %s_part (LIKE %s INCLUDING DEFAULTS) "
+            "PARTITION BY RANGE (created_at)" % (base, base)
+        )
+        conn.exec_driver_sql(
+            "ALTER TABLE %s_part ALTER COLUMN created_at SET NOT NULL" % base
+        )
+        created += _pg_create_partitions(conn, base + "_part", base, months)
+    # A sequência do id das métricas passa para a tabela nova antes do DROP
+    seq = conn.exec_driver_sql(
+        "SELECT pg_get_serial_sequence('prediction_metrics', 'id')"
+    ).scalar()
+    if seq:
+        conn.exec_driver_sql(
+            "ALTER SEQUENCE %s OWNED BY prediction_metrics_part.id" % seq
+        )
+    for base in TABLES:
+        conn.exec_driver_sql("INSERT INTO %s_part SELECT * FROM %s" % (base, base))
+    conn.exec_driver_sql("DROP TABLE prediction_metrics")
+    conn.exec_driver_sql("DROP TABLE predictions")
+    for base in TABLES:
+        conn.exec_driver_sql("ALTER TABLE %s_part RENAME TO %s" % (base, base))
+        # A chave de partição precisa fazer parte da PK
+        conn.exec_driver_sql("ALTER TABLE %s ADD PRIMARY KEY (id, created_at)" % base)
+        for index in sorted(_MODELS[base].__table__.indexes, key=lambda ix: ix.name):
+            conn.exec_driver_sql(str(CreateIndex(index).compile(dialect=conn.dialect)))
+    conn.exec_driver_sql(
+        "ALTER TABLE predictions ADD FOREIGN KEY (model_id) REFERENCES models (id)"
+    )
+    conn.exec_driver_sql(
+        "ALTER TABLE predictions ADD FOREIGN KEY (feature_schema_id) "
+        "REFERENCES feature_schemas (id)"
+    )
+    # Com a PK (id, created_at) a FK das métricas usa a chave composta
+    conn.exec_driver_sql(
+        "ALTER TABLE prediction_metrics ADD FOREIGN KEY (prediction_id, created_at) "
+        "REFERENCES predictions (id, created_at)"
+    )
+    return created
+
+
+def pg_drop_before(engine, cutoff: datetime) -> List[str]:
+    """Remove as partições mensais que terminam até cutoff (métricas e predições).
+
+    Cada partição é desanexada antes do DROP (a de predictions é referenciada
+    pela FK das métricas, cuja partição do mês já saiu). No Postgres 14+ sem
+    partição DEFAULT usa DETACH ... CONCURRENTLY, que não bloqueia as consultas
+    na tabela pai. Caso contrário o DETACH pega um lock exclusivo breve na
+    tabela pai, limitado por lock_timeout para não enfileirar o tráfego atrás
+    de consultas longas.
+    """
+    dropped = []
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.exec_driver_sql("SET lock_timeout = '5s'")
+        for base in ("prediction_metrics", "predictions"):
+            partitions = _pg_partitions(conn, base)
+            concurrently = (
+                conn.dialect.server_version_info >= (14,)
+                and base + "_default" not in partitions
+            )
+            for name in sorted(partitions):
+                match = _PARTITION.search(name)
+                if not match:
+                    continue
+                month = datetime(int(match.group(1)), int(match.group(2)), 1)
+                if next_month(month) > cutoff:
+                    continue
+                conn.exec_driver_sql(
+                    "ALTER TABLE %s DETACH PARTITION %s%s"
+                    % (base, name, " CONCURRENTLY" if concurrently else "")
+                )
+                conn.exec_driver_sql("DROP TABLE %s" % name)
+                dropped.append(name)
+    return dropped
+
+
+# ---------------------------------------------------------------- SQLite
+
+
+def _month_files(directory: str) -> List[Tuple[datetime, str]]:
+    """Arquivos de mês em directory, do mais recente para o mais antigo."""
+    if not os.path.isdir(directory):
+        return []
+    out = []
+    for name in os.listdir(directory):
+        match = _MONTH_FILE.match(name)
+        if match:
+            month = datetime(int(match.group(1)), int(match.group(2)), 1)
+            out.append((month, os.path.join(directory, name)))
+    return sorted(out, reverse=True)
+
+
+def _month_path(directory: str, month: datetime) -> str:
+    return os.path.join(directory, "%04d_%02d.db" % (month.year, month.month))
+
+
+def _columns(name: str) -> str:
+    return ", ".join(c.name for c in _MODELS[name].__table__.c)
+
+
+def sqlite_attach(dbapi_connection, info: Dict) -> None:
+    """Anexa os meses mais recentes e (re)cria as views TEMP *_all.
+
+    Chamado no connect e em cada checkout do pool: só refaz o trabalho quando
+    o diretório de partições mudou (arquivo de mês criado ou apagado).
+    """
+    directory = settings.sqlite_partition_dir
+    try:
+        signature = os.stat(directory).st_mtime_ns
+    except FileNotFoundError:
+        signature = None
+    if info.get("partitions") == (signature,):
+        return
+    cursor = dbapi_connection.cursor()
+    for name in TABLES:
+        cursor.execute("DROP VIEW IF EXISTS temp.%s_all" % name)
+    for schema in info.get("partitions_attached", []):
+        cursor.execute("DETACH DATABASE %s" % schema)
+    attached = []
+    months = _month_files(directory)[: settings.sqlite_partition_attach_months]
+    for month, path in months:
+        schema = "m_%04d_%02d" % (month.year, month.month)
+        cursor.execute("ATTACH DATABASE ? AS %s" % schema, (path,))
+        attached.append(schema)
+    for name in TABLES:
+        cols = _columns(name)
+        parts = ["SELECT %s FROM main.%s" % (cols, name)]
+        parts += ["SELECT %s FROM %s.%s" % (cols, s, name) for s in attached]
+        union = " UNION ALL ".join(parts)
+        cursor.execute("CREATE TEMP VIEW %s_all AS %s" % (name, union))
+    cursor.close()
+    info["partitions"] = (signature,)
+    info["partitions_attached"] = attached
+
+
+def _create_month_file(path: str) -> None:
+    engine = create_engine("sqlite:///" + path)
+    try:
+        tables = [m.__table__ for m in _MODELS.values()]
+        Prediction.metadata.create_all(bind=engine, tables=tables)
+    finally:
+        engine.dispose()
+
+
+def sqlite_add_columns() -> List[str]:
+    """Acrescenta aos arquivos de mês as colunas novas dos modelos (migrate-db)."""
+    added = []
+    dialect = create_engine("sqlite://").dialect
+    for _, path in _month_files(settings.sqlite_partition_dir):
+        con = sqlite3.connect(path)
+        try:
+            for name in TABLES:
+                have = {r[1] for r in con.execute("PRAGMA table_info(%s)" % name)}
+                for col in _MODELS[name].__table__.c:
+                    if col.name in have:
+                        continue
+                    con.execute(
+                        "ALTER TABLE %s ADD COLUMN %s %s"
+                        % (name, col.name, col.type.compile(dialect=dialect))
+                    )
+                    added.append("%s:%s.%s" % (os.path.basename(path), name, col.name))
+            con.commit()
+        finally:
+            con.close()
+    return added
+
+
+def _sqlite_keep_metric_ids(con: sqlite3.Connection, directory: str) -> None:
+    """Garante que main.prediction_metrics não reuse ids movidos para os meses.
+
+    Sem AUTOINCREMENT o SQLite dá max(id) + 1 ao próximo INSERT: com os maiores
+    ids já nos arquivos de mês, /metrics (prediction_metrics_all) teria ids
+    repetidos e o cursor por id pularia ou repetiria linhas. Bancos criados
+    antes da opção têm a tabela refeita uma vez; sqlite_sequence passa a
+    começar depois do maior id de qualquer arquivo de mês.
+    """
+    sql = con.execute(
+        "SELECT sql FROM main.sqlite_master "
+        "WHERE type = 'table' AND name = 'prediction_metrics'"
+    ).fetchone()[0]
+    metrics = PredictionMetric.__table__
+    dialect = create_engine("sqlite://").dialect
+    cols = _columns("prediction_metrics")
+    con.execute("BEGIN IMMEDIATE")
+    try:
+        if "AUTOINCREMENT" not in sql.upper():
+            con.execute("ALTER TABLE prediction_metrics RENAME TO _metrics_old")
+            con.execute(str(CreateTable(metrics).compile(dialect=dialect)))
+            con.execute(
+                "INSERT INTO prediction_metrics (%s) SELECT %s FROM _metrics_old"
+                % (cols, cols)
+            )
+            con.execute("DROP TABLE _metrics_old")
+            for index in sorted(metrics.indexes, key=lambda ix: ix.name):
+                con.execute(str(CreateIndex(index).compile(dialect=dialect)))
+        top = 0
+        for _, path in _month_files(directory):
+            month = sqlite3.connect(path)
+            try:
+                (last,) = month.execute(
+                    "SELECT max(id) FROM prediction_metrics"
+                ).fetchone()
+            finally:
+                month.close()
+            top = max(top, last or 0)
+        seq = con.execute(
+            "SELECT seq FROM sqlite_sequence WHERE name = 'prediction_metrics'"
+        ).fetchone()
+        if seq is None:
+            con.execute(
+                "INSERT INTO sqlite_sequence (name, seq) "
+                "VALUES ('prediction_metrics', ?)",
+                (top,),
+            )
+        elif seq[0] < top:
+            con.execute(
+                "UPDATE sqlite_sequence SET seq = ? WHERE name = 'prediction_metrics'",
+                (top,),
+            )
+        con.execute("COMMIT")
+    except BaseException:
+        con.execute("ROLLBACK")
+        raise
+
+
+def sqlite_rotate(db_url: str, chunk_size: int = 5000) -> Dict[str, int]:
+    """Move os meses fechados do banco principal para os arquivos de mês.
+
+    Cada bloco é uma transação curta (BEGIN IMMEDIATE). Em WAL a transação
+    entre dois arquivos não é atômica como um todo, então a cópia usa INSERT
+    OR IGNORE: repetir a rotação depois de uma falha não duplica linhas.
+    Antes de mover, o id das métricas passa a nunca reusar valores antigos
+    (ver _sqlite_keep_metric_ids).
+    """
+    directory = settings.sqlite_partition_dir
+    os.makedirs(directory, exist_ok=True)
+    con = sqlite3.connect(
+        make_url(db_url).database,
+        timeout=settings.sqlite_busy_timeout_ms / 1000.0,
+        isolation_level=None,
+    )
+    moved: Dict[str, int] = {}
+    pred_cols, metric_cols = _columns("predictions"), _columns("prediction_metrics")
+    try:
+        _sqlite_keep_metric_ids(con, directory)
+        oldest = con.execute("SELECT min(created_at) FROM predictions").fetchone()[0]
+        if oldest is None:
+            return moved
+        current = month_start(datetime.utcnow())
+        for month in months_between(datetime.fromisoformat(oldest), current):
+            path = _month_path(directory, month)
+            if not os.path.exists(path):
+                _create_month_file(path)
+            con.execute("ATTACH DATABASE ? AS rot", (path,))
+            lo, hi = str(month), str(next_month(month))
+            total = 0
+            try:
+                while True:
+                    con.execute("BEGIN IMMEDIATE")
+                    ids = [
+                        r[0]
+                        for r in con.execute(
+                            "SELECT id FROM main.predictions "
+                            "WHERE created_at >= ? AND created_at < ? "
+                            "ORDER BY created_at, id LIMIT ?",
+                            (lo, hi, chunk_size),
+                        )
+                    ]
+                    if ids:
+                        marks = ",".join("?" * len(ids))
+                        con.execute(
+                            "INSERT OR IGNORE INTO rot.predictions (%s) SELECT %s "
+                            "FROM main.predictions WHERE id IN (%s)"
+                            % (pred_cols, pred_cols, marks),
+                            ids,
+                        )
+                        con.execute(
+                            "INSERT OR IGNORE INTO rot.prediction_metrics (%s) "
+                            "SELECT %s FROM main.prediction_metrics "
+                            "WHERE prediction_id IN (%s)"
+                            % (metric_cols, metric_cols, marks),
+                            ids,
+                        )
+                        con.execute(
+                            "DELETE FROM main.prediction_metrics "
+                            "WHERE prediction_id IN (%s)" % marks,
+                            ids,
+                        )
+                        con.execute(
+                            "DELETE FROM main.predictions WHERE id IN (%s)" % marks, ids
+                        )
+                    con.execute("COMMIT")
+                    total += len(ids)
+                    if len(ids) < chunk_size:
+                        break
+            finally:
+                con.execute("DETACH DATABASE rot")
+            if total:
+                moved[os.path.basename(path)] = total
+    finally:
+        con.close()
+    return moved
+
+
+def sqlite_drop_before(cutoff: datetime) -> List[str]:
+    """Apaga os arquivos de mês que terminam até cutoff."""
+    dropped = []
+    for month, path in _month_files(settings.sqlite_partition_dir):
+        if next_month(month) > cutoff:
+            continue
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        dropped.append(os.path.basename(path))
+    return dropped
+
+
+@contextmanager
+def month_engines(before: Optional[datetime] = None) -> Iterator[List]:
+    """Engines dos arquivos de mês do SQLite particionado, do mais antigo.
+
+    Para escritas que precisam alcançar todos os meses (DELETE /records,
+    purga), inclusive os que não são anexados às views. Com before, só os
+    meses que começam antes dele. Lista vazia sem particionamento no SQLite.
+    """
+    engines = []
+    if backend() == "sqlite":
+        timeout = settings.sqlite_busy_timeout_ms / 1000.0
+        for month, path in reversed(_month_files(settings.sqlite_partition_dir)):
+            if before is None or month < before:
+                engines.append(
+                    create_engine(
+                        "sqlite:///" + path, connect_args={"timeout": timeout}
+                    )
+                )
+    try:
+        yield engines
+    finally:
+        for engine in engines:
+            engine.dispose()
+
+
+def drop_before(engine, cutoff: datetime) -> List[str]:
+    """Retenção por partição: remove os meses inteiros anteriores a cutoff."""
+    kind = backend()
+    if kind == "postgresql":
+        return pg_drop_before(engine, cutoff)
+    if kind == "sqlite":
+        return sqlite_drop_before(cutoff)
+    return []
+
+
+def rotate(engine, months_ahead: Optional[int] = None) -> Dict:
+    """Tarefa periódica: partições futuras no Postgres, meses fechados no SQLite."""
+    kind = backend()
+    ahead = settings.partition_months_ahead if months_ahead is None else months_ahead
+    if kind == "postgresql":
+        with engine.begin() as conn:
+            return {"created": pg_ensure(conn, ahead)}
+    if kind == "sqlite":
+        return {"moved": sqlite_rotate(str(engine.url))}
+    raise RuntimeError(
+        "partitioning requires PARTITIONING_ENABLED on Postgres or SQLite"
+    )
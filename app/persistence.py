@@ -0,0 +1,262 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from . import rollups
+from .config import Settings
+from .db import get_engine
+from .features import packer
+from .models import Prediction, PredictionMetric
+
+logger = logging.getLogger(__name__)
+
+_POLICIES = {"drop", "block", "spill"}
+
+_PREDICTIONS = Prediction.__table__
+_PREDICTION_METRICS = PredictionMetric.__table__
+
+
+def write_predictions(
+    session: Session, pred_rows: List[Dict], metric_rows: List[Dict]
+) -> None:
+    """Insere predições e métricas na transação corrente (sem commit).
+
+    Usa INSERTs do Core (executemany) direto nas tabelas: nenhum objeto ORM é
+    criado nem entra no identity map da sessão. As features são empacotadas
+    aqui (FEATURE_STORAGE), então a fila e o spill do write-behind guardam dicts.
+    """
+    if pred_rows:
+        session.execute(_PREDICTIONS.insert(), packer.pack_rows(session, pred_rows))
+    if metric_rows:
+        session.execute(_PREDICTION_METRICS.insert(), metric_rows)
+        if _settings.rollups_enabled:
+            rollups.record(session, pred_rows, metric_rows)
+
+
+_Item = Tuple[float, List[Dict], List[Dict]]
+
+
+class WriteBehindWriter:
+    """Fila limitada em memória drenada por uma thread que grava em lote.
+
+    O /predict responde assim que as linhas entram na fila. Quando a fila está
+    cheia, a política define o que acontece: "drop" descarta, "block" espera
+    por espaço e "spill" grava as linhas em um arquivo JSONL local, que é
+    reprocessado quando a fila esvazia.
+    """
+
+    def __init__(
+        self,
+        db_url: str,
+        max_queue: int = 10000,
+        batch_size: int = 500,
+        policy: str = "block",
+        spill_path: str = "./write_behind_spill.jsonl",
+        flush_timeout: float = 10.0,
+    ):
+        if policy not in _POLICIES:
+            raise ValueError("Unsupported write-behind policy: %s" % policy)
+        self.db_url = db_url
+        self.max_queue = max(1, int(max_queue))
+        self.batch_size = max(1, int(batch_size))
+        self.policy = policy
+        self.spill_path = spill_path
+        self.flush_timeout = flush_timeout
+        self._queue: "queue.Queue[_Item]" = queue.Queue(maxsize=self.max_queue)
+        self._lock = threading.Lock()
+        self._spill_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._inflight_since: Optional[float] = None
+        self._written = 0
+        self._dropped = 0
+        self._spilled = 0
+        self._errors = 0
+
+    def _ensure_worker(self) -> None:
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._queue = queue.Queue(maxsize=self.max_queue)
+            self._stop.clear()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(
+                target=self._run, name="write-behind", daemon=True
+            )
+            self._thread.start()
+
+    def submit(self, pred_rows: List[Dict], metric_rows: List[Dict]) -> bool:
+        """Enfileira as linhas; retorna False se foram descartadas (política drop)."""
+        self._ensure_worker()
+        item = (time.monotonic(), pred_rows, metric_rows)
+        if self.policy == "block":
+            self._queue.put(item)
+            return True
+        try:
+            self._queue.put_nowait(item)
+            return True
+        except queue.Full:
+            if self.policy == "spill":
+                self._spill([item])
+                return True
+            with self._lock:
+                self._dropped += len(pred_rows)
+            return False
+
+    def _run(self) -> None:
+        while not (self._stop.is_set() and self._queue.empty()):
+            try:
+                first = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                self._replay_spill()
+                continue
+            batch = [first]
+            n_rows = len(first[1])
+            while n_rows < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                batch.append(item)
+                n_rows += len(item[1])
+            self._write_batch(batch)
+
+    def _write_batch(self, batch: List[_Item]) -> None:
+        self._inflight_since = batch[0][0]
+        pred_rows = [r for item in batch for r in item[1]]
+        metric_rows = [r for item in batch for r in item[2]]
+        try:
+            for attempt in range(3):
+                try:
+                    with Session(get_engine(self.db_url)) as session:
+                        write_predictions(session, pred_rows, metric_rows)
+                        session.commit()
+                    with self._lock:
+                        self._written += len(pred_rows)
+                    return
+                except Exception:
+                    if attempt == 2:
+                        raise
+                    time.sleep(0.1 * (attempt + 1))
+        except Exception:
+            with self._lock:
+                self._errors += 1
+            if self.policy == "spill":
+                logger.exception(
+                    "write-behind: falha ao gravar %d predições; vão para o spill",
+                    len(pred_rows),
+                )
+                self._spill(batch)
+            else:
+                # Sem spill as linhas se perdem: o erro diz quantas
+                logger.exception(
+                    "write-behind: %d predições descartadas após 3 tentativas "
+                    "(política %s)",
+                    len(pred_rows),
+                    self.policy,
+                )
+                with self._lock:
+                    self._dropped += len(pred_rows)
+        finally:
+            self._inflight_since = None
+
+    def _spill(self, items: List[_Item]) -> None:
+        with self._spill_lock, open(self.spill_path, "a", encoding="utf-8") as fh:
+            for _, pred_rows, metric_rows in items:
+                fh.write(
+                    json.dumps(
+                        {"predictions": pred_rows, "metrics": metric_rows},
+                        default=_json_default,
+                    )
+                )
+                fh.write("\n")
+        with self._lock:
+            self._spilled += sum(len(item[1]) for item in items)
+
+    def _replay_spill(self) -> None:
+        if not os.path.exists(self.spill_path):
+            return
+        replay_path = self.spill_path + ".replay"
+        with self._spill_lock:
+            if not os.path.exists(replay_path):
+                os.replace(self.spill_path, replay_path)
+        batch: List[_Item] = []
+        with open(replay_path, encoding="utf-8") as fh:
+            for line in fh:
+                if not line.strip():
+                    continue
+                data = json.loads(line)
+                for row in data["predictions"]:
+                    row["created_at"] = datetime.fromisoformat(row["created_at"])
+                for row in data["metrics"]:
+                    if row.get("created_at"):
+                        row["created_at"] = datetime.fromisoformat(row["created_at"])
+                batch.append((time.monotonic(), data["predictions"], data["metrics"]))
+                if sum(len(item[1]) for item in batch) >= self.batch_size:
+                    self._write_batch(batch)
+                    batch = []
+        if batch:
+            self._write_batch(batch)
+        # Linhas que falharam de novo já voltaram para o arquivo de spill
+        os.remove(replay_path)
+
+    def close(self) -> None:
+        """Para o worker depois de drenar a fila (no encerramento do processo)."""
+        if self._thread is None or self._pid != os.getpid():
+            return
+        self._stop.set()
+        self._thread.join(timeout=self.flush_timeout)
+        if self._thread.is_alive():
+            logger.warning(
+                "write-behind: %d itens ainda na fila no encerramento",
+                self._queue.qsize(),
+            )
+        self._thread = None
+
+    def stats(self) -> Dict:
+        now = time.monotonic()
+        with self._queue.mutex:
+            head = self._queue.queue[0][0] if self._queue.queue else None
+        oldest = min(
+            (t for t in (head, self._inflight_since) if t is not None), default=None
+        )
+        with self._lock:
+            return {
+                "policy": self.policy,
+                "depth": self._queue.qsize(),
+                "max_queue": self.max_queue,
+                "lag_seconds": (now - oldest) if oldest is not None else 0.0,
+                "written": self._written,
+                "dropped": self._dropped,
+                "spilled": self._spilled,
+                "errors": self._errors,
+            }
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError("Object of type %s is not JSON serializable" % type(value).__name__)
+
+
+_settings = Settings()
+write_behind = WriteBehindWriter(
+    db_url=_settings.db_url,
+    max_queue=_settings.write_behind_queue_size,
+    batch_size=_settings.write_behind_batch_size,
+    policy=_settings.write_behind_policy,
+    spill_path=_settings.write_behind_spill_path,
+    flush_timeout=_settings.write_behind_flush_timeout_s,
+)
+atexit.register(write_behind.close)
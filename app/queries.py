@@ -0,0 +1,190 @@
+"""Consultas de listagem e serialização, compartilhadas pelas APIs Flask e ASGI.
+
+As funções recebem os parâmetros da query string como um Mapping (request.args
+no Flask, request.query_params no Starlette) e devolvem uma ListQuery.
+
+Paginação: com `cursor` a consulta é por keyset (WHERE sobre a chave de
+ordenação, sem OFFSET), e o custo não cresce com a profundidade da página. O
+parâmetro `page` (OFFSET) continua aceito por compatibilidade. O cursor da
+próxima página vai no header X-Next-Cursor.
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
+
+from sqlalchemy import literal, select, tuple_
+
+from . import partitioning
+from .config import Settings
+from .features import packer
+from .models import ModelRegistry, Prediction, PredictionMetric, Retraining
+from .services import BadRequest
+
+settings = Settings()
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class ListQuery(NamedTuple):
+    # SELECT com LIMIT size + 1: a linha extra indica se há próxima página
+    stmt: object
+    size: int
+    cursor_of: Callable[[object], List]
+
+    def page(self, rows: Iterable) -> Tuple[List, Optional[str]]:
+        """Corta a linha extra: (linhas, cursor da próxima página ou None)."""
+        rows = list(rows)
+        if len(rows) <= self.size:
+            return rows, None
+        rows = rows[: self.size]
+        return rows, encode_cursor(self.cursor_of(rows[-1]))
+
+
+def encode_cursor(values: List) -> str:
+    raw = json.dumps(
+        [v.isoformat() if isinstance(v, datetime) else v for v in values],
+        separators=(",", ":"),
+    )
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, n_values: int, has_datetime: bool) -> List:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != n_values:
+            raise ValueError(cursor)
+        if has_datetime:
+            values[0] = datetime.fromisoformat(values[0])
+        return values
+    except (ValueError, TypeError):
+        raise BadRequest("invalid cursor")
+
+
+def _size(args: Mapping, default_size: int, max_size: int) -> int:
+    return min(int(args.get("size", default_size)), max_size)
+
+
+def _paginate(
+    stmt, args: Mapping, size: int, keys: Tuple, descending: bool
+) -> ListQuery:
+    """Aplica ORDER BY e keyset sobre keys: (created_at, id) ou só (id,)."""
+    order = [k.desc() if descending else k.asc() for k in keys]
+    stmt = stmt.order_by(*order)
+    cursor = args.get("cursor")
+    if cursor:
+        # Chave composta sempre começa por created_at
+        values = decode_cursor(cursor, len(keys), has_datetime=len(keys) > 1)
+        if len(keys) == 1:
+            cond = keys[0] < values[0] if descending else keys[0] > values[0]
+        else:
+            row = tuple_(*keys)
+            bound = tuple_(*[literal(v, k.type) for k, v in zip(keys, values)])
+            cond = row < bound if descending else row > bound
+        stmt = stmt.where(cond)
+    else:
+        page = int(args.get("page", 1))
+        if page > 1:
+            stmt = stmt.offset((page - 1) * size)
+    return ListQuery(
+        stmt=stmt.limit(size + 1),
+        size=size,
+        cursor_of=lambda r: [getattr(r, k.key) for k in keys],
+    )
+
+
+def predictions_query(args: Mapping) -> ListQuery:
+    size = _size(args, 50, 200)
+    model_id = args.get("model_id")
+    P = partitioning.prediction_entity()
+    stmt = select(P)
+    if model_id:
+        try:
+            stmt = stmt.where(P.model_id == int(model_id))
+        except Exception:
+            pass
+    if settings.prediction_id_format == "uuid7":
+        # Ids UUIDv7 crescem com created_at: a ordem (e o cursor) vem da própria PK
+        keys = (P.id,)
+    else:
+        keys = (P.created_at, P.id)
+    return _paginate(stmt, args, size, keys, descending=True)
+
+
+def metrics_query(args: Mapping) -> ListQuery:
+    size = _size(args, 100, 500)
+    pred_id = args.get("prediction_id")
+    name = args.get("name")
+    M = partitioning.metric_entity()
+    stmt = select(M)
+    if pred_id:
+        stmt = stmt.where(M.prediction_id == pred_id)
+    if name:
+        stmt = stmt.where(M.name == name)
+    return _paginate(stmt, args, size, (M.id,), descending=False)
+
+
+def models_query(args: Mapping) -> ListQuery:
+    size = _size(args, 50, 200)
+    flavor = args.get("flavor")
+    stmt = select(ModelRegistry)
+    if flavor:
+        stmt = stmt.where(ModelRegistry.flavor == flavor)
+    keys = (ModelRegistry.created_at, ModelRegistry.id)
+    return _paginate(stmt, args, size, keys, descending=True)
+
+
+def retrainings_query(args: Mapping) -> ListQuery:
+    size = _size(args, 50, 200)
+    keys = (Retraining.created_at, Retraining.id)
+    return _paginate(select(Retraining), args, size, keys, descending=True)
+
+
+def prediction_to_dict(r: Prediction) -> Dict:
+    return {
+        "id": r.id,
+        "model_id": r.model_id,
+        "prediction": r.prediction,
+        "features": packer.features_of(r),
+        "created_at": r.created_at.isoformat(),
+    }
+
+
+def metric_to_dict(r: PredictionMetric) -> Dict:
+    return {
+        "id": r.id,
+        "prediction_id": r.prediction_id,
+        "name": r.name,
+        "value": r.value,
+    }
+
+
+def model_to_dict(r: ModelRegistry) -> Dict:
+    return {
+        "id": r.id,
+        "flavor": r.flavor,
+        "version": r.version,
+        "model_path": r.model_path,
+        "created_at": r.created_at.isoformat(),
+    }
+
+
+def retraining_to_dict(r: Retraining) -> Dict:
+    return {
+        "id": r.id,
+        "model_id": r.model_id,
+        "triggered_by": r.triggered_by,
+        "notes": r.notes,
+        "created_at": r.created_at.isoformat(),
+    }
@@ -0,0 +1,290 @@
+"""Purga (e arquivamento opcional) de predições antigas, em blocos pequenos.
+
+Para cada modelo, apaga as predições com created_at anterior à janela de
+retenção em blocos de chunk_size: cada bloco é uma transação curta (seleciona
+os ids pelo índice (model_id, created_at, id), apaga as métricas e depois as
+predições), com uma pausa entre blocos para que as escritas da API não fiquem
+esperando o lock. Com archive_dir, o bloco é gravado antes em NDJSON (mesmo
+formato de /export/predictions). Os rollups de métricas não são alterados: o
+histórico agregado continua disponível depois da purga.
+
+Com PARTITIONING_ENABLED (app.partitioning), sem model_id e sem archive_dir,
+os meses inteiros anteriores ao corte são removidos antes (DROP da partição ou
+do arquivo de mês); os blocos cuidam só do mês parcial. No SQLite os blocos
+também percorrem os arquivos de mês que restam (com model_id ou archive_dir,
+todos os anteriores ao corte), anexados ou não às views.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import delete, select, text
+from sqlalchemy.orm import Session
+
+from . import partitioning
+from .config import Settings
+from .db import get_engine
+from .export import Pivot
+from .features import packer
+from .ml.memo import prediction_cache
+from .models import Prediction, PredictionMetric
+from .services import BadRequest
+
+settings = Settings()
+
+logger = logging.getLogger(__name__)
+
+_PREDICTIONS = Prediction.__table__
+_METRICS = PredictionMetric.__table__
+
+
+def _archive(session: Session, ids: List[str], fh) -> None:
+    p, m = _PREDICTIONS, _METRICS
+    rows = session.execute(
+        select(
+            p.c.id,
+            p.c.model_id,
+            p.c.created_at,
+            p.c.prediction,
+            p.c.features,
+            p.c.feature_schema_id,
+            p.c.features_packed,
+            m.c.name,
+            m.c.value,
+        )
+        .select_from(p.outerjoin(m, m.c.prediction_id == p.c.id))
+        .where(p.c.id.in_(ids))
+        .order_by(p.c.created_at, p.c.id)
+    )
+    pivot, records = Pivot(), []
+    for row in rows:
+        record = pivot.feed(row)
+        if record is not None:
+            records.append(record)
+    record = pivot.flush()
+    if record is not None:
+        records.append(record)
+    packer.decode_records(records)
+    for record in records:
+        fh.write(json.dumps(record, separators=(",", ":")) + "\n")
+    fh.flush()
+    os.fsync(fh.fileno())
+
+
+def _purge_model(
+    engine,
+    model_id: int,
+    cutoff: datetime,
+    chunk_size: int,
+    pause_s: float,
+    fh,
+    totals: Dict,
+) -> None:
+    while True:
+        with Session(engine) as session:
+            ids = list(
+                session.execute(
+                    select(_PREDICTIONS.c.id)
+                    .where(
+                        _PREDICTIONS.c.model_id == model_id,
+                        _PREDICTIONS.c.created_at < cutoff,
+                    )
+                    .order_by(_PREDICTIONS.c.created_at, _PREDICTIONS.c.id)
+                    .limit(chunk_size)
+                ).scalars()
+            )
+            if not ids:
+                return
+            if fh is not None:
+                _archive(session, ids, fh)
+            # Métricas primeiro: o delete do Core não passa pelo cascade do ORM
+            res = session.execute(
+                delete(_METRICS).where(_METRICS.c.prediction_id.in_(ids))
+            )
+            totals["metrics"] += res.rowcount
+            res = session.execute(
+                delete(_PREDICTIONS).where(_PREDICTIONS.c.id.in_(ids))
+            )
+            totals["predictions"] += res.rowcount
+            session.commit()
+        if len(ids) < chunk_size:
+            return
+        if pause_s > 0:
+            time.sleep(pause_s)
+
+
+def _model_ids(engine, model_id: Optional[int], cutoff: datetime) -> List[int]:
+    # Pelos ids gravados nas predições, não pelo registro: modelos já apagados
+    # também têm predições a purgar
+    if model_id is not None:
+        return [model_id]
+    with Session(engine) as session:
+        return list(
+            session.execute(
+                select(_PREDICTIONS.c.model_id)
+                .where(_PREDICTIONS.c.created_at < cutoff)
+                .distinct()
+            ).scalars()
+        )
+
+
+def maintenance(engine, vacuum: bool = False) -> None:
+    """ANALYZE das tabelas (e VACUUM, se pedido) depois de uma purga.
+
+    No Postgres o VACUUM comum não bloqueia leituras nem escritas. No SQLite o
+    VACUUM reescreve o arquivo inteiro com lock exclusivo: use numa janela sem
+    tráfego.
+    """
+    dialect = engine.dialect.name
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        if dialect == "postgresql":
+            verb = "VACUUM (ANALYZE)" if vacuum else "ANALYZE"
+            conn.exec_driver_sql("%s predictions, prediction_metrics" % verb)
+        elif dialect == "sqlite":
+            if vacuum:
+                conn.exec_driver_sql("VACUUM")
+            conn.exec_driver_sql("ANALYZE predictions")
+            conn.exec_driver_sql("ANALYZE prediction_metrics")
+        else:
+            conn.execute(text("ANALYZE TABLE predictions, prediction_metrics"))
+
+
+def purge(
+    engine,
+    days: int,
+    model_id: Optional[int] = None,
+    chunk_size: int = 1000,
+    pause_s: float = 0.05,
+    archive_dir: str = "",
+    vacuum: bool = False,
+    analyze: bool = True,
+) -> Dict:
+    """Apaga as predições (e métricas) com mais de `days` dias; retorna contagens."""
+    if days < 1:
+        raise ValueError("days must be >= 1")
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    totals = {"predictions": 0, "metrics": 0, "cutoff": cutoff.isoformat()}
+
+    fh = None
+    if archive_dir:
+        os.makedirs(archive_dir, exist_ok=True)
+        path = os.path.join(
+            archive_dir,
+            "predictions-%s-%s.ndjson"
+            % (datetime.utcnow().strftime("%Y%m%dT%H%M%S"), uuid.uuid4().hex[:8]),
+        )
+        fh = open(path, "a", encoding="utf-8")
+        totals["archive"] = path
+    if model_id is None and not archive_dir and partitioning.backend():
+        totals["partitions_dropped"] = partitioning.drop_before(engine, cutoff)
+    try:
+        # SQLite particionado: os arquivos de mês anteriores ao corte, depois main
+        with partitioning.month_engines(before=cutoff) as months:
+            for source in months + [engine]:
+                for mid in _model_ids(source, model_id, cutoff):
+                    _purge_model(
+                        source, mid, cutoff, max(1, chunk_size), pause_s, fh, totals
+                    )
+    finally:
+        if fh is not None:
+            fh.close()
+    if totals["predictions"] or totals.get("partitions_dropped"):
+        # O cache pode apontar para predições removidas
+        prediction_cache.invalidate()
+        if analyze or vacuum:
+            maintenance(engine, vacuum=vacuum)
+    return totals
+
+
+class PurgeJobs:
+    """Execuções de purge em thread de fundo (uma por vez), consultáveis por id.
+
+    O registro fica na memória do processo: com mais de um worker cada um teria
+    o seu, e nem a trava nem a consulta por id valeriam. start_purge recusa o
+    POST nesse caso; use `manage.py purge` (ou um worker só).
+    """
+
+    def __init__(self):
+        self._jobs: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def start(self, engine, **kwargs) -> Optional[Dict]:
+        """Dispara a purga; None se já houver uma em andamento."""
+        with self._lock:
+            if any(j["status"] == "running" for j in self._jobs.values()):
+                return None
+            job_id = uuid.uuid4().hex[:12]
+            job = {
+                "id": job_id,
+                "status": "running",
+                "params": kwargs,
+                "started_at": datetime.utcnow().isoformat(),
+            }
+            self._jobs[job_id] = job
+        threading.Thread(
+            target=self._run, args=(job, engine, kwargs), name="purge", daemon=True
+        ).start()
+        return dict(job)
+
+    def _run(self, job: Dict, engine, kwargs: Dict) -> None:
+        try:
+            result = purge(engine, **kwargs)
+            update = {"status": "done", "result": result}
+        except Exception as e:
+            logger.exception("purge: falha no job %s", job["id"])
+            update = {"status": "failed", "error": str(e)}
+        update["finished_at"] = datetime.utcnow().isoformat()
+        with self._lock:
+            job.update(update)
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+
+purge_jobs = PurgeJobs()
+
+
+def start_purge(payload: Dict) -> Dict:
+    """Valida o corpo do POST /admin/purge e dispara a purga em background."""
+    if Settings().server_workers > 1:
+        raise BadRequest(
+            "purge jobs need a single worker; run manage.py purge instead", 409
+        )
+    try:
+        days = int(payload.get("days") or settings.retention_days)
+        model_id = payload.get("model_id")
+        model_id = int(model_id) if model_id is not None else None
+    except (TypeError, ValueError):
+        raise BadRequest("days and model_id must be integers")
+    if days < 1:
+        raise BadRequest("days must be >= 1")
+    archive = bool(payload.get("archive", bool(settings.retention_archive_dir)))
+    if archive and not settings.retention_archive_dir:
+        raise BadRequest("archive requires RETENTION_ARCHIVE_DIR")
+    job = purge_jobs.start(
+        get_engine(settings.db_url),
+        days=days,
+        model_id=model_id,
+        chunk_size=settings.retention_chunk_size,
+        pause_s=settings.retention_pause_ms / 1000.0,
+        archive_dir=settings.retention_archive_dir if archive else "",
+        vacuum=bool(payload.get("vacuum", False)),
+    )
+    if job is None:
+        raise BadRequest("a purge is already running", 409)
+    return job
+
+
+def purge_status(job_id: str) -> Dict:
+    job = purge_jobs.get(job_id)
+    if job is None:
+        raise BadRequest("job not found", 404)
+    return job
@@ -0,0 +1,245 @@
+"""Rollup por hora das métricas de predição (tabela metric_rollups).
+
+Cada linha guarda, para (name, model_id, hora), count, sum, sum_sq, min, max e
+um QuantileSketch mesclável. O rollup é atualizado na mesma transação que
+insere as métricas (write_predictions, inclusive no lote do write-behind), e a
+leitura de /metrics/summary por hora ou dia passa a custar O(horas), não
+O(linhas). Predições apagadas depois (DELETE /records, purge) continuam
+contadas: o rollup guarda o histórico além da retenção. `manage.py
+rebuild-rollups` recalcula a partir das linhas que restaram.
+"""
+
+import math
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import bindparam, delete, select, tuple_, update
+from sqlalchemy.orm import Session
+
+from . import partitioning
+from .ml.sketch import QuantileSketch, merged
+from .models import MetricRollup
+
+_ROLLUPS = MetricRollup.__table__
+
+_Key = Tuple[str, int, datetime]
+
+
+def bucket_start(created_at: datetime) -> datetime:
+    return created_at.replace(minute=0, second=0, microsecond=0)
+
+
+class RollupBuilder:
+    """Acumula valores por chave e gera os agregados parciais de um lote."""
+
+    def __init__(self):
+        self._values: Dict[_Key, List[float]] = {}
+
+    def add(self, model_id: int, created_at: datetime, name: str, value) -> None:
+        if value is None or not math.isfinite(value):
+            return
+        key = (name, model_id, bucket_start(created_at))
+        self._values.setdefault(key, []).append(float(value))
+
+    def add_rows(self, pred_rows: List[Dict], metric_rows: List[Dict]) -> None:
+        """Linhas no formato de write_predictions (métricas -> predição)."""
+        preds = {r["id"]: r for r in pred_rows}
+        for m in metric_rows:
+            p = preds.get(m["prediction_id"])
+            if p is not None:
+                self.add(p["model_id"], p["created_at"], m["name"], m["value"])
+
+    def deltas(self) -> Dict[_Key, Dict]:
+        out = {}
+        for key, values in self._values.items():
+            xs = np.asarray(values, dtype=np.float64)
+            sketch = QuantileSketch()
+            sketch.add_many(xs)
+            out[key] = {
+                "count": int(len(xs)),
+                "sum": float(xs.sum()),
+                "sum_sq": float(np.dot(xs, xs)),
+                "min": float(xs.min()),
+                "max": float(xs.max()),
+                "sketch": sketch,
+            }
+        self._values.clear()
+        return out
+
+
+def _insert_missing(session: Session, keys: List[_Key]) -> None:
+    """Cria as linhas zeradas que faltam, sem falhar se outro processo criar antes."""
+    dialect = session.get_bind().dialect.name
+    now = datetime.utcnow()
+    rows = [
+        {
+            "name": name,
+            "model_id": model_id,
+            "bucket_start": start,
+            "count": 0,
+            "sum": 0.0,
+            "sum_sq": 0.0,
+            "updated_at": now,
+        }
+        for name, model_id, start in keys
+    ]
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        session.execute(_ROLLUPS.insert(), rows)
+        return
+    session.execute(insert(_ROLLUPS).on_conflict_do_nothing(), rows)
+
+
+def apply(session: Session, builder: RollupBuilder) -> None:
+    """Mescla os agregados do lote nas linhas de metric_rollups (sem commit).
+
+    As linhas são lidas com FOR UPDATE (no SQLite a transação já tem o lock de
+    escrita dos INSERTs), mescladas em Python e regravadas.
+    """
+    deltas = builder.deltas()
+    if not deltas:
+        return
+    keys = sorted(deltas)
+    cols = (_ROLLUPS.c.name, _ROLLUPS.c.model_id, _ROLLUPS.c.bucket_start)
+    existing = {
+        (r.name, r.model_id, r.bucket_start): r
+        for r in session.execute(
+            select(_ROLLUPS)
+            .where(tuple_(*cols).in_(keys))
+            .order_by(_ROLLUPS.c.id)
+            .with_for_update()
+        )
+    }
+    missing = [k for k in keys if k not in existing]
+    if missing:
+        _insert_missing(session, missing)
+        existing.update(
+            {
+                (r.name, r.model_id, r.bucket_start): r
+                for r in session.execute(
+                    select(_ROLLUPS)
+                    .where(tuple_(*cols).in_(missing))
+                    .with_for_update()
+                )
+            }
+        )
+
+    now = datetime.utcnow()
+    updates = []
+    for key in keys:
+        row, delta = existing[key], deltas[key]
+        sketch = QuantileSketch.from_dict(row.sketch)
+        sketch.merge(delta["sketch"])
+        updates.append(
+            {
+                "_id": row.id,
+                "count": row.count + delta["count"],
+                "sum": row.sum + delta["sum"],
+                "sum_sq": row.sum_sq + delta["sum_sq"],
+                "min": delta["min"] if row.min is None else min(row.min, delta["min"]),
+                "max": delta["max"] if row.max is None else max(row.max, delta["max"]),
+                "sketch": sketch.to_dict(),
+                "updated_at": now,
+            }
+        )
+    columns = ("count", "sum", "sum_sq", "min", "max", "sketch", "updated_at")
+    session.execute(
+        update(_ROLLUPS)
+        .where(_ROLLUPS.c.id == bindparam("_id"))
+        .values({c: bindparam(c) for c in columns}),
+        updates,
+    )
+
+
+def record(session: Session, pred_rows: List[Dict], metric_rows: List[Dict]) -> None:
+    builder = RollupBuilder()
+    builder.add_rows(pred_rows, metric_rows)
+    apply(session, builder)
+
+
+def rebuild(engine, model_id: Optional[int] = None, chunk_rows: int = 100000) -> int:
+    """Recalcula os rollups a partir de prediction_metrics; retorna as linhas lidas.
+
+    Apaga os rollups (do modelo, se informado) e relê as métricas em streaming,
+    aplicando um bloco de chunk_rows por transação. Métricas gravadas durante a
+    reconstrução podem ser contadas duas vezes: rode com a API parada.
+    """
+    p, m = partitioning.read_tables()
+    stmt = select(p.c.model_id, p.c.created_at, m.c.name, m.c.value).select_from(
+        m.join(p, partitioning.metric_join(p, m))
+    )
+    purge = delete(_ROLLUPS)
+    if model_id is not None:
+        stmt = stmt.where(p.c.model_id == model_id)
+        purge = purge.where(_ROLLUPS.c.model_id == model_id)
+    with Session(engine) as session:
+        session.execute(purge)
+        session.commit()
+
+    total, builder = 0, RollupBuilder()
+
+    def flush() -> None:
+        with Session(engine) as session:
+            apply(session, builder)
+            session.commit()
+
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=10000).execute(
+            stmt
+        )
+        pending = 0
+        for row in result:
+            builder.add(row.model_id, row.created_at, row.name, row.value)
+            total += 1
+            pending += 1
+            if pending >= chunk_rows:
+                flush()
+                pending = 0
+    flush()
+    return total
+
+
+def read(
+    session: Session,
+    name: str,
+    model_id: Optional[int],
+    start: Optional[datetime],
+    end: Optional[datetime],
+) -> Iterable:
+    """Linhas de rollup da métrica, em ordem de (model_id, hora)."""
+    stmt = select(MetricRollup).where(
+        MetricRollup.name == name, MetricRollup.count > 0
+    )
+    if model_id is not None:
+        stmt = stmt.where(MetricRollup.model_id == model_id)
+    if start is not None:
+        stmt = stmt.where(MetricRollup.bucket_start >= bucket_start(start))
+    if end is not None:
+        stmt = stmt.where(MetricRollup.bucket_start < end)
+    stmt = stmt.order_by(MetricRollup.model_id, MetricRollup.bucket_start)
+    return session.execute(stmt).scalars()
+
+
+def summarize_rows(rows: List[MetricRollup], percentiles: List[float]) -> Dict:
+    """Combina linhas de rollup (de um mesmo grupo) em count/mean/std/min/max/pXX."""
+    count = sum(r.count for r in rows)
+    total = sum(r.sum for r in rows)
+    mean = total / count
+    variance = max(sum(r.sum_sq for r in rows) / count - mean * mean, 0.0)
+    sketch = merged([r.sketch for r in rows])
+    lo, hi = min(r.min for r in rows), max(r.max for r in rows)
+    out = {
+        "count": count,
+        "mean": mean,
+        "std": math.sqrt(variance),
+        "min": lo,
+        "max": hi,
+    }
+    for q in percentiles:
+        # O sketch tem erro relativo; os extremos exatos limitam a estimativa
+        out["p%g" % (q * 100)] = min(max(sketch.quantile(q), lo), hi)
+    return out
@@ -1,29 +1,12 @@
-import os
-import sys
-
-from flask import Flask, jsonify, request
-from sqlalchemy import delete, select
+from flask import Flask, Response, jsonify, request, stream_with_context
 from sqlalchemy.orm import Session
 
+from . import aggregates, export, httpcache, queries, retention, services
 from .config import Settings
 from .db import get_engine, get_session_factory
-from .ml.metrics import compute_per_prediction_metrics
-from .ml.registry import ModelRegistryAdapter
-from .models import ModelRegistry, Prediction, PredictionMetric, Retraining
+from .ml.registry import active_model
 from .schemas import PredictRequest, PredictResponse
-
-try:
-    from sistema_crud.src.run import run_training_kedro  # se instalado como pacote
-except Exception:
-    from run import run_training_kedro
-
-# garantir que o path do Kedro (sistema-crud/src) esteja disponível
-_KEDRO_SRC = os.path.join(
-    os.path.dirname(os.path.dirname(__file__)), "sistema-crud", "src"
-)
-if _KEDRO_SRC not in sys.path:
-    sys.path.append(_KEDRO_SRC)
-# fallback direto do src
+from .services import BadRequest, run_training_kedro
 
 
 settings = Settings()
@@ -31,7 +14,38 @@ engine = get_engine(settings.db_url)
 SessionFactory = get_session_factory(settings.db_url)
 
 
+def _listing(query: queries.ListQuery, to_dict):
+    with Session(engine) as session:
+        rows, cursor = query.page(session.execute(query.stmt).scalars())
+        response = jsonify([to_dict(r) for r in rows])
+    if cursor:
+        response.headers[queries.NEXT_CURSOR_HEADER] = cursor
+    return response
+
+
+def _conditional_listing(table: str, query: queries.ListQuery, to_dict):
+    """Listagem com ETag/Last-Modified (304) e cache opcional do corpo."""
+
+    def render(session: Session):
+        rows, cursor = query.page(session.execute(query.stmt).scalars())
+        return jsonify([to_dict(r) for r in rows]).get_data(), cursor
+
+    with Session(engine) as session:
+        status, body, cursor, headers = httpcache.respond(
+            session, table, request.args, request.headers, render
+        )
+    if cursor:
+        headers[queries.NEXT_CURSOR_HEADER] = cursor
+    if body is None:
+        return Response(status=status, headers=headers)
+    return Response(body, status=status, headers=headers, mimetype="application/json")
+
+
 def register_routes(app: Flask) -> None:
+    @app.errorhandler(BadRequest)
+    def bad_request(e: BadRequest):
+        return jsonify({"error": e.error}), e.status
+
     @app.get("/health")
     def health():
         return {
@@ -39,6 +53,10 @@ def register_routes(app: Flask) -> None:
             "env": settings.app_env,
         }
 
+    @app.get("/stats")
+    def stats():
+        return jsonify(services.stats())
+
     @app.post("/predict")
     def predict():
         payload = request.get_json(force=True, silent=False) or {}
@@ -46,179 +64,91 @@ def register_routes(app: Flask) -> None:
         data = PredictRequest(**{k: v for k, v in payload.items() if k == "features"})
 
         with Session(engine) as session:
-            model_row = (
-                session.execute(select(ModelRegistry).order_by(ModelRegistry.id.desc()))
-                .scalars()
-                .first()
+            active = active_model.resolve(session, settings.model_flavor)
+            result = services.score_one(active, data.features, y_true)
+            pred_id, pred_rows, metric_rows = services.prediction_rows(
+                active, data.features, result
             )
-            if not model_row:
-                model_row = ModelRegistry(
-                    flavor=settings.model_flavor, version="v0", model_path=None
-                )
-                session.add(model_row)
+            if services.persist(session, pred_rows, metric_rows):
                 session.commit()
-                session.refresh(model_row)
-
-            adapter = ModelRegistryAdapter(model_row.flavor, model_row.model_path)
-            model = adapter.load_active()
-            y_pred = adapter.predict(model, data.features)
-
-            pred_id = adapter.new_prediction_id()
-            pred_row = Prediction(
-                id=pred_id,
-                model_id=model_row.id,
-                features=data.features,
-                prediction=y_pred,
-            )
-            session.add(pred_row)
-            session.flush()
-
-            metrics_map = compute_per_prediction_metrics(
-                y_pred, data.features, y_true=y_true
-            )
-            for name, value in metrics_map.items():
-                session.add(
-                    PredictionMetric(
-                        prediction_id=pred_row.id, name=name, value=float(value)
-                    )
-                )
-
-            session.commit()
 
         resp = PredictResponse(
             prediction_id=pred_id,
-            prediction=y_pred,
-            model_id=model_row.id,
-            metrics=[{"name": k, "value": float(v)} for k, v in metrics_map.items()],
+            prediction=result.prediction,
+            model_id=active.id,
+            metrics=[
+                {"name": k, "value": float(v)} for k, v in result.metrics.items()
+            ],
+            cached=result.cached_id is not None,
         )
         return jsonify(resp.model_dump())
 
+    @app.post("/predict/batch")
+    def predict_batch():
+        payload = request.get_json(force=True, silent=False) or {}
+        batch = services.parse_batch(payload)
+        with Session(engine) as session:
+            active = active_model.resolve(session, settings.model_flavor)
+            pred_rows, metric_rows, resp = services.score_batch(active, batch)
+            # Um único INSERT em lote por tabela, tudo na mesma transação
+            if services.persist(session, pred_rows, metric_rows):
+                session.commit()
+        return jsonify(resp.model_dump(exclude_none=True))
+
     @app.get("/predictions")
     def list_predictions():
-        page = int(request.args.get("page", 1))
-        size = min(int(request.args.get("size", 50)), 200)
-        model_id = request.args.get("model_id")
-        stmt = select(Prediction).order_by(Prediction.created_at.desc())
-        if model_id:
-            try:
-                stmt = stmt.where(Prediction.model_id == int(model_id))
-            except Exception:
-                pass
-        offset = (page - 1) * size
-        with Session(engine) as session:
-            rows = session.execute(stmt.offset(offset).limit(size)).scalars().all()
-            return jsonify(
-                [
-                    {
-                        "id": r.id,
-                        "model_id": r.model_id,
-                        "prediction": r.prediction,
-                        "features": r.features,
-                        "created_at": r.created_at.isoformat(),
-                    }
-                    for r in rows
-                ]
-            )
+        return _listing(
+            queries.predictions_query(request.args), queries.prediction_to_dict
+        )
 
     @app.get("/metrics")
     def list_metrics():
-        pred_id = request.args.get("prediction_id")
-        name = request.args.get("name")
-        page = int(request.args.get("page", 1))
-        size = min(int(request.args.get("size", 100)), 500)
-        stmt = select(PredictionMetric)
-        if pred_id:
-            stmt = stmt.where(PredictionMetric.prediction_id == pred_id)
-        if name:
-            stmt = stmt.where(PredictionMetric.name == name)
-        offset = (page - 1) * size
+        return _listing(queries.metrics_query(request.args), queries.metric_to_dict)
+
+    @app.get("/metrics/summary")
+    def metrics_summary():
+        req = aggregates.SummaryRequest(request.args)
         with Session(engine) as session:
-            rows = session.execute(stmt.offset(offset).limit(size)).scalars().all()
-            return jsonify(
-                [
-                    {
-                        "id": r.id,
-                        "prediction_id": r.prediction_id,
-                        "name": r.name,
-                        "value": r.value,
-                    }
-                    for r in rows
-                ]
-            )
+            return jsonify(aggregates.summarize(session, req))
 
     @app.get("/models")
     def list_models():
-        page = int(request.args.get("page", 1))
-        size = min(int(request.args.get("size", 50)), 200)
-        flavor = request.args.get("flavor")
-        stmt = select(ModelRegistry).order_by(ModelRegistry.created_at.desc())
-        if flavor:
-            stmt = stmt.where(ModelRegistry.flavor == flavor)
-        offset = (page - 1) * size
-        with Session(engine) as session:
-            rows = session.execute(stmt.offset(offset).limit(size)).scalars().all()
-            return jsonify(
-                [
-                    {
-                        "id": r.id,
-                        "flavor": r.flavor,
-                        "version": r.version,
-                        "model_path": r.model_path,
-                        "created_at": r.created_at.isoformat(),
-                    }
-                    for r in rows
-                ]
-            )
+        return _conditional_listing(
+            "models", queries.models_query(request.args), queries.model_to_dict
+        )
 
     @app.get("/retrainings")
     def list_retrainings():
-        page = int(request.args.get("page", 1))
-        size = min(int(request.args.get("size", 50)), 200)
-        stmt = select(Retraining).order_by(Retraining.created_at.desc())
-        offset = (page - 1) * size
-        with Session(engine) as session:
-            rows = session.execute(stmt.offset(offset).limit(size)).scalars().all()
-            return jsonify(
-                [
-                    {
-                        "id": r.id,
-                        "model_id": r.model_id,
-                        "triggered_by": r.triggered_by,
-                        "notes": r.notes,
-                        "created_at": r.created_at.isoformat(),
-                    }
-                    for r in rows
-                ]
-            )
+        return _conditional_listing(
+            "retrainings",
+            queries.retrainings_query(request.args),
+            queries.retraining_to_dict,
+        )
+
+    @app.get("/export/predictions")
+    def export_predictions():
+        req = export.ExportRequest(request.args)
+        return Response(
+            stream_with_context(export.stream_export(engine, req)),
+            mimetype=req.media_type,
+            headers=export.content_disposition(req),
+        )
 
     @app.delete("/records/<string:table>/<string:item_id>")
     def delete_record(table: str, item_id: str):
-        table_map = {
-            "predictions": Prediction,
-            "prediction_metrics": PredictionMetric,
-            "models": ModelRegistry,
-            "retrainings": Retraining,
-        }
-        if table not in table_map:
-            return jsonify({"error": "invalid table"}), 400
-        Model = table_map[table]
-
         with Session(engine) as session:
-            if (
-                Model is PredictionMetric
-                or Model is Retraining
-                or Model is ModelRegistry
-            ):
-                try:
-                    iid = int(item_id)
-                except Exception:
-                    return jsonify({"error": "id must be integer"}), 400
-                stmt = delete(Model).where(Model.id == iid)
-            else:
-                stmt = delete(Model).where(Model.id == item_id)
-            res = session.execute(stmt)
-            session.commit()
-            return jsonify({"deleted": res.rowcount})
+            return jsonify({"deleted": services.delete_record(session, table, item_id)})
+
+    @app.post("/admin/purge")
+    def admin_purge():
+        services.check_admin(request.headers.get("X-Admin-Token"))
+        payload = request.get_json(force=True, silent=True) or {}
+        return jsonify(retention.start_purge(payload)), 202
+
+    @app.get("/admin/purge/<string:job_id>")
+    def admin_purge_status(job_id: str):
+        services.check_admin(request.headers.get("X-Admin-Token"))
+        return jsonify(retention.purge_status(job_id))
 
     @app.post("/switch-model")
     def switch_model():
@@ -227,42 +157,10 @@ def register_routes(app: Flask) -> None:
         if new_flavor not in {"sklearn"}:
             return jsonify({"error": "flavor must be sklearn"}), 400
         with Session(engine) as session:
-            row = ModelRegistry(flavor=new_flavor, version="v0", model_path=None)
-            session.add(row)
-            session.commit()
-            return jsonify({"model_id": row.id, "flavor": row.flavor})
+            return jsonify(services.switch_model(session, new_flavor))
 
     @app.post("/train")
     def train():
         result = run_training_kedro(settings.model_flavor)
         with Session(engine) as session:
-            model_path = result.get("model_path")
-            row = ModelRegistry(
-                flavor=settings.model_flavor,
-                version=str(result.get("version", "unknown")),
-                model_path=str(model_path) if model_path is not None else None,
-            )
-            session.add(row)
-            session.flush()
-            retr = Retraining(model_id=row.id, triggered_by="api", notes="kedro-train")
-            session.add(retr)
-            session.commit()
-            # Acessar atributos antes de sair do bloco with para evitar DetachedInstanceError
-            model_id = row.id
-            flavor = row.flavor
-            version = row.version
-            model_path_value = row.model_path
-            retraining_id = retr.id
-        return jsonify(
-            {
-                "model_id": model_id,
-                "flavor": flavor,
-                "version": version,
-                "model_path": model_path_value,
-                "mse": float(result.get("mse", 0.0)),
-                "r2": float(result.get("r2", 0.0)),
-                "mape": float(result.get("mape", 0.0)),
-                "meape": float(result.get("meape", 0.0)),
-                "retraining_id": retraining_id,
-            }
-        )
+            return jsonify(services.register_training(session, result))
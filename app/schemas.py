@@ -1,4 +1,4 @@
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 
 from pydantic import BaseModel, Field
 
@@ -12,4 +12,31 @@ class PredictResponse(BaseModel):
     prediction: float
     model_id: int
     metrics: List[dict]
+    cached: bool = False
 
+
+class PredictBatchRequest(BaseModel):
+    rows: Optional[List[Any]] = Field(
+        default=None, description="Lista de mapas de features (uma linha por item)"
+    )
+    columns: Optional[Dict[str, List[Any]]] = Field(
+        default=None, description="Payload colunar: nome da feature -> valores"
+    )
+    y_true: Optional[List[Any]] = Field(
+        default=None, description="Valores reais opcionais, alinhados às linhas"
+    )
+
+
+class PredictBatchItem(BaseModel):
+    index: int
+    prediction_id: Optional[str] = None
+    prediction: Optional[float] = None
+    metrics: Optional[List[dict]] = None
+    error: Optional[str] = None
+
+
+class PredictBatchResponse(BaseModel):
+    model_id: int
+    count: int
+    failed: int
+    results: List[PredictBatchItem]
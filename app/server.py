@@ -0,0 +1,76 @@
+import multiprocessing
+import os
+from typing import Dict
+
+from gunicorn.app.base import BaseApplication
+from sqlalchemy.orm import Session
+
+from . import create_app
+from .config import Settings
+from .db import dispose_engines, get_engine
+from .ml.registry import active_model
+from .persistence import write_behind
+
+
+def preload_active_model(settings: Settings) -> None:
+    """Resolve e carrega o modelo ativo no master, antes do fork dos workers."""
+    with Session(get_engine(settings.db_url)) as session:
+        active = active_model.resolve(session, settings.model_flavor)
+    active.adapter().load_cached(active.id)
+
+
+def _post_fork(server, worker) -> None:
+    # Conexões abertas no master não podem ser usadas pelo filho: cada worker
+    # começa com um pool novo, sem fechar os sockets herdados
+    dispose_engines(close=False)
+
+
+def _worker_exit(server, worker) -> None:
+    write_behind.close()
+
+
+class ProductionServer(BaseApplication):
+    """Gunicorn embutido: vários processos e threads, app e modelo pré-carregados."""
+
+    def __init__(self, options: Dict):
+        self.options = options
+        super().__init__()
+
+    def load_config(self) -> None:
+        for key, value in self.options.items():
+            if key in self.cfg.settings and value is not None:
+                self.cfg.set(key, value)
+        self.cfg.set("preload_app", True)
+        self.cfg.set("post_fork", _post_fork)
+        self.cfg.set("worker_exit", _worker_exit)
+
+    def load(self):
+        settings = Settings()
+        app = create_app()
+        preload_active_model(settings)
+        # Nada de conexões do master atravessando o fork
+        dispose_engines()
+        return app
+
+
+def serve(
+    host: str,
+    port: int,
+    workers: int = 0,
+    threads: int = 4,
+    timeout: int = 120,
+    graceful_timeout: int = 30,
+) -> None:
+    workers = workers or multiprocessing.cpu_count()
+    # Lido pelos workers (Settings): os jobs de /admin/purge vivem em memória
+    os.environ["SERVER_WORKERS"] = str(workers)
+    ProductionServer(
+        {
+            "bind": "%s:%d" % (host, port),
+            "workers": workers,
+            "threads": threads,
+            "worker_class": "gthread" if threads > 1 else "sync",
+            "timeout": timeout,
+            "graceful_timeout": graceful_timeout,
+        }
+    ).run()
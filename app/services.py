@@ -0,0 +1,386 @@
+"""Regras de negócio compartilhadas pela API Flask (routes) e pela ASGI (asgi)."""
+
+import hmac
+import json
+import os
+import sys
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from pydantic import ValidationError
+from sqlalchemy import delete
+from sqlalchemy.orm import Session
+
+from . import partitioning
+from .config import Settings
+from .counters import MODELS, RETRAININGS, bump_counter
+from .db import pool_stats
+from .httpcache import response_cache
+from .ml.batching import micro_batcher
+from .ml.cache import model_cache
+from .ml.metrics import (
+    compute_batch_metrics,
+    compute_per_prediction_metrics,
+    split_batch_metrics,
+)
+from .ml.memo import prediction_cache
+from .ml.registry import ActiveModel, active_model
+from .models import ModelRegistry, Prediction, PredictionMetric, Retraining
+from .persistence import write_behind, write_predictions
+from .schemas import PredictBatchItem, PredictBatchRequest, PredictBatchResponse
+
+# garantir que o path do Kedro (sistema-crud/src) esteja disponível
+_KEDRO_SRC = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), "sistema-crud", "src"
+)
+if _KEDRO_SRC not in sys.path:
+    sys.path.append(_KEDRO_SRC)
+
+try:
+    from sistema_crud.src.run import run_training_kedro  # se instalado como pacote
+except Exception:
+    from run import run_training_kedro  # fallback direto do src
+
+settings = Settings()
+
+TABLES = {
+    "predictions": Prediction,
+    "prediction_metrics": PredictionMetric,
+    "models": ModelRegistry,
+    "retrainings": Retraining,
+}
+
+
+# Tabelas com contador de alterações (ETag de /models e /retrainings)
+_COUNTED = {ModelRegistry: MODELS, Retraining: RETRAININGS}
+
+
+def _touch(session: Session, *names: str) -> None:
+    for name in names:
+        bump_counter(session, name)
+
+
+def _touched(*names: str) -> None:
+    # Depois do commit: descarta as respostas em cache das tabelas alteradas
+    for name in names:
+        response_cache.invalidate(name)
+
+
+class BadRequest(Exception):
+    def __init__(self, error: Any, status: int = 400):
+        super().__init__(error)
+        self.error = error
+        self.status = status
+
+
+@dataclass
+class ScoreResult:
+    prediction: float
+    metrics: Dict[str, float]
+    cache_key: Optional[Tuple] = None
+    cached_id: Optional[str] = None  # id da predição original quando veio do cache
+
+
+def score_one(
+    active: ActiveModel, features: Dict[str, Any], y_true: Optional[float] = None
+) -> ScoreResult:
+    adapter = active.adapter()
+    model = adapter.load_cached(active.id)
+    key = None
+    if settings.prediction_cache_enabled:
+        key = prediction_cache.key_for(
+            active.id, features, by_name=model.vectorizer is not None
+        )
+        hit = prediction_cache.get(key)
+        if hit is not None:
+            y_pred, pred_id = hit
+            metrics_map = compute_per_prediction_metrics(
+                y_pred, features, y_true=y_true
+            )
+            return ScoreResult(y_pred, metrics_map, key, cached_id=pred_id)
+    if settings.microbatch_enabled:
+        y_pred, metrics_map = micro_batcher.submit(
+            adapter, model, features, y_true=y_true
+        )
+    else:
+        y_pred = adapter.predict(model, features)
+        metrics_map = compute_per_prediction_metrics(y_pred, features, y_true=y_true)
+    return ScoreResult(y_pred, metrics_map, key)
+
+
+def prediction_rows(
+    active: ActiveModel, features: Dict[str, Any], result: ScoreResult
+) -> Tuple[str, List[Dict], List[Dict]]:
+    if result.cached_id is not None and not settings.prediction_cache_persist_hits:
+        # Acerto no cache sem gravação: devolve a predição original
+        return result.cached_id, [], []
+    pred_id = active.adapter().new_prediction_id()
+    if result.cache_key is not None and result.cached_id is None:
+        prediction_cache.put(result.cache_key, result.prediction, pred_id)
+    pred_rows = [
+        {
+            "id": pred_id,
+            "model_id": active.id,
+            "features": features,
+            "prediction": result.prediction,
+            "created_at": datetime.utcnow(),
+        }
+    ]
+    metric_rows = [
+        {
+            "prediction_id": pred_id,
+            "name": name,
+            "value": float(value),
+            "created_at": pred_rows[0]["created_at"],
+        }
+        for name, value in result.metrics.items()
+    ]
+    return pred_id, pred_rows, metric_rows
+
+
+def persist(session: Session, pred_rows: List[Dict], metric_rows: List[Dict]) -> bool:
+    """Grava as linhas (ou entrega ao write-behind); True se falta o commit."""
+    if not pred_rows:
+        return False
+    if settings.write_behind_enabled:
+        # A gravação fica com a thread de write-behind; respondemos já
+        write_behind.submit(pred_rows, metric_rows)
+        return False
+    write_predictions(session, pred_rows, metric_rows)
+    return True
+
+
+@dataclass
+class BatchInput:
+    rows: List[Any]
+    columns: Optional[Dict[str, List[Any]]]
+    y_true: List[Optional[float]]
+    errors: Dict[int, str]
+
+    @property
+    def valid(self) -> List[int]:
+        return [i for i in range(len(self.rows)) if i not in self.errors]
+
+
+def parse_batch(payload: Dict) -> BatchInput:
+    try:
+        data = PredictBatchRequest(**payload)
+    except ValidationError as e:
+        raise BadRequest(json.loads(e.json(include_url=False)))
+    if (data.rows is None) == (data.columns is None):
+        raise BadRequest("send exactly one of rows or columns")
+
+    if data.columns is not None:
+        lengths = {len(v) for v in data.columns.values()}
+        if len(lengths) > 1:
+            raise BadRequest("all columns must have the same length")
+        n_rows = lengths.pop() if lengths else 0
+        names = list(data.columns)
+        rows = [{k: data.columns[k][i] for k in names} for i in range(n_rows)]
+    else:
+        rows = data.rows
+    if len(rows) > settings.predict_batch_max_rows:
+        raise BadRequest("max %d rows per batch" % settings.predict_batch_max_rows, 413)
+    if data.y_true is not None and len(data.y_true) != len(rows):
+        raise BadRequest("y_true must have one value per row")
+
+    # Falhas por linha não derrubam o lote: a linha sai do cálculo e é reportada
+    errors: Dict[int, str] = {}
+    for i, r in enumerate(rows):
+        if not isinstance(r, dict):
+            errors[i] = "features must be an object"
+    y_true: List[Optional[float]] = [None] * len(rows)
+    for i, y in enumerate(data.y_true or []):
+        if y is None or i in errors:
+            continue
+        try:
+            y_true[i] = float(y)
+        except (TypeError, ValueError):
+            errors[i] = "y_true must be numeric"
+    return BatchInput(rows=rows, columns=data.columns, y_true=y_true, errors=errors)
+
+
+def score_batch(
+    active: ActiveModel, batch: BatchInput
+) -> Tuple[List[Dict], List[Dict], PredictBatchResponse]:
+    rows, y_true, errors = batch.rows, batch.y_true, dict(batch.errors)
+    valid = batch.valid
+    pred_rows, metric_rows, results = [], [], {}
+    if valid:
+        adapter = active.adapter()
+        model = adapter.load_cached(active.id)
+        if batch.columns is not None:
+            raw = adapter.columns_to_matrix(batch.columns)[valid]
+            xs = adapter.columns_to_matrix(batch.columns, model=model)[valid]
+        else:
+            raw = adapter.build_matrix([rows[i] for i in valid])
+            xs = adapter.build_matrix([rows[i] for i in valid], model=model)
+        # "inf"/"nan" derrubariam o predict do lote todo: viram erro só da linha
+        finite = np.isfinite(raw).all(axis=1) & np.isfinite(xs).all(axis=1)
+        for i, ok in zip(valid, finite):
+            if not ok:
+                errors[i] = "features must be finite numbers"
+        valid = [i for i, ok in zip(valid, finite) if ok]
+        raw, xs = raw[finite], xs[finite]
+    if valid:
+        y_pred = adapter.predict_batch(model, xs)
+
+        # Métricas do lote inteiro de uma vez, sobre os valores enviados
+        has_y = [y_true[i] is not None for i in valid]
+        batch_metrics = split_batch_metrics(
+            compute_batch_metrics(
+                y_pred,
+                raw,
+                np.array([y_true[i] if h else np.nan for i, h in zip(valid, has_y)]),
+            ),
+            has_y,
+        )
+
+        now = datetime.utcnow()
+        for j, i in enumerate(valid):
+            pred_id = adapter.new_prediction_id()
+            prediction = float(y_pred[j])
+            pred_rows.append(
+                {
+                    "id": pred_id,
+                    "model_id": active.id,
+                    "features": rows[i],
+                    "prediction": prediction,
+                    "created_at": now,
+                }
+            )
+            metrics = [{"name": k, "value": v} for k, v in batch_metrics[j].items()]
+            metric_rows.extend(
+                {"prediction_id": pred_id, "created_at": now, **m} for m in metrics
+            )
+            results[i] = PredictBatchItem(
+                index=i,
+                prediction_id=pred_id,
+                prediction=prediction,
+                metrics=metrics,
+            )
+
+    # Lote vazio ou só com linhas inválidas: nada a pontuar nem gravar
+    resp = PredictBatchResponse(
+        model_id=active.id,
+        count=len(rows),
+        failed=len(errors),
+        results=[
+            results.get(i) or PredictBatchItem(index=i, error=errors[i])
+            for i in range(len(rows))
+        ],
+    )
+    return pred_rows, metric_rows, resp
+
+
+def delete_statement(table: str, item_id: str):
+    if table not in TABLES:
+        raise BadRequest("invalid table")
+    Model = TABLES[table]
+    if Model is Prediction:
+        return Model, delete(Model).where(Model.id == item_id)
+    try:
+        iid = int(item_id)
+    except Exception:
+        raise BadRequest("id must be integer")
+    return Model, delete(Model).where(Model.id == iid)
+
+
+def delete_record(session: Session, table: str, item_id: str) -> int:
+    Model, stmt = delete_statement(table, item_id)
+    metrics_stmt = None
+    if Model is Prediction:
+        # O delete do Core não aplica o cascade do ORM: métricas saem antes
+        metrics_stmt = delete(PredictionMetric).where(
+            PredictionMetric.prediction_id == item_id
+        )
+        session.execute(metrics_stmt)
+    deleted = session.execute(stmt).rowcount
+    if Model is ModelRegistry:
+        active_model.mark_changed(session)
+    if Model in _COUNTED:
+        _touch(session, _COUNTED[Model])
+    session.commit()
+    if Model in (Prediction, PredictionMetric):
+        # SQLite particionado: a linha pode ter sido movida para um arquivo de mês
+        with partitioning.month_engines() as engines:
+            for engine in engines:
+                with Session(engine) as month:
+                    if metrics_stmt is not None:
+                        month.execute(metrics_stmt)
+                    deleted += month.execute(stmt).rowcount
+                    month.commit()
+    if Model in _COUNTED:
+        _touched(_COUNTED[Model])
+    if Model is ModelRegistry:
+        active_model.invalidate()
+        model_cache.invalidate(int(item_id))
+        prediction_cache.invalidate(int(item_id))
+    elif Model is Prediction:
+        # O cache pode apontar para a predição removida
+        prediction_cache.invalidate()
+    return deleted
+
+
+def switch_model(session: Session, flavor: str) -> Dict:
+    row = ModelRegistry(flavor=flavor, version="v0", model_path=None)
+    session.add(row)
+    active_model.mark_changed(session)
+    _touch(session, MODELS)
+    session.commit()
+    _touched(MODELS)
+    active_model.invalidate()
+    return {"model_id": row.id, "flavor": row.flavor}
+
+
+def register_training(session: Session, result: Dict) -> Dict:
+    model_path = result.get("model_path")
+    row = ModelRegistry(
+        flavor=settings.model_flavor,
+        version=str(result.get("version", "unknown")),
+        model_path=str(model_path) if model_path is not None else None,
+        feature_schema=result.get("feature_schema"),
+    )
+    session.add(row)
+    session.flush()
+    retr = Retraining(model_id=row.id, triggered_by="api", notes="kedro-train")
+    session.add(retr)
+    active_model.mark_changed(session)
+    _touch(session, MODELS, RETRAININGS)
+    session.commit()
+    _touched(MODELS, RETRAININGS)
+    active_model.invalidate()
+    return {
+        "model_id": row.id,
+        "flavor": row.flavor,
+        "version": row.version,
+        "model_path": row.model_path,
+        "mse": float(result.get("mse", 0.0)),
+        "r2": float(result.get("r2", 0.0)),
+        "mape": float(result.get("mape", 0.0)),
+        "meape": float(result.get("meape", 0.0)),
+        "retraining_id": retr.id,
+    }
+
+
+def check_admin(token: Optional[str]) -> None:
+    # Sem ADMIN_TOKEN os endpoints /admin/* ficam desligados (fail closed)
+    if not settings.admin_token:
+        raise BadRequest("admin endpoints disabled: ADMIN_TOKEN not set", 403)
+    if not hmac.compare_digest(token or "", settings.admin_token):
+        raise BadRequest("invalid admin token", 401)
+
+
+def stats() -> Dict:
+    out = {"model_cache": model_cache.stats(), "db_pool": pool_stats()}
+    if settings.prediction_cache_enabled:
+        out["prediction_cache"] = prediction_cache.stats()
+    if settings.microbatch_enabled:
+        out["micro_batcher"] = micro_batcher.stats()
+    if settings.write_behind_enabled:
+        out["write_behind"] = write_behind.stats()
+    if settings.response_cache_enabled:
+        out["response_cache"] = response_cache.stats()
+    return out
@@ -0,0 +1,228 @@
+"""Snapshot colunar (Parquet) das predições para análise offline.
+
+Grava um dataset particionado por model_id e dia (model_id=<id>/date=<AAAA-MM-DD>)
+com as features achatadas em colunas tipadas (feature_<nome>) e as métricas
+pivotadas (metric_<nome>). Os dados são lidos em streaming e gravados em blocos
+de chunk_rows predições. Um watermark (created_at, id) da última predição
+exportada fica em _watermark.json na raiz, e as execuções seguintes exportam só
+o que veio depois dele (--full reexporta tudo; use um diretório vazio).
+
+Todos os arquivos têm o mesmo schema, para que o dataset possa ser lido de uma
+vez: as colunas de métricas vêm de METRIC_NAMES (outras métricas ficam de
+fora) e as colunas de features e seus tipos são fixados no primeiro bloco (só
+números viram float64, o resto vira string) e guardados junto com o watermark.
+Features que não estão no schema, ou texto numa coluna float64, vão como JSON
+na coluna features_extra.
+"""
+
+import json
+import os
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import literal, select, tuple_
+
+from . import partitioning
+from .export import Pivot
+from .features import packer
+from .ml.metrics import METRIC_NAMES
+
+WATERMARK_FILE = "_watermark.json"
+
+
+def _pyarrow():
+    # Dependência opcional: só o export-parquet precisa dela
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("export-parquet requires pyarrow (pip install pyarrow)")
+    return pa, pq
+
+
+def read_watermark(root: str) -> Optional[Dict]:
+    path = os.path.join(root, WATERMARK_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as fh:
+        data = json.load(fh)
+    data["created_at"] = datetime.fromisoformat(data["created_at"])
+    return data
+
+
+def write_watermark(
+    root: str, created_at: datetime, pred_id: str, features: Dict[str, str]
+) -> None:
+    """Grava o watermark e o schema das features (nome -> float64/string)."""
+    path = os.path.join(root, WATERMARK_FILE)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(
+            {
+                "created_at": created_at.isoformat(),
+                "id": pred_id,
+                "updated_at": datetime.utcnow().isoformat(),
+                "features": features,
+            },
+            fh,
+        )
+    os.replace(tmp, path)
+
+
+def _statement(watermark: Optional[Dict], until: datetime):
+    p, m = partitioning.read_tables()
+    stmt = (
+        select(
+            p.c.id,
+            p.c.model_id,
+            p.c.created_at,
+            p.c.prediction,
+            p.c.features,
+            p.c.feature_schema_id,
+            p.c.features_packed,
+            m.c.name,
+            m.c.value,
+        )
+        .select_from(p.outerjoin(m, partitioning.metric_join(p, m)))
+        .order_by(p.c.created_at, p.c.id)
+    )
+    if watermark is not None:
+        bound = tuple_(
+            literal(watermark["created_at"], p.c.created_at.type),
+            literal(watermark["id"], p.c.id.type),
+        )
+        stmt = stmt.where(tuple_(p.c.created_at, p.c.id) > bound)
+    return stmt.where(p.c.created_at < until)
+
+
+def _feature_value(value):
+    # Números (e bool) viram float64; texto fica string; o resto vai como JSON
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)):
+        return float(value)
+    return json.dumps(value, separators=(",", ":"))
+
+
+def feature_types(records: List[Dict]) -> Dict[str, str]:
+    """Tipo de cada feature vista no bloco, na ordem em que aparecem."""
+    types: Dict[str, str] = {}
+    for r in records:
+        for name, value in (r["features"] or {}).items():
+            value = _feature_value(value)
+            if value is None or isinstance(value, float):
+                types.setdefault(name, "float64")
+            else:
+                types[name] = "string"
+    return types
+
+
+def schema(pa, features: Dict[str, str]):
+    kinds = {"float64": pa.float64(), "string": pa.string()}
+    fields = [
+        ("id", pa.string()),
+        ("model_id", pa.int64()),
+        ("date", pa.string()),
+        ("created_at", pa.timestamp("us")),
+        ("prediction", pa.float64()),
+    ]
+    fields += [("feature_%s" % n, kinds[k]) for n, k in features.items()]
+    fields.append(("features_extra", pa.string()))
+    fields += [("metric_%s" % n, pa.float64()) for n in METRIC_NAMES]
+    return pa.schema(fields)
+
+
+def _to_table(pa, records: List[Dict], features: Dict[str, str]):
+    columns = {
+        "id": [r["id"] for r in records],
+        "model_id": [r["model_id"] for r in records],
+        "date": [r["created_at"][:10] for r in records],
+        "created_at": [datetime.fromisoformat(r["created_at"]) for r in records],
+        "prediction": [r["prediction"] for r in records],
+    }
+    extra: List[Dict] = [{} for _ in records]
+    for name, kind in features.items():
+        values = []
+        for r, ex in zip(records, extra):
+            raw = (r["features"] or {}).get(name)
+            value = _feature_value(raw)
+            if kind == "float64" and isinstance(value, str):
+                ex[name] = raw
+                value = None
+            elif kind == "string" and value is not None:
+                value = str(value)
+            values.append(value)
+        columns["feature_%s" % name] = values
+    for r, ex in zip(records, extra):
+        for name, raw in (r["features"] or {}).items():
+            if name not in features:
+                ex[name] = raw
+    columns["features_extra"] = [
+        json.dumps(ex, separators=(",", ":")) if ex else None for ex in extra
+    ]
+    for name in METRIC_NAMES:
+        columns["metric_%s" % name] = [r["metrics"].get(name) for r in records]
+    return pa.table(columns, schema=schema(pa, features))
+
+
+def export_parquet(
+    engine,
+    root: str,
+    chunk_rows: int = 50000,
+    full: bool = False,
+    settle_seconds: float = 60.0,
+    yield_per: int = 1000,
+) -> int:
+    """Exporta as predições novas para root; retorna quantas foram gravadas.
+
+    settle_seconds deixa de fora as predições mais recentes, que ainda podem
+    estar na fila de write-behind, para que não fiquem atrás do watermark.
+    """
+    pa, pq = _pyarrow()
+    os.makedirs(root, exist_ok=True)
+    watermark = None if full else read_watermark(root)
+    # Watermark sem schema (versões antigas): o próximo bloco define as colunas
+    features: Optional[Dict[str, str]] = (watermark or {}).get("features")
+    until = datetime.utcnow() - timedelta(seconds=settle_seconds)
+    run_id = uuid.uuid4().hex[:12]
+    total, chunk_no = 0, 0
+    pivot, records = Pivot(), []
+
+    def flush() -> None:
+        nonlocal total, chunk_no, features
+        packer.decode_records(records)
+        if features is None:
+            features = feature_types(records)
+        pq.write_to_dataset(
+            _to_table(pa, records, features),
+            root_path=root,
+            partition_cols=["model_id", "date"],
+            basename_template="part-%s-%05d-{i}.parquet" % (run_id, chunk_no),
+            existing_data_behavior="overwrite_or_ignore",
+        )
+        last = records[-1]
+        total += len(records)
+        chunk_no += 1
+        # Watermark a cada bloco: uma execução interrompida continua de onde parou
+        write_watermark(
+            root, datetime.fromisoformat(last["created_at"]), last["id"], features
+        )
+        records.clear()
+
+    with engine.connect() as conn:
+        result = conn.execution_options(
+            stream_results=True, yield_per=yield_per
+        ).execute(_statement(watermark, until))
+        for row in result:
+            record = pivot.feed(row)
+            if record is not None:
+                records.append(record)
+                if len(records) >= chunk_rows:
+                    flush()
+    record = pivot.flush()
+    if record is not None:
+        records.append(record)
+    if records:
+        flush()
+    return total
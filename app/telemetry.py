@@ -0,0 +1,37 @@
+import threading
+from bisect import bisect_left
+from typing import Dict, Iterable
+
+
+class Histogram:
+    """Histograma com buckets fixos (contagens cumulativas no estilo Prometheus)."""
+
+    def __init__(self, buckets: Iterable[float]):
+        self.buckets = sorted(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        idx = bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[idx] += 1
+            self._sum += value
+            self._count += 1
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            counts = list(self._counts)
+            total, count = self._sum, self._count
+        cumulative, acc = {}, 0
+        for bound, n in zip(self.buckets, counts):
+            acc += n
+            cumulative["le_%g" % bound] = acc
+        cumulative["le_inf"] = acc + counts[-1]
+        return {
+            "count": count,
+            "sum": total,
+            "mean": total / count if count else 0.0,
+            "buckets": cumulative,
+        }
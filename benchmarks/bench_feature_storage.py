@@ -0,0 +1,111 @@
+"""Compara o armazenamento das features em JSON vs. empacotado (float32/float64).
+
+Uso:
+    python benchmarks/bench_feature_storage.py
+    python benchmarks/bench_feature_storage.py --rows 1000000 --features 30
+
+Para cada formato grava --rows predições com --features features numéricas em
+um SQLite novo (mesmo caminho de escrita da API: FeaturePacker.pack_rows) e
+mede o tamanho do arquivo e o tempo de ler todas as linhas e decodificar as
+features em dicts (JSON pelo driver, empacotadas com unpack_many por bloco).
+"""
+
+import os
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime
+
+import click
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, _ROOT)
+sys.path.append(os.path.join(_ROOT, "sistema-crud", "src"))
+
+from app.db import Base, get_engine  # noqa: E402
+from app.features import FeaturePacker  # noqa: E402
+from app.models import ModelRegistry, Prediction  # noqa: E402
+
+_CHUNK = 20000
+
+
+def _run(storage: str, rows: int, n_features: int, directory: str):
+    path = os.path.join(directory, "bench_%s.db" % storage)
+    engine = get_engine("sqlite+pysqlite:///" + path)
+    Base.metadata.create_all(bind=engine)
+    packer = FeaturePacker(storage)
+    names = ["feature_%02d" % i for i in range(n_features)]
+    rng = np.random.default_rng(0)
+    with Session(engine) as session:
+        model = ModelRegistry(flavor="sklearn", version="bench")
+        session.add(model)
+        session.commit()
+        model_id = model.id
+
+    table = Prediction.__table__
+    started = time.perf_counter()
+    for offset in range(0, rows, _CHUNK):
+        n = min(_CHUNK, rows - offset)
+        values = rng.normal(size=(n, n_features)).tolist()
+        batch = [
+            {
+                "id": uuid.uuid4().hex,
+                "model_id": model_id,
+                "features": dict(zip(names, v)),
+                "prediction": 0.0,
+                "created_at": datetime.utcnow(),
+            }
+            for v in values
+        ]
+        with Session(engine) as session:
+            session.execute(table.insert(), packer.pack_rows(session, batch))
+            session.commit()
+    write_s = time.perf_counter() - started
+
+    stmt = select(table.c.features, table.c.feature_schema_id, table.c.features_packed)
+    started = time.perf_counter()
+    decoded = 0
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True).execute(stmt)
+        for part in result.partitions(_CHUNK):
+            packed = [r for r in part if r.feature_schema_id is not None]
+            plain = [r.features for r in part if r.feature_schema_id is None]
+            out = packer.unpack_many(
+                [r.feature_schema_id for r in packed],
+                [r.features_packed for r in packed],
+            )
+            decoded += len(out) + len(plain)
+    read_s = time.perf_counter() - started
+    engine.dispose()
+    return os.path.getsize(path), write_s, read_s, decoded
+
+
+@click.command()
+@click.option("--rows", default=200000, type=int)
+@click.option("--features", "n_features", default=20, type=int)
+@click.option("--formats", default="json,float64,float32")
+def main(rows: int, n_features: int, formats: str):
+    with tempfile.TemporaryDirectory() as directory:
+        for storage in [f for f in formats.split(",") if f]:
+            size, write_s, read_s, decoded = _run(
+                storage, rows, n_features, directory
+            )
+            click.echo(
+                "%-8s %8.1f MB  %7.1f B/linha  escrita %6.2f s  leitura %6.2f s (%d)"
+                % (
+                    storage,
+                    size / 1e6,
+                    size / rows,
+                    write_s,
+                    read_s,
+                    decoded,
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Mede a memória por worker ao carregar o mesmo modelo em N processos.
+
+Compara joblib.load sem mmap (cada processo com sua cópia) e com
+mmap_mode="r" (arrays compartilhados via page cache). Para cada worker é
+impresso quanto o RSS e o PSS (memória proporcional: páginas compartilhadas
+são divididas entre os processos) cresceram com o modelo carregado, lidos de
+/proc/self/smaps_rollup (Linux).
+
+Uso:
+    python benchmarks/bench_model_rss.py --workers 4 --n-features 5000000
+"""
+
+import multiprocessing as mp
+import os
+import sys
+import tempfile
+import time
+
+import click
+import joblib
+import numpy as np
+from sklearn.linear_model import LinearRegression
+
+_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, _ROOT)
+sys.path.append(os.path.join(_ROOT, "sistema-crud", "src"))
+
+from app.ml.scoring import compile_model  # noqa: E402
+
+
+def _memory_kb():
+    out = {}
+    with open("/proc/self/smaps_rollup") as fh:
+        for line in fh:
+            key, _, rest = line.partition(":")
+            if key in ("Rss", "Pss"):
+                out[key] = int(rest.split()[0])
+    return out
+
+
+def _worker(path, mmap_mode, barrier, results):
+    before = _memory_kb()
+    model = joblib.load(path, mmap_mode=mmap_mode)
+    compiled = compile_model(model)
+    # Lê todos os coeficientes (como uma predição com todas as features) sem
+    # alocar um vetor de entrada do mesmo tamanho, que distorceria a medida
+    float(compiled.scorer.coef.sum())
+    barrier.wait()  # todos os workers com o modelo carregado ao mesmo tempo
+    after = _memory_kb()
+    results.put({k: after[k] - before[k] for k in after})
+    barrier.wait()
+
+
+def _run(path, mmap_mode, workers):
+    ctx = mp.get_context("fork")
+    barrier = ctx.Barrier(workers)
+    results = ctx.Queue()
+    procs = [
+        ctx.Process(target=_worker, args=(path, mmap_mode, barrier, results))
+        for _ in range(workers)
+    ]
+    for p in procs:
+        p.start()
+    mems = [results.get() for _ in procs]
+    for p in procs:
+        p.join()
+    return mems
+
+
+@click.command()
+@click.option("--workers", default=4, type=int)
+@click.option("--n-features", default=5_000_000, type=int)
+def main(workers: int, n_features: int):
+    model = LinearRegression()
+    model.coef_ = np.random.default_rng(0).normal(size=n_features)
+    model.intercept_ = 0.0
+    model.n_features_in_ = n_features
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "model.pkl")
+        joblib.dump(model, path, compress=0)
+        del model
+        size_mb = os.path.getsize(path) / 1e6
+        click.echo("artefato: %.1f MB, %d workers" % (size_mb, workers))
+        for label, mode in (("sem mmap", None), ("mmap_mode=r", "r")):
+            started = time.perf_counter()
+            mems = _run(path, mode, workers)
+            rss = sum(m["Rss"] for m in mems) / len(mems) / 1024
+            pss = sum(m["Pss"] for m in mems) / len(mems) / 1024
+            click.echo(
+                "%-12s +RSS/worker %7.1f MB | +PSS/worker %7.1f MB "
+                "| +PSS total %7.1f MB (%.2fs)"
+                % (label, rss, pss, pss * len(mems), time.perf_counter() - started)
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Compara a latência de GET /predictions por OFFSET (page) vs. cursor (keyset).
+
+Uso:
+    python benchmarks/bench_pagination.py --db-url sqlite+pysqlite:///./bench_pages.db
+    python benchmarks/bench_pagination.py --rows 10000000 --pages 1,100,10000
+
+A tabela predictions é preenchida até --rows linhas na primeira execução (as
+seguintes reaproveitam o banco). As consultas são as mesmas da API
+(app.queries.predictions_query); a página N por cursor parte do cursor da
+página N-1, obtido fora da medição.
+"""
+
+import os
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import click
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, _ROOT)
+sys.path.append(os.path.join(_ROOT, "sistema-crud", "src"))
+
+from app import queries  # noqa: E402
+from app.db import Base, get_engine  # noqa: E402
+from app.models import ModelRegistry, Prediction  # noqa: E402
+
+_CHUNK = 50000
+
+
+def _fill(engine, rows: int) -> None:
+    with Session(engine) as session:
+        have = session.execute(select(func.count()).select_from(Prediction)).scalar()
+        model_id = session.execute(select(func.max(ModelRegistry.id))).scalar()
+        if model_id is None:
+            model = ModelRegistry(flavor="sklearn", version="bench")
+            session.add(model)
+            session.commit()
+            model_id = model.id
+    if have >= rows:
+        return
+    click.echo("Inserindo %d predições..." % (rows - have))
+    start = datetime(2024, 1, 1)
+    table = Prediction.__table__
+    for offset in range(have, rows, _CHUNK):
+        n = min(_CHUNK, rows - offset)
+        batch = [
+            {
+                "id": uuid.uuid4().hex,
+                "model_id": model_id,
+                "features": {"a": i},
+                "prediction": float(i),
+                "created_at": start + timedelta(milliseconds=i),
+            }
+            for i in range(offset, offset + n)
+        ]
+        with engine.begin() as conn:
+            conn.execute(table.insert(), batch)
+
+
+def _timed(engine, args, repeat: int) -> float:
+    query = queries.predictions_query(args)
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        with Session(engine) as session:
+            query.page(session.execute(query.stmt).scalars())
+        samples.append((time.perf_counter() - started) * 1000.0)
+    return statistics.median(samples)
+
+
+def _cursor_for(engine, page: int, size: int):
+    """Cursor que aponta para o início da página (via OFFSET, fora da medição)."""
+    if page <= 1:
+        return None
+    query = queries.predictions_query({"size": size, "page": page - 1})
+    with Session(engine) as session:
+        _, cursor = query.page(session.execute(query.stmt).scalars())
+    return cursor
+
+
+@click.command()
+@click.option("--db-url", default="sqlite+pysqlite:///./bench_pages.db")
+@click.option("--rows", default=10_000_000, type=int)
+@click.option("--size", default=50, type=int, help="Itens por página")
+@click.option("--pages", default="1,10000", help="Páginas medidas")
+@click.option("--repeat", default=5, type=int)
+def main(db_url: str, rows: int, size: int, pages: str, repeat: int):
+    engine = get_engine(db_url)
+    Base.metadata.create_all(bind=engine)
+    _fill(engine, rows)
+
+    for page in [int(p) for p in pages.split(",") if p.strip()]:
+        offset_ms = _timed(engine, {"size": size, "page": page}, repeat)
+        cursor = _cursor_for(engine, page, size)
+        args = {"size": size, "cursor": cursor} if cursor else {"size": size}
+        cursor_ms = _timed(engine, args, repeat)
+        click.echo(
+            "page=%-7d offset %9.2f ms   cursor %7.2f ms" % (page, offset_ms, cursor_ms)
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -12,12 +12,38 @@ if sistema_crud_path not in sys.path:
 
 from run import run_training_kedro
 
-from sqlalchemy import inspect, text
+from sqlalchemy import (
+    LargeBinary,
+    bindparam,
+    delete,
+    func,
+    insert,
+    inspect,
+    select,
+    text,
+    update,
+)
+from sqlalchemy.orm import Session
+from sqlalchemy.schema import CreateIndex
 
-from app import create_app
+from app import (
+    create_app,
+    explain,
+    partitioning,
+    retention,
+    rollups,
+)
 from app import routes as _routes  # ensure routes are registered
 from app.config import Settings
 from app.db import Base, get_engine
+from app.ml.ids import Uuid7Clock, unix_ms, uuid7_hex_at
+from app.models import (
+    ChangeCounter,
+    FeatureSchema,
+    MetricRollup,
+    Prediction,
+    PredictionMetric,
+)
 
 
 @click.group()
@@ -40,6 +66,59 @@ def run(host: str, port: int, debug: bool, reload: bool):
     app.run(host=host, port=port, debug=debug, use_reloader=reload)
 
 
+@cli.command("serve")
+@click.option("--host", default="0.0.0.0")
+@click.option("--port", default=8000, type=int)
+@click.option(
+    "--workers", default=0, type=int, help="Processos worker (0 = número de CPUs)"
+)
+@click.option("--threads", default=4, type=int, help="Threads por worker")
+@click.option("--timeout", default=120, type=int)
+@click.option(
+    "--graceful-timeout",
+    default=30,
+    type=int,
+    help="Segundos para terminar requisições em andamento ao encerrar",
+)
+def serve(
+    host: str,
+    port: int,
+    workers: int,
+    threads: int,
+    timeout: int,
+    graceful_timeout: int,
+):
+    """Servidor de produção (gunicorn) com app e modelo ativo pré-carregados."""
+    from app.server import serve as run_server
+
+    run_server(
+        host,
+        port,
+        workers=workers,
+        threads=threads,
+        timeout=timeout,
+        graceful_timeout=graceful_timeout,
+    )
+
+
+@cli.command("run-asgi")
+@click.option("--host", default="0.0.0.0")
+@click.option("--port", default=8000, type=int)
+@click.option("--workers", default=1, type=int, help="Processos worker do uvicorn")
+def run_asgi(host: str, port: int, workers: int):
+    """Serve a variante ASGI da API (handlers async, engine async do SQLAlchemy)."""
+    import uvicorn
+
+    os.environ["SERVER_WORKERS"] = str(workers)
+    uvicorn.run(
+        "app.asgi:create_asgi_app",
+        factory=True,
+        host=host,
+        port=port,
+        workers=workers,
+    )
+
+
 @cli.command("init-db")
 def init_db():
     settings = Settings()
@@ -50,7 +129,7 @@ def init_db():
 
 @cli.command("migrate-db")
 def migrate_db():
-    """Adiciona a coluna model_path à tabela models se ela não existir."""
+    """Aplica as migrações pendentes (colunas, tabela change_counters e índices)."""
     settings = Settings()
     engine = get_engine(settings.db_url)
     
@@ -72,6 +151,187 @@ def migrate_db():
     else:
         click.echo("ℹ️  Coluna 'model_path' já existe na tabela 'models'.")
 
+    if "feature_schema" not in columns:
+        with engine.connect() as conn:
+            conn.execute(text("ALTER TABLE models ADD COLUMN feature_schema JSON"))
+            conn.commit()
+        click.echo("✅ Coluna 'feature_schema' adicionada à tabela 'models'.")
+
+    if "change_counters" not in inspector.get_table_names():
+        ChangeCounter.__table__.create(bind=engine)
+        click.echo("✅ Tabela 'change_counters' criada.")
+
+    if "metric_rollups" not in inspector.get_table_names():
+        MetricRollup.__table__.create(bind=engine)
+        click.echo("✅ Tabela 'metric_rollups' criada.")
+
+    if "feature_schemas" not in inspector.get_table_names():
+        FeatureSchema.__table__.create(bind=engine)
+        click.echo("✅ Tabela 'feature_schemas' criada.")
+
+    pred_columns = [col["name"] for col in inspector.get_columns("predictions")]
+    if "features_packed" not in pred_columns:
+        blob = LargeBinary().compile(dialect=engine.dialect)
+        with engine.begin() as conn:
+            conn.execute(
+                text("ALTER TABLE predictions ADD COLUMN features_packed %s" % blob)
+            )
+            conn.execute(
+                text(
+                    "ALTER TABLE predictions ADD COLUMN feature_schema_id INTEGER "
+                    "REFERENCES feature_schemas (id)"
+                )
+            )
+        click.echo(
+            "✅ Colunas 'features_packed' e 'feature_schema_id' adicionadas à "
+            "tabela 'predictions'."
+        )
+
+    metric_columns = inspector.get_columns("prediction_metrics")
+    if "created_at" not in [col["name"] for col in metric_columns]:
+        with engine.begin() as conn:
+            conn.execute(
+                text("ALTER TABLE prediction_metrics ADD COLUMN created_at TIMESTAMP")
+            )
+            # Backfill: cópia do created_at da predição (chave de partição)
+            conn.execute(
+                text(
+                    "UPDATE prediction_metrics SET created_at = (SELECT p.created_at "
+                    "FROM predictions p WHERE p.id = prediction_metrics.prediction_id)"
+                )
+            )
+        click.echo("✅ Coluna 'created_at' adicionada à tabela 'prediction_metrics'.")
+
+    if partitioning.backend() == "sqlite":
+        for added in partitioning.sqlite_add_columns():
+            click.echo("✅ Coluna %s adicionada." % added)
+
+    _create_missing_indexes(engine)
+
+
+def _create_missing_indexes(engine):
+    """Cria os índices declarados nos modelos que ainda não existem no banco.
+
+    No Postgres usa CREATE INDEX CONCURRENTLY (fora de transação), sem
+    bloquear escritas nas tabelas durante a criação. Tabelas particionadas não
+    aceitam CONCURRENTLY: nelas o índice é criado normalmente.
+    """
+    inspector = inspect(engine)
+    tables = set(inspector.get_table_names())
+    postgres = engine.dialect.name == "postgresql"
+    for table in Base.metadata.sorted_tables:
+        if table.name not in tables:
+            continue
+        concurrently = postgres
+        if postgres:
+            with engine.connect() as conn:
+                concurrently = not partitioning.pg_is_partitioned(conn, table.name)
+        existing = {ix["name"] for ix in inspector.get_indexes(table.name)}
+        for index in sorted(table.indexes, key=lambda ix: ix.name):
+            if index.name in existing:
+                continue
+            ddl = str(CreateIndex(index).compile(dialect=engine.dialect))
+            if concurrently:
+                ddl = ddl.replace("CREATE INDEX", "CREATE INDEX CONCURRENTLY", 1)
+            with engine.connect().execution_options(
+                isolation_level="AUTOCOMMIT"
+            ) as conn:
+                conn.exec_driver_sql(ddl)
+            click.echo("✅ Índice '%s' criado em '%s'." % (index.name, table.name))
+
+
+@cli.command("check-indexes")
+def check_indexes():
+    """Confere via EXPLAIN que cada consulta dos endpoints usa índice."""
+    settings = Settings()
+    engine = get_engine(settings.db_url)
+    dialect = engine.dialect.name
+    failed = 0
+    with engine.connect() as conn:
+        if dialect == "postgresql":
+            # Tabelas pequenas levariam o planner ao seq scan mesmo com índice
+            conn.exec_driver_sql("SET enable_seqscan = off")
+        for check in explain.hot_queries(dialect, settings.prediction_id_format):
+            lines = explain.plan(conn, check.stmt)
+            bad = explain.problems(lines, dialect, check.pk_order)
+            failed += bool(bad)
+            mark = "❌" if bad else "✅"
+            click.echo("%s %-28s %s" % (mark, check.label, " | ".join(lines)))
+    if failed:
+        click.echo("%d consulta(s) sem índice." % failed)
+        sys.exit(1)
+
+
+@cli.command("migrate-prediction-ids")
+@click.option("--batch-size", default=1000, type=int)
+def migrate_prediction_ids(batch_size: int):
+    """Reescreve ids uuid4 de predictions como UUIDv7 derivados de created_at.
+
+    Cada lote copia as predições com o novo id, repassa as métricas e remove
+    as linhas antigas na mesma transação. Pode ser interrompido e executado de
+    novo: linhas que já são UUIDv7 são ignoradas. A sequência de 12 bits segue
+    de um lote para o outro (e continua do último id já migrado no mesmo
+    milissegundo), então os ids ficam na ordem de (created_at, id antigo).
+    Use antes de ligar PREDICTION_ID_FORMAT=uuid7.
+    """
+    settings = Settings()
+    engine = get_engine(settings.db_url)
+    predictions = Prediction.__table__
+    metrics = PredictionMetric.__table__
+    # UUIDv7 tem "7" na 13ª posição do hex; uuid4 sempre tem "4"
+    legacy = func.substr(predictions.c.id, 13, 1) != "7"
+    clock = Uuid7Clock()
+    with Session(engine) as session:
+        first = session.execute(
+            select(func.min(predictions.c.created_at)).where(legacy)
+        ).scalar()
+        if first is not None:
+            # Execução anterior interrompida: não reusar (ms, seq) já emitidos
+            prefix = "%012x" % unix_ms(first)
+            last = session.execute(
+                select(func.max(predictions.c.id)).where(
+                    predictions.c.id.like(prefix + "%"), ~legacy
+                )
+            ).scalar()
+            if last is not None:
+                clock.seed(last)
+    total = 0
+    while True:
+        with Session(engine) as session:
+            rows = (
+                session.execute(
+                    select(predictions)
+                    .where(legacy)
+                    .order_by(predictions.c.created_at, predictions.c.id)
+                    .limit(batch_size)
+                )
+                .mappings()
+                .all()
+            )
+            if not rows:
+                break
+            new_rows, id_map = [], []
+            for row in rows:
+                new_id = uuid7_hex_at(row["created_at"], clock=clock)
+                new_rows.append({**row, "id": new_id})
+                id_map.append({"old_id": row["id"], "new_id": new_id})
+            session.execute(insert(predictions), new_rows)
+            session.execute(
+                update(metrics)
+                .where(metrics.c.prediction_id == bindparam("old_id"))
+                .values(prediction_id=bindparam("new_id")),
+                id_map,
+            )
+            session.execute(
+                delete(predictions).where(
+                    predictions.c.id.in_([m["old_id"] for m in id_map])
+                )
+            )
+            session.commit()
+        total += len(rows)
+        click.echo("... %d predições migradas" % total)
+    click.echo("✅ %d ids de predições convertidos para UUIDv7." % total)
+
 
 @cli.command("train-kedro")
 def train_kedro():
@@ -80,6 +340,134 @@ def train_kedro():
     click.echo(result)
 
 
+@cli.command("export-parquet")
+@click.option(
+    "--out", "out_dir", default="./exports/predictions", help="Raiz do dataset"
+)
+@click.option("--chunk-rows", default=50000, type=int, help="Predições por arquivo")
+@click.option("--full", is_flag=True, default=False, help="Ignora o watermark")
+@click.option(
+    "--settle-seconds",
+    default=60.0,
+    type=float,
+    help="Deixa de fora predições mais novas que isso (ainda podem estar na fila)",
+)
+def export_parquet(out_dir: str, chunk_rows: int, full: bool, settle_seconds: float):
+    """Exporta predições para Parquet por model_id e dia (incremental)."""
+    from app.snapshot import export_parquet as run_export
+
+    settings = Settings()
+    total = run_export(
+        get_engine(settings.db_url),
+        out_dir,
+        chunk_rows=chunk_rows,
+        full=full,
+        settle_seconds=settle_seconds,
+        yield_per=settings.export_yield_per,
+    )
+    click.echo("%d predições exportadas para %s" % (total, out_dir))
+
+
+@cli.command("rebuild-rollups")
+@click.option("--model-id", default=None, type=int, help="Só este modelo")
+@click.option(
+    "--chunk-rows", default=100000, type=int, help="Métricas por transação"
+)
+def rebuild_rollups(model_id, chunk_rows: int):
+    """Recalcula metric_rollups a partir de prediction_metrics (backfill)."""
+    settings = Settings()
+    total = rollups.rebuild(
+        get_engine(settings.db_url), model_id=model_id, chunk_rows=chunk_rows
+    )
+    click.echo("%d métricas agregadas em metric_rollups." % total)
+
+
+@cli.command("purge")
+@click.option(
+    "--days", default=None, type=int, help="Retenção (padrão RETENTION_DAYS)"
+)
+@click.option("--model-id", default=None, type=int, help="Só este modelo")
+@click.option(
+    "--chunk-size", default=None, type=int, help="Predições por transação"
+)
+@click.option("--pause-ms", default=None, type=int, help="Pausa entre blocos")
+@click.option("--archive-dir", default=None, help="Grava NDJSON antes de apagar")
+@click.option("--vacuum", is_flag=True, default=False, help="VACUUM ao final")
+@click.option("--no-analyze", is_flag=True, default=False, help="Pula o ANALYZE")
+def purge(days, model_id, chunk_size, pause_ms, archive_dir, vacuum, no_analyze):
+    """Apaga predições (e métricas) mais antigas que a retenção, em blocos."""
+    settings = Settings()
+    days = days if days is not None else settings.retention_days
+    if days < 1:
+        raise click.BadParameter("informe --days ou RETENTION_DAYS (>= 1)")
+    pause_ms = pause_ms if pause_ms is not None else settings.retention_pause_ms
+    result = retention.purge(
+        get_engine(settings.db_url),
+        days=days,
+        model_id=model_id,
+        chunk_size=chunk_size or settings.retention_chunk_size,
+        pause_s=pause_ms / 1000.0,
+        archive_dir=(
+            archive_dir if archive_dir is not None else settings.retention_archive_dir
+        ),
+        vacuum=vacuum,
+        analyze=not no_analyze,
+    )
+    click.echo(
+        "%d predições e %d métricas anteriores a %s apagadas."
+        % (result["predictions"], result["metrics"], result["cutoff"])
+    )
+    if result.get("partitions_dropped"):
+        dropped = ", ".join(result["partitions_dropped"])
+        click.echo("Partições removidas: %s" % dropped)
+    if "archive" in result:
+        click.echo("Arquivo: %s" % result["archive"])
+
+
+@cli.command("partition-tables")
+@click.option(
+    "--months-ahead", default=None, type=int, help="Padrão PARTITION_MONTHS_AHEAD"
+)
+def partition_tables(months_ahead):
+    """Converte predictions/prediction_metrics para partições mensais."""
+    settings = Settings()
+    engine = get_engine(settings.db_url)
+    kind = partitioning.backend()
+    if not kind:
+        raise click.ClickException(
+            "defina PARTITIONING_ENABLED=1 (suportado em Postgres e SQLite)"
+        )
+    ahead = settings.partition_months_ahead if months_ahead is None else months_ahead
+    if kind == "postgresql":
+        with engine.begin() as conn:
+            created = partitioning.pg_convert(conn, ahead)
+        if not created:
+            click.echo("ℹ️  As tabelas já são particionadas.")
+            return
+        click.echo("✅ Partições criadas: %s" % ", ".join(created))
+    else:
+        moved = partitioning.rotate(engine, ahead)["moved"]
+        for name, total in sorted(moved.items()):
+            click.echo("✅ %d predições movidas para %s" % (total, name))
+
+
+@cli.command("rotate-partitions")
+@click.option(
+    "--months-ahead", default=None, type=int, help="Padrão PARTITION_MONTHS_AHEAD"
+)
+def rotate_partitions(months_ahead):
+    """Tarefa periódica: partições futuras (Postgres) ou meses fechados (SQLite)."""
+    settings = Settings()
+    try:
+        result = partitioning.rotate(get_engine(settings.db_url), months_ahead)
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+    for name in result.get("created", []):
+        click.echo("✅ Partição %s criada." % name)
+    for name, total in sorted(result.get("moved", {}).items()):
+        click.echo("✅ %d predições movidas para %s" % (total, name))
+
+
 @cli.command("predict-csv")
 @click.argument("csv_path")
 @click.option("--url", default="http://localhost:8000/predict")
@@ -11,7 +11,7 @@ from sistema_crud.pipelines.train.pipeline import create_pipeline
 
 def run_training_kedro(
     flavor: str
-) -> Dict[str, str | float]:
+) -> Dict[str, str | float | dict]:
     pipeline = create_pipeline()
 
     # Determinar o caminho do projeto (sistema-crud/)
@@ -40,6 +40,7 @@ def run_training_kedro(
     catalog.add("X_train", MemoryDataSet())
     catalog.add("X_test", MemoryDataSet())
     catalog.add("y", MemoryDataSet())
+    catalog.add("feature_names", MemoryDataSet())
     catalog.add("y_train", MemoryDataSet())
     catalog.add("y_test", MemoryDataSet())
     catalog.add("model", MemoryDataSet())
@@ -63,6 +64,7 @@ def run_training_kedro(
     return {
         "version": result.get("version", "unknown"),
         "model_path": result.get("model_path"),
+        "feature_schema": result.get("feature_schema"),
         "mse": float(result.get("mse", 0.0)),
         "r2": float(result.get("r2", 0.0)),
         "mape": float(result.get("mape", 0.0)),
@@ -1,8 +1,9 @@
 from __future__ import annotations
 
+import json
 import uuid
 from pathlib import Path
-from typing import Dict, Tuple
+from typing import Dict, List, Tuple
 
 import joblib
 import numpy as np
@@ -14,7 +15,7 @@ from sklearn.model_selection import train_test_split
 
 def generate_data(
     train_data: pd.DataFrame, params: Dict
-) -> Tuple[np.ndarray, np.ndarray]:
+) -> Tuple[np.ndarray, np.ndarray, List[str]]:
     """
     Gera X e Y a partir do dataset de treino.
 
@@ -23,7 +24,8 @@ def generate_data(
         params: Parâmetros de configuração
 
     Returns:
-        Tupla (X, y) onde X são as features e y é o target (SalePrice)
+        Tupla (X, y, feature_names) onde X são as features, y é o target
+        (SalePrice) e feature_names é a ordem das colunas de X
     """
     # Identificar coluna target
     target_col = params.get("target_column", "SalePrice")
@@ -44,7 +46,7 @@ def generate_data(
     # Converter para numpy array
     X = X.values.astype(np.float64)
 
-    return X, y
+    return X, y, [str(c) for c in numeric_cols]
 
 
 def split_data(
@@ -118,18 +120,22 @@ def evaluate_model(
 
 
 def save_model_local(
-    model, metrics: Dict[str, float], params: Dict
+    model, metrics: Dict[str, float], feature_names: List[str], params: Dict
 ) -> Dict[str, str | float]:
     """
     Salva o modelo localmente usando joblib e retorna as métricas e informações do modelo.
-    
+
+    O schema de features (ordem das colunas usadas no treino) é salvo ao lado
+    do modelo, em ``model_<version>.features.json``.
+
     Args:
         model: Modelo treinado
         metrics: Dicionário com as métricas calculadas
+        feature_names: Nomes das features, na ordem das colunas de X
         params: Parâmetros de configuração
         
     Returns:
-        Dicionário com version, model_path e métricas
+        Dicionário com version, model_path, feature_schema e métricas
     """
     flavor = params.get("flavor", "sklearn")
     
@@ -146,11 +152,17 @@ def save_model_local(
     # Nome do arquivo do modelo baseado no version
     model_filename = f"model_{version}.pkl"
     model_path = models_dir / model_filename
+    # Valores ausentes no treino foram preenchidos com 0 (ver generate_data)
+    feature_schema = {"names": list(feature_names), "default": 0.0}
     
     try:
         if flavor == "sklearn":
-            # Salvar modelo usando joblib
-            joblib.dump(model, model_path)
+            # Salvar modelo usando joblib, sem compressão: assim os arrays podem
+            # ser carregados com joblib.load(..., mmap_mode="r") e compartilhados
+            # entre os workers da API
+            joblib.dump(model, model_path, compress=0)
+            schema_path = models_dir / f"model_{version}.features.json"
+            schema_path.write_text(json.dumps(feature_schema), encoding="utf-8")
         else:
             raise ValueError("Unsupported flavor. Only 'sklearn' is supported.")
         
@@ -158,6 +170,7 @@ def save_model_local(
         return {
             "version": version,
             "model_path": str(model_path),
+            "feature_schema": feature_schema,
             **metrics,
         }
     except Exception as e:
@@ -165,6 +178,7 @@ def save_model_local(
         return {
             "version": version,
             "model_path": None,
+            "feature_schema": feature_schema,
             "save_error": str(e)[:200] if e else "Unknown error",
             **metrics,
         }
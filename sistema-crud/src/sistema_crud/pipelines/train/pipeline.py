@@ -11,7 +11,7 @@ def create_pipeline() -> Pipeline:
             node(
                 func=generate_data,
                 inputs=["train_data", "params:train"],
-                outputs=["X", "y"],
+                outputs=["X", "y", "feature_names"],
                 name="generate_data",
             ),
             node(
@@ -34,7 +34,7 @@ def create_pipeline() -> Pipeline:
             ),
             node(
                 func=save_model_local,
-                inputs=["model", "metrics", "params:train"],
+                inputs=["model", "metrics", "feature_names", "params:train"],
                 outputs="train_result",
                 name="save_model_local",
             ),
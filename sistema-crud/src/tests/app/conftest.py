@@ -0,0 +1,94 @@
+"""Fixtures dos testes da API (pacote app na raiz do repositório).
+
+Rode a partir de sistema-crud/: ``python -m pytest src/tests/app``. O banco é
+um SQLite temporário recriado a cada teste; as variáveis de ambiente são
+definidas antes do primeiro import de app, já que os módulos leem Settings
+na importação.
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+_ROOT = Path(__file__).resolve().parents[4]
+_TMP = tempfile.mkdtemp(prefix="crud-tests-")
+
+os.environ["DB_URL"] = "sqlite+pysqlite:///" + os.path.join(_TMP, "test.db")
+os.environ["SQLITE_PARTITION_DIR"] = os.path.join(_TMP, "partitions")
+os.environ["WRITE_BEHIND_SPILL_PATH"] = os.path.join(_TMP, "spill.jsonl")
+if str(_ROOT) not in sys.path:
+    sys.path.insert(0, str(_ROOT))
+
+
+def _reset_caches() -> None:
+    from app.features import packer
+    from app.httpcache import response_cache
+    from app.ml.cache import model_cache
+    from app.ml.memo import prediction_cache
+    from app.ml.registry import active_model
+
+    active_model.invalidate()
+    model_cache.invalidate()
+    prediction_cache.invalidate()
+    packer.clear()
+    for table in ("models", "retrainings"):
+        response_cache.invalidate(table)
+
+
+@pytest.fixture
+def engine():
+    from app.config import Settings
+    from app.db import Base, get_engine
+
+    engine = get_engine(Settings().db_url)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    _reset_caches()
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def client(engine):
+    from app import create_app
+
+    return create_app().test_client()
+
+
+@pytest.fixture
+def add_prediction(engine):
+    """Grava uma predição (com uma métrica) direto no banco; devolve o id."""
+    import uuid
+    from datetime import datetime
+
+    from sqlalchemy.orm import Session
+
+    from app.models import ModelRegistry, Prediction, PredictionMetric
+
+    with Session(engine) as session:
+        model = ModelRegistry(flavor="sklearn", version="t")
+        session.add(model)
+        session.commit()
+        default_model = model.id
+
+    def add(created_at=None, model_id=None, features=None, value=1.0):
+        pred_id = uuid.uuid4().hex
+        with Session(engine) as session:
+            session.add(
+                Prediction(
+                    id=pred_id,
+                    model_id=model_id or default_model,
+                    features=features or {"a": value},
+                    prediction=value,
+                    created_at=created_at or datetime.utcnow(),
+                )
+            )
+            session.add(PredictionMetric(prediction_id=pred_id, name="v", value=value))
+            session.commit()
+        return pred_id
+
+    add.model_id = default_model
+    return add
@@ -0,0 +1,86 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+from sklearn.linear_model import LinearRegression
+
+from app.ml.batching import MicroBatcher
+from app.ml.metrics import compute_per_prediction_metrics
+from app.ml.registry import ModelRegistryAdapter
+
+
+def _model(coef):
+    xs = np.random.default_rng(0).normal(size=(50, len(coef)))
+    return LinearRegression().fit(xs, xs @ np.array(coef) + 1.0)
+
+
+def _submit_together(batcher, calls):
+    """Dispara as chamadas ao mesmo tempo, para caírem na mesma janela.
+
+    Uma chamada que falha devolve a exceção no lugar do resultado.
+    """
+    barrier = threading.Barrier(len(calls))
+
+    def call(args):
+        barrier.wait()
+        try:
+            return batcher.submit(*args)
+        except Exception as e:
+            return e
+
+    with ThreadPoolExecutor(len(calls)) as pool:
+        return list(pool.map(call, calls))
+
+
+def test_concurrent_submits_share_a_batch_and_match_predict():
+    adapter, model = ModelRegistryAdapter("sklearn"), _model([1.0, -2.0])
+    batcher = MicroBatcher(max_batch_size=8, max_wait_us=200_000)
+    rows = [({"a": float(i), "b": 1.0}, float(i) if i % 2 else None) for i in range(8)]
+    results = _submit_together(batcher, [(adapter, model, f, y) for f, y in rows])
+    for (features, y_true), (y_pred, metrics) in zip(rows, results):
+        assert y_pred == pytest.approx(adapter.predict(model, features))
+        expected = compute_per_prediction_metrics(y_pred, features, y_true=y_true)
+        assert metrics.keys() == expected.keys()
+        for name, value in expected.items():
+            assert metrics[name] == pytest.approx(value)
+    stats = batcher.stats()
+    assert stats["batch_size"]["sum"] == 8
+    # Menos chamadas a predict que requisições
+    assert stats["batch_size"]["count"] < 8
+
+
+def test_models_in_the_same_window_are_scored_apart():
+    adapter = ModelRegistryAdapter("sklearn")
+    first, second = _model([1.0]), _model([-3.0])
+    batcher = MicroBatcher(max_batch_size=4, max_wait_us=200_000)
+    calls = [(adapter, m, {"a": 2.0}) for m in (first, second, first, second)]
+    results = _submit_together(batcher, calls)
+    for (_, model, features), (y_pred, _) in zip(calls, results):
+        assert y_pred == pytest.approx(adapter.predict(model, features))
+
+
+def test_bad_item_fails_alone_in_its_group():
+    adapter, model = ModelRegistryAdapter("sklearn"), _model([1.0])
+    batcher = MicroBatcher(max_batch_size=4, max_wait_us=200_000)
+    calls = [
+        (adapter, model, {"a": 1.0}, 1.0),
+        (adapter, model, {"a": "nan"}, None),
+        (adapter, model, {"a": 2.0}, "abc"),
+        (adapter, model, {"a": 3.0}, None),
+    ]
+    results = _submit_together(batcher, calls)
+    # As quatro chamadas caíram numa única janela
+    assert batcher.stats()["batch_size"]["count"] == 1
+    with pytest.raises(ValueError) as sk_error:
+        adapter.predict(model, {"a": "nan"})
+    assert isinstance(results[1], ValueError)
+    assert str(results[1]) == str(sk_error.value)
+    assert isinstance(results[2], ValueError)
+    for i in (0, 3):
+        y_pred, metrics = results[i]
+        assert y_pred == pytest.approx(adapter.predict(model, calls[i][2]))
+    assert results[0][1]["error_abs"] == pytest.approx(abs(results[0][0] - 1.0))
+    # O worker continua atendendo depois da falha
+    y_pred, _ = batcher.submit(adapter, model, {"a": 1.0})
+    assert y_pred == pytest.approx(adapter.predict(model, {"a": 1.0}))
@@ -0,0 +1,118 @@
+import os
+
+import numpy as np
+import pytest
+from sklearn.linear_model import LinearRegression
+from sqlalchemy.orm import Session
+
+from app.ml.cache import ModelCache, model_cache
+from app.ml.registry import ModelRegistryAdapter
+
+
+def _loader(calls, value):
+    def load():
+        calls.append(value)
+        return value
+
+    return load
+
+
+def _save(path, coef):
+    model = LinearRegression()
+    model.coef_ = np.array([coef])
+    model.intercept_ = 0.0
+    model.n_features_in_ = 1
+    return ModelRegistryAdapter.save_model(model, str(path))
+
+
+def test_hit_reuses_the_loaded_model():
+    cache = ModelCache(max_size=2)
+    calls = []
+    key = ModelCache.key_for(1, "sklearn", None)
+    assert cache.get_or_load(key, _loader(calls, "m1")) == "m1"
+    assert cache.get_or_load(key, _loader(calls, "outro")) == "m1"
+    assert calls == ["m1"]
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["size"]) == (1, 1, 1)
+
+
+def test_miss_for_another_model_and_lru_eviction():
+    cache = ModelCache(max_size=2)
+    calls = []
+    for model_id in (1, 2, 1, 3):
+        key = ModelCache.key_for(model_id, "sklearn", None)
+        cache.get_or_load(key, _loader(calls, model_id))
+    # 1 foi usado por último antes de 3 entrar: quem sai é o 2
+    assert calls == [1, 2, 3]
+    assert cache.stats()["evictions"] == 1
+    cache.get_or_load(ModelCache.key_for(2, "sklearn", None), _loader(calls, 2))
+    assert calls == [1, 2, 3, 2]
+
+
+def test_loader_error_is_not_cached():
+    cache = ModelCache()
+    key = ModelCache.key_for(1, "sklearn", None)
+
+    def broken():
+        raise OSError("disco")
+
+    for _ in range(2):
+        with pytest.raises(OSError):
+            cache.get_or_load(key, broken)
+    assert cache.stats()["load_errors"] == 2
+    assert cache.get_or_load(key, lambda: "ok") == "ok"
+
+
+def test_rewritten_artifact_replaces_the_old_entry(tmp_path):
+    # Retreino que sobrescreve o arquivo: mtime/tamanho mudam e a chave também
+    path = _save(tmp_path / "model.pkl", 2.0)
+    cache = ModelCache()
+    old_key = ModelCache.key_for(7, "sklearn", path)
+    cache.get_or_load(old_key, lambda: "v1")
+    _save(path, 3.0)
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+    new_key = ModelCache.key_for(7, "sklearn", path)
+    assert new_key != old_key
+    assert cache.get_or_load(new_key, lambda: "v2") == "v2"
+    stats = cache.stats()
+    assert (stats["size"], stats["invalidations"]) == (1, 1)
+
+
+def test_invalidate_one_model_or_all():
+    cache = ModelCache()
+    for model_id in (1, 2):
+        cache.get_or_load(ModelCache.key_for(model_id, "sklearn", None), lambda: 0)
+    assert cache.invalidate(1) == 1
+    assert cache.stats()["size"] == 1
+    assert cache.invalidate() == 1
+    assert cache.stats()["size"] == 0
+
+
+def test_retraining_and_switch_serve_the_new_model(client, engine, tmp_path):
+    from app import services
+
+    r = client.post("/predict", json={"features": {"a": 2}})
+    assert r.get_json()["prediction"] == 2.0
+    first_model = r.get_json()["model_id"]
+
+    path = _save(tmp_path / "retrained.pkl", 5.0)
+    with Session(engine) as session:
+        trained = services.register_training(
+            session, {"model_path": path, "version": "t1"}
+        )
+    r = client.post("/predict", json={"features": {"a": 2}})
+    assert r.get_json()["model_id"] == trained["model_id"]
+    assert r.get_json()["prediction"] == 10.0
+
+    r = client.post("/switch-model", json={"flavor": "sklearn"})
+    switched = r.get_json()["model_id"]
+    r = client.post("/predict", json={"features": {"a": 2}})
+    assert r.get_json()["model_id"] == switched
+    assert r.get_json()["prediction"] == 2.0
+
+    # Removido do registro, o modelo sai do cache
+    before = model_cache.stats()["size"]
+    client.delete("/records/models/%d" % trained["model_id"])
+    assert model_cache.stats()["size"] == before - 1
+    assert first_model != trained["model_id"] != switched
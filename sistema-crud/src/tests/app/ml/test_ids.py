@@ -0,0 +1,26 @@
+from datetime import datetime
+
+from app.ml.ids import Uuid7Clock, unix_ms, uuid7_hex, uuid7_hex_at
+
+
+def test_uuid7_hex_is_increasing():
+    ids = [uuid7_hex() for _ in range(10000)]
+    assert ids == sorted(ids) and len(set(ids)) == len(ids)
+    assert all(i[12] == "7" for i in ids)
+
+
+def test_clock_overflows_sequence_into_next_millisecond():
+    clock = Uuid7Clock()
+    dt = datetime(2026, 1, 1, 12, 0, 0)
+    ids = [uuid7_hex_at(dt, clock=clock) for _ in range(5000)]
+    assert ids == sorted(ids) and len(set(ids)) == 5000
+    assert int(ids[-1], 16) >> 80 == unix_ms(dt) + 1
+
+
+def test_clock_seed_continues_after_existing_id():
+    dt = datetime(2026, 1, 1)
+    first = Uuid7Clock()
+    existing = [uuid7_hex_at(dt, clock=first) for _ in range(3)]
+    resumed = Uuid7Clock()
+    resumed.seed(existing[-1])
+    assert uuid7_hex_at(dt, clock=resumed) > existing[-1]
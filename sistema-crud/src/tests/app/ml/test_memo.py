@@ -0,0 +1,70 @@
+from types import SimpleNamespace
+
+from app.ml import memo
+from app.ml.memo import PredictionCache
+
+
+def test_hit_returns_prediction_and_original_id():
+    cache = PredictionCache()
+    key = cache.key_for(1, {"a": 1.0}, by_name=True)
+    assert cache.get(key) is None
+    cache.put(key, 2.5, "p1")
+    assert cache.get(key) == (2.5, "p1")
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["size"]) == (1, 1, 1)
+
+
+def test_key_normalises_numbers_and_order_by_name():
+    key_for = PredictionCache.key_for
+    assert key_for(1, {"a": 1, "b": 2}, True) == key_for(1, {"a": 1.0, "b": 2.0}, True)
+    assert key_for(1, {"a": 1, "b": 2}, True) == key_for(1, {"b": 2, "a": 1}, True)
+    # Alinhamento posicional: a ordem muda a predição, então muda a chave
+    assert key_for(1, {"a": 1, "b": 2}, False) != key_for(1, {"b": 2, "a": 1}, False)
+    assert key_for(1, {"a": 1}, True) != key_for(2, {"a": 1}, True)
+    assert key_for(1, {"a": "1"}, True) != key_for(1, {"a": 1}, True)
+
+
+def test_invalidate_one_model_or_everything():
+    cache = PredictionCache()
+    keys = [cache.key_for(m, {"a": 1.0}, True) for m in (1, 1, 2)]
+    keys[1] = cache.key_for(1, {"a": 2.0}, True)
+    for i, key in enumerate(keys):
+        cache.put(key, float(i), "p%d" % i)
+    cache.invalidate(1)
+    assert [cache.get(k) for k in keys] == [None, None, (2.0, "p2")]
+    cache.invalidate()
+    assert cache.get(keys[2]) is None
+    assert cache.stats()["bytes"] == 0
+
+
+def test_ttl_and_size_limits(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(memo, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    cache = PredictionCache(max_entries=2, ttl_s=10.0)
+    keys = [cache.key_for(1, {"a": float(i)}, True) for i in range(3)]
+    for key in keys:
+        cache.put(key, 1.0, "p")
+    # A mais antiga saiu pelo limite de entradas
+    assert cache.get(keys[0]) is None
+    assert cache.stats()["evictions"] == 1
+    now[0] += 11
+    assert cache.get(keys[1]) is None
+    assert cache.stats()["expired"] == 1
+
+    small = PredictionCache(max_bytes=1)
+    small.put(keys[0], 1.0, "p")
+    assert small.stats()["size"] == 0
+
+
+def test_predict_hit_skips_scoring(client, monkeypatch):
+    from app import services
+
+    monkeypatch.setattr(services.settings, "prediction_cache_enabled", True)
+    monkeypatch.setattr(services.settings, "prediction_cache_persist_hits", False)
+    first = client.post("/predict", json={"features": {"a": 2}}).get_json()
+    second = client.post("/predict", json={"features": {"a": 2.0}}).get_json()
+    assert (first["cached"], second["cached"]) == (False, True)
+    assert second["prediction_id"] == first["prediction_id"]
+    assert second["prediction"] == first["prediction"]
+    # Sem gravar o acerto: só a primeira predição foi persistida
+    assert len(client.get("/predictions").get_json()) == 1
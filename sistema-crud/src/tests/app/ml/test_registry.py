@@ -0,0 +1,92 @@
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.ml import registry
+from app.ml.memo import prediction_cache
+from app.ml.registry import ActiveModelResolver
+from app.models import ModelRegistry
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = SimpleNamespace(t=1000.0)
+    monkeypatch.setattr(registry, "time", SimpleNamespace(monotonic=lambda: now.t))
+    return now
+
+
+@pytest.fixture
+def statements(engine):
+    seen = []
+
+    def count(conn, cursor, statement, *args):
+        seen.append(statement)
+
+    event.listen(engine, "before_cursor_execute", count)
+    yield seen
+    event.remove(engine, "before_cursor_execute", count)
+
+
+def _register(engine, bump=True) -> int:
+    # Como outro processo faria: grava o modelo e incrementa o contador
+    with Session(engine) as session:
+        row = ModelRegistry(flavor="sklearn", version="t")
+        session.add(row)
+        if bump:
+            ActiveModelResolver.mark_changed(session)
+        session.commit()
+        return row.id
+
+
+def _resolve(engine, resolver):
+    with Session(engine) as session:
+        return resolver.resolve(session, "sklearn")
+
+
+def test_creates_the_dummy_model_when_the_registry_is_empty(engine, clock):
+    active = _resolve(engine, ActiveModelResolver(check_interval=1.0))
+    assert (active.flavor, active.model_path) == ("sklearn", None)
+    with Session(engine) as session:
+        assert session.get(ModelRegistry, active.id) is not None
+
+
+def test_no_query_inside_the_check_interval(engine, clock, statements):
+    resolver = ActiveModelResolver(check_interval=1.0)
+    first = _resolve(engine, resolver)
+    _register(engine)
+    statements.clear()
+    clock.t += 0.5
+    assert _resolve(engine, resolver) == first
+    assert statements == []
+
+
+def test_reloads_when_the_counter_changed(engine, clock):
+    resolver = ActiveModelResolver(check_interval=1.0)
+    _resolve(engine, resolver)
+    prediction_cache.put(prediction_cache.key_for(1, {"a": 1.0}, False), 1.0, "p")
+    new_id = _register(engine)
+    clock.t += 1.5
+    assert _resolve(engine, resolver).id == new_id
+    # Predições memorizadas do modelo anterior caem junto
+    assert prediction_cache.stats()["size"] == 0
+
+
+def test_unchanged_counter_only_reads_the_counter(engine, clock, statements):
+    resolver = ActiveModelResolver(check_interval=1.0)
+    first = _resolve(engine, resolver)
+    # Sem incrementar o contador, a troca não é vista
+    _register(engine, bump=False)
+    statements.clear()
+    clock.t += 1.5
+    assert _resolve(engine, resolver) == first
+    assert len([s for s in statements if s.lstrip().upper().startswith("SELECT")]) == 1
+
+
+def test_invalidate_forces_a_reload(engine, clock):
+    resolver = ActiveModelResolver(check_interval=60.0)
+    _resolve(engine, resolver)
+    new_id = _register(engine, bump=False)
+    resolver.invalidate()
+    assert _resolve(engine, resolver).id == new_id
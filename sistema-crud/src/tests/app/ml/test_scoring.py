@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+from sklearn.linear_model import ElasticNet, Lasso, LinearRegression, Ridge
+
+from app.ml.registry import ModelRegistryAdapter
+from app.ml.scoring import LinearScorer, compile_model
+
+
+def _fitted(cls, n_features=5):
+    rng = np.random.default_rng(1)
+    xs = rng.normal(size=(200, n_features))
+    y = xs @ rng.normal(size=n_features) + 3.0 + rng.normal(scale=0.1, size=200)
+    return cls().fit(xs, y)
+
+
+@pytest.mark.parametrize("cls", [LinearRegression, Ridge, Lasso, ElasticNet])
+def test_linear_scorer_matches_predict(cls):
+    model = _fitted(cls)
+    scorer = LinearScorer.from_model(model)
+    assert scorer is not None
+    xs = np.random.default_rng(2).normal(size=(50, 5))
+    expected = model.predict(xs)
+    np.testing.assert_allclose(scorer.score_matrix(xs), expected, rtol=1e-12)
+    for x, y in zip(xs, expected):
+        assert scorer.score_vector(x) == pytest.approx(y, rel=1e-12)
+        assert scorer.score_row(x.tolist()) == pytest.approx(y, rel=1e-12)
+
+
+def test_linear_scorer_matches_the_dummy_and_no_intercept_models():
+    dummy = ModelRegistryAdapter("sklearn").load_active()
+    plain = LinearRegression(fit_intercept=False).fit(
+        np.eye(3), np.array([1.0, 2.0, 3.0])
+    )
+    xs = np.random.default_rng(4).normal(size=(20, 3))
+    for model in (dummy, plain):
+        scorer = LinearScorer.from_model(model)
+        width = model.n_features_in_
+        np.testing.assert_allclose(
+            scorer.score_matrix(xs[:, :width]), model.predict(xs[:, :width])
+        )
+
+
+def test_linear_scorer_skips_subclasses_and_multi_target():
+    class Clipped(LinearRegression):
+        def predict(self, X):
+            return np.clip(super().predict(X), 0, None)
+
+    xs = np.random.default_rng(5).normal(size=(30, 2))
+    assert LinearScorer.from_model(Clipped().fit(xs, xs[:, 0])) is None
+    multi = LinearRegression().fit(xs, np.column_stack([xs[:, 0], xs[:, 1]]))
+    assert LinearScorer.from_model(multi) is None
+    assert compile_model(multi).scorer is None
+
+
+@pytest.mark.parametrize("width", [3, 5, 8])
+def test_adapter_fast_path_matches_sklearn_path(width):
+    # Linhas curtas (zeros) e longas (truncadas) dão o mesmo resultado nos dois
+    model = _fitted(LinearRegression)
+    adapter = ModelRegistryAdapter("sklearn")
+    features = {"f%d" % i: float(i) - 2.5 for i in range(width)}
+    fast = adapter.predict(compile_model(model), features)
+    slow = adapter.predict(model, features)
+    assert fast == pytest.approx(slow, rel=1e-12)
+    rows = np.random.default_rng(3).normal(size=(10, width))
+    np.testing.assert_allclose(
+        adapter.predict_batch(compile_model(model), rows),
+        adapter.predict_batch(model, rows),
+        rtol=1e-12,
+    )
+
+
+@pytest.mark.parametrize("bad", [np.inf, -np.inf, np.nan])
+def test_linear_scorer_rejects_non_finite_like_sklearn(bad):
+    model = _fitted(LinearRegression)
+    scorer = LinearScorer.from_model(model)
+    x = np.array([1.0, bad, 0.0, 0.0, 0.0])
+    with pytest.raises(ValueError) as sk_error:
+        model.predict(x[None, :])
+    for call in (
+        lambda: scorer.score_vector(x),
+        lambda: scorer.score_row(x.tolist()),
+        lambda: scorer.score_matrix(x[None, :]),
+    ):
+        with pytest.raises(ValueError) as error:
+            call()
+        assert str(error.value).splitlines()[0] == str(sk_error.value).splitlines()[0]
+
+
+def test_non_finite_outside_model_width_is_ignored():
+    # Colunas além de n_features são truncadas, como no _align_features
+    model = _fitted(LinearRegression, n_features=2)
+    scorer = LinearScorer.from_model(model)
+    x = np.array([1.0, 2.0, np.inf])
+    assert scorer.score_vector(x) == pytest.approx(model.predict(x[None, :2])[0])
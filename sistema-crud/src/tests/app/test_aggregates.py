@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+T0 = datetime(2026, 1, 1, 12, 0, 0)
+
+# Hora 12: 1..100; hora 13: três valores
+HOUR_12 = [float(v) for v in range(1, 101)]
+HOUR_13 = [2.0, 4.0, 9.0]
+
+
+@pytest.fixture
+def seeded(add_prediction):
+    for i, v in enumerate(HOUR_12):
+        add_prediction(created_at=T0 + timedelta(seconds=30 * i), value=v)
+    for i, v in enumerate(HOUR_13):
+        add_prediction(created_at=T0 + timedelta(hours=1, minutes=i), value=v)
+    return add_prediction.model_id
+
+
+def _summary(client, **args):
+    r = client.get("/metrics/summary", query_string={"name": "v", **args})
+    assert r.status_code == 200
+    return r.get_json()
+
+
+def test_raw_summary_per_hour(client, seeded):
+    body = _summary(client, percentiles="0.5,0.9,0.99")
+    assert (body["source"], body["bucket"]) == ("raw", "hour")
+    first, second = body["series"]
+    assert (first["model_id"], first["bucket"]) == (seeded, "2026-01-01T12:00:00")
+    assert second["bucket"] == "2026-01-01T13:00:00"
+    for item, values in ((first, HOUR_12), (second, HOUR_13)):
+        assert item["count"] == len(values)
+        assert item["mean"] == pytest.approx(np.mean(values))
+        assert item["std"] == pytest.approx(np.std(values))
+        assert (item["min"], item["max"]) == (min(values), max(values))
+        # Percentil interpolado num histograma de 100 faixas: até uma faixa de
+        # distância do valor de posição ceil(q * count)
+        width = (max(values) - min(values)) / 100
+        for key, q in (("p50", 50), ("p90", 90), ("p99", 99)):
+            expected = np.percentile(values, q, method="inverted_cdf")
+            assert item[key] == pytest.approx(expected, abs=width)
+
+
+def test_raw_summary_filters(client, seeded):
+    body = _summary(client, bucket="day", start=(T0 + timedelta(hours=1)).isoformat())
+    [item] = body["series"]
+    assert (item["bucket"], item["count"]) == ("2026-01-01", 3)
+    assert _summary(client, model_id=seeded + 1)["series"] == []
+    assert _summary(client, name="outra")["series"] == []
+
+
+@pytest.mark.parametrize(
+    "query, error",
+    [
+        ({}, "name is required"),
+        ({"name": "v", "bucket": "week"}, "bucket must be one of minute, hour, day"),
+        (
+            {"name": "v", "percentiles": "2"},
+            "percentiles must be numbers between 0 and 1",
+        ),
+        ({"name": "v", "start": "ontem"}, "start must be an ISO datetime"),
+    ],
+)
+def test_summary_bad_arguments(client, engine, query, error):
+    r = client.get("/metrics/summary", query_string=query)
+    assert r.status_code == 400
+    assert r.get_json() == {"error": error}
@@ -0,0 +1,54 @@
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import pytest
+import uvicorn
+
+
+@pytest.fixture
+def asgi_url(engine):
+    """API ASGI servida pelo uvicorn numa thread, numa porta livre."""
+    from app.asgi import create_asgi_app
+
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    server = uvicorn.Server(
+        uvicorn.Config(create_asgi_app(), log_level="warning", lifespan="off")
+    )
+    thread = threading.Thread(target=server.run, kwargs={"sockets": [sock]})
+    thread.daemon = True
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    yield "http://127.0.0.1:%d" % sock.getsockname()[1]
+    server.should_exit = True
+    thread.join(5)
+    sock.close()
+
+
+def test_concurrent_predicts_past_the_check_interval(asgi_url, monkeypatch):
+    # Cada rodada passa do intervalo: o modelo ativo é relido com 20 requisições
+    # no mesmo event loop, e uma troca de modelo acontece no meio
+    from app.ml.registry import active_model
+
+    monkeypatch.setattr(active_model, "check_interval", 0.05)
+    with httpx.Client(base_url=asgi_url, timeout=10) as client:
+
+        def predict(i):
+            r = client.post("/predict", json={"features": {"a": i}})
+            assert r.status_code == 200
+            return r.json()["model_id"]
+
+        with ThreadPoolExecutor(20) as pool:
+            first = set(pool.map(predict, range(20)))
+            for _ in range(3):
+                time.sleep(0.1)
+                list(pool.map(predict, range(20)))
+            switched = client.post("/switch-model", json={"flavor": "sklearn"})
+            time.sleep(0.1)
+            last = set(pool.map(predict, range(20)))
+    assert len(first) == 1
+    assert last == {switched.json()["model_id"]}
@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from app import db
+
+
+@pytest.fixture
+def fresh_engines(monkeypatch, tmp_path):
+    """Engines novos (fora do cache do processo) para um banco temporário."""
+    monkeypatch.setattr(db, "_engine_cache", {})
+    monkeypatch.setattr(db, "_async_engine_cache", {})
+    yield "sqlite+pysqlite:///" + str(tmp_path / "pool.db")
+    for engine in db._engine_cache.values():
+        engine.dispose()
+
+
+def _pragmas(conn):
+    names = ("journal_mode", "synchronous", "busy_timeout", "cache_size", "temp_store")
+    return {n: conn.exec_driver_sql("PRAGMA %s" % n).scalar() for n in names}
+
+
+def test_pragmas_applied_on_every_connection(fresh_engines, monkeypatch):
+    monkeypatch.setenv("SQLITE_BUSY_TIMEOUT_MS", "1234")
+    monkeypatch.setenv("SQLITE_CACHE_SIZE", "-2000")
+    engine = db.get_engine(fresh_engines)
+    expected = {
+        "journal_mode": "wal",
+        "synchronous": 1,  # NORMAL
+        "busy_timeout": 1234,
+        "cache_size": -2000,
+        "temp_store": 2,  # MEMORY
+    }
+    # Duas conexões abertas ao mesmo tempo: a segunda também passa pelo connect
+    with engine.connect() as first, engine.connect() as second:
+        assert _pragmas(first) == expected
+        assert _pragmas(second) == expected
+
+
+def test_async_engine_gets_the_same_pragmas(fresh_engines, monkeypatch):
+    monkeypatch.setenv("SQLITE_BUSY_TIMEOUT_MS", "4321")
+    engine = db.get_async_engine(db.async_url_for(fresh_engines))
+
+    async def read():
+        async with engine.connect() as conn:
+            return (await conn.execute(text("PRAGMA busy_timeout"))).scalar()
+
+    try:
+        assert asyncio.run(read()) == 4321
+    finally:
+        asyncio.run(engine.dispose())
+
+
+def test_pool_timeout_raises_and_is_counted(fresh_engines, monkeypatch):
+    monkeypatch.setenv("DB_POOL_SIZE", "1")
+    monkeypatch.setenv("DB_MAX_OVERFLOW", "0")
+    monkeypatch.setenv("DB_POOL_TIMEOUT_S", "0.1")
+    engine = db.get_engine(fresh_engines)
+    with engine.connect():
+        with pytest.raises(PoolTimeoutError):
+            engine.connect()
+    stats = db.pool_stats()["sync:" + fresh_engines]
+    assert stats["timeouts"] == 1
+    assert stats["checkout_wait_ms"]["count"] == 2
+    # Devolvida a conexão, o checkout volta a funcionar
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT 1")).scalar() == 1
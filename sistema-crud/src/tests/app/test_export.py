@@ -0,0 +1,127 @@
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.orm import Session
+
+from app import export
+from app.models import ModelRegistry
+from app.services import BadRequest
+
+T0 = datetime(2026, 1, 1, 12, 0, 0)
+
+
+def _ndjson(response):
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+
+@pytest.fixture
+def seeded(engine, add_prediction):
+    with Session(engine) as session:
+        other = ModelRegistry(flavor="sklearn", version="t2")
+        session.add(other)
+        session.commit()
+        other_id = other.id
+    ids = [
+        add_prediction(created_at=T0 + timedelta(hours=i), value=float(i))
+        for i in range(3)
+    ]
+    ids.append(add_prediction(created_at=T0, model_id=other_id, value=9.0))
+    return ids, add_prediction.model_id, other_id
+
+
+def test_ndjson_pivots_metrics_in_time_order(client, seeded):
+    ids, _, _ = seeded
+    r = client.get("/export/predictions")
+    assert r.status_code == 200
+    assert r.mimetype == "application/x-ndjson"
+    records = _ndjson(r)
+    # Empate em created_at: desempata pelo id
+    assert [rec["id"] for rec in records] == sorted(ids[:1] + ids[3:]) + ids[1:3]
+    first = next(rec for rec in records if rec["id"] == ids[1])
+    assert first["metrics"] == {"v": 1.0}
+    assert first["features"] == {"a": 1.0}
+    assert first["created_at"] == (T0 + timedelta(hours=1)).isoformat()
+
+
+def test_filters_by_model_and_half_open_time_range(client, seeded):
+    ids, model_id, other_id = seeded
+    r = client.get("/export/predictions?model_id=%d" % other_id)
+    assert [rec["id"] for rec in _ndjson(r)] == ids[3:]
+    start, end = T0 + timedelta(hours=1), T0 + timedelta(hours=2)
+    r = client.get(
+        "/export/predictions",
+        query_string={
+            "model_id": model_id,
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+        },
+    )
+    # start inclusivo, end exclusivo
+    assert [rec["id"] for rec in _ndjson(r)] == [ids[1]]
+
+
+def test_csv_header_metric_columns_and_attachment(client, seeded):
+    ids, model_id, _ = seeded
+    r = client.get(
+        "/export/predictions",
+        query_string={"format": "csv", "metrics": "v,error_abs", "model_id": model_id},
+    )
+    assert r.mimetype == "text/csv"
+    assert (
+        r.headers["Content-Disposition"] == 'attachment; filename="predictions.csv"'
+    )
+    rows = list(csv.reader(io.StringIO(r.get_data(as_text=True))))
+    assert rows[0] == ["id", "model_id", "created_at", "prediction", "features"] + [
+        "v",
+        "error_abs",
+    ]
+    assert [row[0] for row in rows[1:]] == ids[:3]
+    # Métrica ausente fica vazia; features vão como JSON compacto
+    assert rows[2][4:] == ['{"a":1.0}', "1.0", ""]
+
+
+def test_ndjson_attachment_name(client, engine):
+    r = client.get("/export/predictions")
+    assert (
+        r.headers["Content-Disposition"]
+        == 'attachment; filename="predictions.ndjson"'
+    )
+    assert r.get_data(as_text=True) == ""
+
+
+@pytest.mark.parametrize(
+    "query, error",
+    [
+        ({"format": "xml"}, "format must be one of csv, ndjson"),
+        ({"model_id": "x"}, "model_id must be integer"),
+        ({"start": "ontem"}, "start must be an ISO datetime"),
+        ({"end": "2026-13-01"}, "end must be an ISO datetime"),
+    ],
+)
+def test_bad_arguments_are_400(client, engine, query, error):
+    r = client.get("/export/predictions", query_string=query)
+    assert r.status_code == 400
+    assert r.get_json() == {"error": error}
+
+
+def test_parse_time():
+    args = {"start": "2026-01-02T03:04:05", "end": ""}
+    assert export.parse_time(args, "start") == datetime(2026, 1, 2, 3, 4, 5)
+    assert export.parse_time(args, "end") is None
+    assert export.parse_time(args, "missing") is None
+    with pytest.raises(BadRequest):
+        export.parse_time({"start": "2026/01/02"}, "start")
+
+
+def test_large_export_is_streamed_in_chunks(engine, add_prediction):
+    for i in range(export._CHUNK_RECORDS + 5):
+        add_prediction(created_at=T0 + timedelta(seconds=i), value=float(i))
+    chunks = list(export.stream_export(engine, export.ExportRequest({})))
+    assert len(chunks) == 2
+    records = [json.loads(line) for c in chunks for line in c.splitlines()]
+    assert [r["prediction"] for r in records] == [
+        float(i) for i in range(export._CHUNK_RECORDS + 5)
+    ]
@@ -0,0 +1,96 @@
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app import features
+from app.features import FeaturePacker
+from app.models import FeatureSchema, Prediction
+
+
+def _rows(*feature_dicts):
+    return [{"id": str(i), "features": f} for i, f in enumerate(feature_dicts)]
+
+
+def test_float64_round_trip_is_exact(engine):
+    packer = FeaturePacker("float64")
+    values = {"a": 0.1, "b": -3, "c": 1e300}
+    with Session(engine) as session:
+        (row,) = packer.pack_rows(session, _rows(values))
+        session.commit()
+    assert row["features"] is None and len(row["features_packed"]) == 3 * 8
+    assert packer.unpack(row["feature_schema_id"], row["features_packed"]) == {
+        "a": 0.1,
+        "b": -3.0,
+        "c": 1e300,
+    }
+
+
+def test_float32_keeps_about_seven_digits(engine):
+    packer = FeaturePacker("float32")
+    with Session(engine) as session:
+        (row,) = packer.pack_rows(session, _rows({"a": 1.2345678901}))
+        session.commit()
+    assert len(row["features_packed"]) == 4
+    out = packer.features_of(SimpleNamespace(**row))
+    assert out["a"] == pytest.approx(1.2345678901, rel=1e-7)
+
+
+def test_non_numeric_rows_stay_json(engine):
+    packer = FeaturePacker("float64")
+    originals = ({"a": "x"}, {"a": True}, {"a": None}, {"a": [1]}, {})
+    with Session(engine) as session:
+        out = packer.pack_rows(session, _rows(*originals))
+    assert [r["features"] for r in out] == list(originals)
+    assert all(r["feature_schema_id"] is None for r in out)
+
+
+def test_schemas_are_shared_per_names_and_dtype(engine):
+    packer = FeaturePacker("float64")
+    with Session(engine) as session:
+        out = packer.pack_rows(
+            session, _rows({"a": 1, "b": 2}, {"a": 3, "b": 4}, {"b": 1, "a": 2})
+        )
+        session.commit()
+        n_schemas = session.execute(
+            select(func.count()).select_from(FeatureSchema)
+        ).scalar()
+    assert out[0]["feature_schema_id"] == out[1]["feature_schema_id"]
+    # A ordem dos nomes faz parte do schema
+    assert out[2]["feature_schema_id"] != out[0]["feature_schema_id"]
+    assert n_schemas == 2
+    decoded = packer.unpack_many(
+        [r["feature_schema_id"] for r in out], [r["features_packed"] for r in out]
+    )
+    assert decoded == [{"a": 1.0, "b": 2.0}, {"a": 3.0, "b": 4.0}, {"b": 1.0, "a": 2.0}]
+
+
+def test_schema_created_by_another_packer_is_loaded(engine):
+    writer, reader = FeaturePacker("float64"), FeaturePacker("float64")
+    with Session(engine) as session:
+        (row,) = writer.pack_rows(session, _rows({"x": 5}))
+        session.commit()
+    assert reader.unpack(row["feature_schema_id"], row["features_packed"]) == {
+        "x": 5.0
+    }
+    with pytest.raises(LookupError):
+        reader.unpack(row["feature_schema_id"] + 1, row["features_packed"])
+
+
+def test_unsupported_storage():
+    with pytest.raises(ValueError):
+        FeaturePacker("float16")
+
+
+def test_api_stores_packed_features_and_returns_names(client, engine, monkeypatch):
+    monkeypatch.setattr(features.packer, "storage", "float64")
+    r = client.post("/predict", json={"features": {"a": 2, "b": 0.5}})
+    assert r.status_code == 200
+    with Session(engine) as session:
+        stored = session.execute(select(Prediction)).scalar_one()
+        assert stored.features is None and stored.feature_schema_id is not None
+    (listed,) = client.get("/predictions").get_json()
+    assert listed["features"] == {"a": 2.0, "b": 0.5}
+    lines = client.get("/export/predictions").get_data(as_text=True).splitlines()
+    assert '"features":{"a":2.0,"b":0.5}' in lines[0]
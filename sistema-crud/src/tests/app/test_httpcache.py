@@ -0,0 +1,52 @@
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+from app import httpcache
+
+
+def _switch(client):
+    assert client.post("/switch-model", json={"flavor": "sklearn"}).status_code == 200
+
+
+def test_etag_returns_304_until_a_write(client):
+    _switch(client)
+    first = client.get("/models")
+    etag = first.headers["ETag"]
+    assert first.status_code == 200
+    again = client.get("/models", headers={"If-None-Match": etag})
+    assert again.status_code == 304 and again.data == b""
+    _switch(client)
+    changed = client.get("/models", headers={"If-None-Match": etag})
+    assert changed.status_code == 200 and changed.headers["ETag"] != etag
+    assert len(changed.get_json()) == 2
+
+
+def test_etag_depends_on_query(client):
+    _switch(client)
+    a = client.get("/models?limit=1").headers["ETag"]
+    b = client.get("/models?limit=2").headers["ETag"]
+    assert a != b
+
+
+def test_same_second_write_is_not_hidden_by_if_modified_since(client):
+    _switch(client)
+    first = client.get("/models")
+    # Escrita acabou de acontecer: o segundo ainda não terminou
+    assert "Last-Modified" not in first.headers
+    since = format_datetime(datetime.now(timezone.utc), usegmt=True)
+    _switch(client)
+    again = client.get("/models", headers={"If-Modified-Since": since})
+    assert again.status_code == 200
+    assert len(again.get_json()) == 2
+
+
+def test_if_modified_since_after_the_second_ends():
+    past = datetime.utcnow() - timedelta(seconds=5)
+    v = httpcache.Validator('"models-1-x"', past)
+    sent = httpcache.headers(v)["Last-Modified"]
+    assert httpcache.not_modified(v, None, sent)
+    # If-None-Match tem precedência, mesmo com If-Modified-Since válido
+    assert not httpcache.not_modified(v, '"models-2-x"', sent)
+    now = httpcache.Validator('"models-1-x"', datetime.utcnow())
+    later = datetime.now(timezone.utc) + timedelta(hours=1)
+    assert not httpcache.not_modified(now, None, format_datetime(later, usegmt=True))
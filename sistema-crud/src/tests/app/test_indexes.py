@@ -0,0 +1,69 @@
+"""Cada consulta quente dos endpoints usa índice (EXPLAIN QUERY PLAN)."""
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import insert
+
+from app import explain, queries
+from app.models import ModelRegistry, Prediction, PredictionMetric
+
+
+@pytest.fixture
+def seeded(engine):
+    # Dados e ANALYZE: com tabelas vazias o planner escolhe outros planos
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(
+            insert(ModelRegistry),
+            [{"flavor": "sklearn", "version": "v%d" % i} for i in range(20)],
+        )
+        preds = [
+            {
+                "id": "%032x" % i,
+                "model_id": 1 + i % 20,
+                "features": {"a": i},
+                "prediction": float(i),
+                "created_at": now - timedelta(seconds=i),
+            }
+            for i in range(2000)
+        ]
+        conn.execute(insert(Prediction), preds)
+        conn.execute(
+            insert(PredictionMetric),
+            [
+                {"prediction_id": p["id"], "name": name, "value": 1.0}
+                for p in preds
+                for name in ("error_abs", "features_l2", "features_mean")
+            ],
+        )
+        conn.exec_driver_sql("ANALYZE")
+    return engine
+
+
+@pytest.mark.parametrize("id_format", ["uuid4", "uuid7"])
+def test_hot_queries_use_indexes(seeded, monkeypatch, id_format):
+    monkeypatch.setattr(queries.settings, "prediction_id_format", id_format)
+    with seeded.connect() as conn:
+        for check in explain.hot_queries("sqlite", id_format):
+            lines = explain.plan(conn, check.stmt)
+            assert explain.problems(lines, "sqlite", check.pk_order) == [], (
+                check.label,
+                lines,
+            )
+
+
+def test_metrics_by_prediction_id_is_ordered_by_the_index(seeded):
+    with seeded.connect() as conn:
+        lines = explain.plan(conn, queries.metrics_query({"prediction_id": "x"}))
+    assert any("ix_prediction_metrics_prediction_id_id" in line for line in lines)
+    assert not any("TEMP B-TREE" in line for line in lines)
+
+
+def test_problems_flags_scan_and_sort():
+    assert explain.problems(["SCAN predictions"], "sqlite") == ["SCAN predictions"]
+    assert explain.problems(["SCAN models"], "sqlite", pk_order=True) == []
+    sort = ["SEARCH t USING INDEX i (a=?)", "USE TEMP B-TREE FOR ORDER BY"]
+    assert explain.problems(sort, "sqlite") == ["USE TEMP B-TREE FOR ORDER BY"]
+    assert explain.problems(["USE TEMP B-TREE FOR GROUP BY"], "sqlite") == []
+    assert explain.problems(["Seq Scan on predictions"], "postgresql")
@@ -0,0 +1,59 @@
+import uuid
+from datetime import datetime, timedelta
+
+from click.testing import CliRunner
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+import manage
+from app.models import ModelRegistry, Prediction, PredictionMetric
+
+
+def _seed(engine, n, same_ms):
+    """Cria n predições (prediction = i) e devolve os ids antigos na ordem."""
+    base = datetime(2026, 1, 1)
+    keys = []
+    with Session(engine) as session:
+        model = ModelRegistry(flavor="sklearn", version="t")
+        session.add(model)
+        session.flush()
+        for i in range(n):
+            pred_id = uuid.uuid4().hex
+            created = base + timedelta(milliseconds=i // same_ms)
+            keys.append((created, pred_id, float(i)))
+            session.add(
+                Prediction(
+                    id=pred_id,
+                    model_id=model.id,
+                    features={"a": i},
+                    prediction=float(i),
+                    created_at=created,
+                )
+            )
+            session.add(
+                PredictionMetric(prediction_id=pred_id, name="i", value=float(i))
+            )
+        session.commit()
+    return [value for _, _, value in sorted(keys)]
+
+
+def test_migrate_prediction_ids_keeps_order_across_batches(engine):
+    # 10 linhas por milissegundo, lotes de 4: os lotes cortam o mesmo ms
+    expected = _seed(engine, 40, same_ms=10)
+    result = CliRunner().invoke(
+        manage.cli, ["migrate-prediction-ids", "--batch-size", "4"]
+    )
+    assert result.exit_code == 0, result.output
+    with Session(engine) as session:
+        rows = session.execute(
+            select(Prediction.id, Prediction.prediction).order_by(Prediction.id)
+        ).all()
+        metrics = dict(
+            session.execute(
+                select(PredictionMetric.prediction_id, PredictionMetric.value)
+            ).all()
+        )
+    assert all(r.id[12] == "7" for r in rows)
+    # ordem dos novos ids == ordem de (created_at, id antigo)
+    assert [r.prediction for r in rows] == expected
+    assert all(metrics[r.id] == r.prediction for r in rows)
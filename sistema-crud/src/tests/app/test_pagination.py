@@ -0,0 +1,79 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import queries
+
+HEADER = queries.NEXT_CURSOR_HEADER
+
+
+def _walk(client, path, size):
+    """Percorre todas as páginas pelo cursor; devolve os ids em ordem."""
+    ids, cursor, pages = [], None, 0
+    while True:
+        url = "%s?size=%d" % (path, size)
+        if cursor:
+            url += "&cursor=" + cursor
+        r = client.get(url)
+        assert r.status_code == 200
+        ids += [row["id"] for row in r.get_json()]
+        pages += 1
+        cursor = r.headers.get(HEADER)
+        if not cursor:
+            return ids, pages
+
+
+@pytest.mark.parametrize("id_format", ["uuid4", "uuid7"])
+def test_predictions_cursor_walks_every_row_once(
+    client, add_prediction, monkeypatch, id_format
+):
+    monkeypatch.setattr(queries.settings, "prediction_id_format", id_format)
+    base = datetime(2026, 1, 1)
+    # Empates em created_at: o id desempata na chave (created_at, id)
+    for i in range(7):
+        add_prediction(created_at=base + timedelta(seconds=i // 2))
+    expected = [p["id"] for p in client.get("/predictions?size=200").get_json()]
+    ids, pages = _walk(client, "/predictions", 3)
+    assert ids == expected and len(set(ids)) == 7
+    assert pages == 3
+
+
+def test_metrics_cursor_is_ascending_by_id(client, add_prediction):
+    for _ in range(5):
+        add_prediction()
+    ids, pages = _walk(client, "/metrics", 2)
+    assert ids == sorted(ids) and len(ids) == 5
+    assert pages == 3
+
+
+def test_models_cursor_with_conditional_listing(client):
+    for _ in range(5):
+        client.post("/switch-model", json={"flavor": "sklearn"})
+    ids, _ = _walk(client, "/models", 2)
+    assert sorted(ids, reverse=True) == ids and len(ids) == 5
+
+
+def test_last_page_has_no_cursor(client, add_prediction):
+    add_prediction()
+    r = client.get("/predictions?size=1")
+    assert HEADER not in r.headers
+
+
+def test_offset_page_still_works(client, add_prediction):
+    for _ in range(3):
+        add_prediction()
+    first = client.get("/predictions?size=2").get_json()
+    second = client.get("/predictions?size=2&page=2").get_json()
+    assert len(second) == 1 and second[0]["id"] not in {p["id"] for p in first}
+
+
+def test_invalid_cursor_is_rejected(client):
+    r = client.get("/predictions?cursor=not-a-cursor")
+    assert r.status_code == 400
+    assert r.get_json() == {"error": "invalid cursor"}
+
+
+def test_cursor_round_trip():
+    now = datetime(2026, 1, 2, 3, 4, 5, 6)
+    cursor = queries.encode_cursor([now, "abc"])
+    assert queries.decode_cursor(cursor, 2, has_datetime=True) == [now, "abc"]
@@ -0,0 +1,143 @@
+"""Particionamento mensal no SQLite: rotação para arquivos de mês e escritas
+(DELETE /records, purga) que alcançam as linhas já movidas."""
+
+import json
+import os
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import partitioning, retention
+
+LEGACY_METRICS = (
+    "CREATE TABLE prediction_metrics (id INTEGER NOT NULL PRIMARY KEY, "
+    "prediction_id VARCHAR(64) NOT NULL, name VARCHAR(100) NOT NULL, "
+    "value FLOAT NOT NULL, created_at DATETIME)"
+)
+
+
+@pytest.fixture
+def partitioned(engine, monkeypatch, tmp_path):
+    monkeypatch.setattr(partitioning.settings, "partitioning_enabled", True)
+    directory = str(tmp_path / "partitions")
+    monkeypatch.setattr(partitioning.settings, "sqlite_partition_dir", directory)
+    return engine
+
+
+def _rotate(engine):
+    return partitioning.sqlite_rotate(str(engine.url))
+
+
+def _old():
+    # Mês fechado e fora de uma retenção de 30 dias
+    return datetime.utcnow() - timedelta(days=70)
+
+
+def _read_all(engine, sql):
+    """Consulta pelas views *_all, como uma conexão da API."""
+    con = sqlite3.connect(engine.url.database)
+    try:
+        partitioning.sqlite_attach(con, {})
+        return con.execute(sql).fetchall()
+    finally:
+        con.close()
+
+
+def _month_count(table):
+    total = 0
+    with partitioning.month_engines() as engines:
+        for engine in engines:
+            with engine.connect() as conn:
+                total += conn.exec_driver_sql("SELECT count(*) FROM " + table).scalar()
+    return total
+
+
+def test_rotate_moves_closed_months(partitioned, add_prediction):
+    old = add_prediction(created_at=_old())
+    current = add_prediction()
+    moved = _rotate(partitioned)
+    assert sum(moved.values()) == 1
+    assert _month_count("predictions") == 1
+    assert _month_count("prediction_metrics") == 1
+    with partitioned.connect() as conn:
+        main = conn.exec_driver_sql("SELECT id FROM predictions").scalars().all()
+    assert main == [current]
+    ids = [r[0] for r in _read_all(partitioned, "SELECT id FROM predictions_all")]
+    assert sorted(ids) == sorted([old, current])
+
+
+@pytest.mark.parametrize("legacy", [False, True])
+def test_rotate_never_reuses_metric_ids(partitioned, add_prediction, legacy):
+    if legacy:
+        # Banco criado antes do AUTOINCREMENT
+        with partitioned.begin() as conn:
+            conn.exec_driver_sql("DROP TABLE prediction_metrics")
+            conn.exec_driver_sql(LEGACY_METRICS)
+    add_prediction()
+    # As métricas mais novas (maiores ids) são as do mês fechado
+    for _ in range(3):
+        add_prediction(created_at=_old())
+    _rotate(partitioned)
+    add_prediction()
+    rows = _read_all(partitioned, "SELECT id FROM prediction_metrics_all")
+    ids = sorted(r[0] for r in rows)
+    assert len(ids) == len(set(ids)) == 5
+    with partitioned.connect() as conn:
+        newest = conn.exec_driver_sql("SELECT max(id) FROM prediction_metrics").scalar()
+    assert newest == ids[-1]
+
+
+def test_delete_record_reaches_month_files(partitioned, client, add_prediction):
+    old = add_prediction(created_at=_old())
+    other = add_prediction(created_at=_old())
+    _rotate(partitioned)
+    r = client.delete("/records/predictions/%s" % old)
+    assert r.get_json() == {"deleted": 1}
+    assert _month_count("predictions") == 1
+    assert _month_count("prediction_metrics") == 1
+    (metric_id,) = _read_all(
+        partitioned,
+        "SELECT id FROM prediction_metrics_all WHERE prediction_id = '%s'" % other,
+    )[0]
+    r = client.delete("/records/prediction_metrics/%d" % metric_id)
+    assert r.get_json() == {"deleted": 1}
+    assert _month_count("prediction_metrics") == 0
+
+
+def test_purge_by_model_reaches_unattached_months(
+    partitioned, add_prediction, monkeypatch, tmp_path
+):
+    # Nenhum mês anexado: as linhas movidas ficam fora das views
+    monkeypatch.setattr(partitioning.settings, "sqlite_partition_attach_months", 0)
+    old = add_prediction(created_at=_old(), value=3.0)
+    add_prediction()
+    _rotate(partitioned)
+    totals = retention.purge(
+        partitioned,
+        days=30,
+        model_id=add_prediction.model_id,
+        pause_s=0,
+        archive_dir=str(tmp_path / "archive"),
+    )
+    assert (totals["predictions"], totals["metrics"]) == (1, 1)
+    assert "partitions_dropped" not in totals
+    assert _month_count("predictions") == 0
+    with open(totals["archive"], encoding="utf-8") as fh:
+        assert [json.loads(line)["id"] for line in fh] == [old]
+
+
+def test_purge_drops_whole_months(partitioned, add_prediction):
+    old = _old()
+    add_prediction(created_at=old)
+    _rotate(partitioned)
+    name = "%04d_%02d.db" % (old.year, old.month)
+    totals = retention.purge(partitioned, days=30, pause_s=0)
+    assert totals["partitions_dropped"] == [name]
+    assert name not in os.listdir(partitioning.settings.sqlite_partition_dir)
+    assert _month_count("predictions") == 0
+
+
+def test_month_engines_is_empty_without_partitioning(engine):
+    with partitioning.month_engines() as engines:
+        assert engines == []
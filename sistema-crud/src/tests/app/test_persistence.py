@@ -0,0 +1,181 @@
+import logging
+import os
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime
+
+import pytest
+from sqlalchemy import func, select
+
+from app.models import Prediction
+from app.persistence import WriteBehindWriter
+
+
+def _rows(model_id):
+    pred_id = uuid.uuid4().hex
+    now = datetime.utcnow()
+    pred = {
+        "id": pred_id,
+        "model_id": model_id,
+        "features": {"a": 1.0},
+        "prediction": 1.0,
+        "created_at": now,
+    }
+    metric = {"prediction_id": pred_id, "name": "v", "value": 1.0, "created_at": now}
+    return [pred], [metric]
+
+
+def _stored(engine) -> int:
+    with engine.connect() as conn:
+        return conn.execute(select(func.count()).select_from(Prediction)).scalar()
+
+
+def _wait_for(check, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not check():
+        assert time.monotonic() < deadline
+        time.sleep(0.02)
+
+
+@pytest.fixture
+def writer(engine, tmp_path):
+    """WriteBehindWriter com fila de 1 e um worker que espera ser liberado."""
+    writers = []
+
+    def make(policy):
+        w = WriteBehindWriter(
+            db_url=str(engine.url),
+            max_queue=1,
+            batch_size=1,
+            policy=policy,
+            spill_path=str(tmp_path / "spill.jsonl"),
+            flush_timeout=5.0,
+        )
+        w.release = threading.Event()
+        w.busy = threading.Event()
+        write_batch = w._write_batch
+
+        def held(batch):
+            w.busy.set()
+            w.release.wait(5.0)
+            write_batch(batch)
+
+        w._write_batch = held
+        writers.append(w)
+        return w
+
+    yield make
+    for w in writers:
+        w.release.set()
+        w.close()
+
+
+def _fill(w, model_id):
+    # Um item preso no worker e outro na fila: a próxima submissão acha a fila cheia
+    assert w.submit(*_rows(model_id))
+    w.busy.wait(5.0)
+    assert w.submit(*_rows(model_id))
+
+
+def test_drop_policy_discards_when_full(engine, add_prediction, writer):
+    w = writer("drop")
+    _fill(w, add_prediction.model_id)
+    assert w.submit(*_rows(add_prediction.model_id)) is False
+    assert w.stats()["dropped"] == 1
+    w.release.set()
+    w.close()
+    assert _stored(engine) == 2
+
+
+def test_block_policy_waits_for_room(engine, add_prediction, writer):
+    w = writer("block")
+    _fill(w, add_prediction.model_id)
+    blocked = threading.Thread(target=w.submit, args=_rows(add_prediction.model_id))
+    blocked.start()
+    blocked.join(0.3)
+    assert blocked.is_alive()
+    w.release.set()
+    blocked.join(5.0)
+    assert not blocked.is_alive()
+    w.close()
+    assert _stored(engine) == 3
+    assert w.stats()["dropped"] == 0
+
+
+def test_spill_then_replay(engine, add_prediction, writer, tmp_path):
+    w = writer("spill")
+    _fill(w, add_prediction.model_id)
+    assert w.submit(*_rows(add_prediction.model_id))
+    assert w.stats()["spilled"] == 1
+    assert (tmp_path / "spill.jsonl").read_text().count("\n") == 1
+    w.release.set()
+    # Com a fila vazia o worker reprocessa o arquivo de spill
+    _wait_for(lambda: _stored(engine) == 3)
+    _wait_for(lambda: not os.path.exists(tmp_path / "spill.jsonl.replay"))
+    assert not (tmp_path / "spill.jsonl").exists()
+
+
+def test_failed_batch_is_logged_when_dropped(tmp_path, caplog):
+    w = WriteBehindWriter(
+        # Banco sem as tabelas: toda tentativa de gravar falha
+        db_url="sqlite+pysqlite:///" + str(tmp_path / "empty.db"),
+        policy="block",
+    )
+    with caplog.at_level(logging.ERROR, logger="app.persistence"):
+        w._write_batch([(time.monotonic(), *_rows(1))])
+    assert w.stats()["dropped"] == 1
+    assert w.stats()["errors"] == 1
+    assert any(
+        "1 predições descartadas" in r.getMessage() and r.levelno == logging.ERROR
+        for r in caplog.records
+    )
+
+
+def test_failed_batch_is_spilled_under_spill_policy(tmp_path):
+    spill = tmp_path / "spill.jsonl"
+    w = WriteBehindWriter(
+        # Banco sem as tabelas: toda tentativa de gravar falha
+        db_url="sqlite+pysqlite:///" + str(tmp_path / "empty.db"),
+        policy="spill",
+        spill_path=str(spill),
+    )
+    w._write_batch([(time.monotonic(), *_rows(1))])
+    assert w.stats()["dropped"] == 0
+    assert spill.read_text().count("\n") == 1
+
+
+def test_close_drains_the_queue(engine, add_prediction):
+    w = WriteBehindWriter(db_url=str(engine.url), batch_size=2)
+    for _ in range(5):
+        w.submit(*_rows(add_prediction.model_id))
+    w.close()
+    assert _stored(engine) == 5
+    assert w.stats()["written"] == 5
+
+
+def test_atexit_flushes_pending_rows(engine, add_prediction):
+    # Processo que enfileira e sai sem chamar close(): o atexit drena a fila
+    script = (
+        "import sys, uuid\n"
+        "from datetime import datetime\n"
+        "from app.persistence import write_behind\n"
+        "for _ in range(3):\n"
+        "    row = {'id': uuid.uuid4().hex, 'model_id': int(sys.argv[1]),\n"
+        "           'features': {'a': 1.0}, 'prediction': 1.0,\n"
+        "           'created_at': datetime.utcnow()}\n"
+        "    write_behind.submit([row], [])\n"
+    )
+    root = os.path.dirname(__file__)
+    for _ in range(4):
+        root = os.path.dirname(root)
+    env = dict(os.environ, DB_URL=str(engine.url), PYTHONPATH=root)
+    subprocess.run(
+        [sys.executable, "-c", script, str(add_prediction.model_id)],
+        env=env,
+        check=True,
+        timeout=60,
+    )
+    assert _stored(engine) == 3
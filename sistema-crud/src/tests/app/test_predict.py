@@ -0,0 +1,19 @@
+import pytest
+
+
+def test_predict_persists_prediction_and_metrics(client):
+    r = client.post("/predict", json={"features": {"a": 2, "b": 1}, "y_true": 3})
+    assert r.status_code == 200
+    body = r.get_json()
+    assert body["prediction"] == 2.0
+    assert {m["name"] for m in body["metrics"]} >= {"error_abs", "features_l2"}
+    stored = client.get("/predictions").get_json()
+    assert [p["id"] for p in stored] == [body["prediction_id"]]
+
+
+@pytest.mark.parametrize("value", ["inf", "-inf", "nan"])
+def test_predict_rejects_non_finite_features(client, value):
+    # Como o model.predict do sklearn: ValueError, nada é gravado
+    r = client.post("/predict", json={"features": {"a": value}})
+    assert r.status_code == 500
+    assert client.get("/predictions").get_json() == []
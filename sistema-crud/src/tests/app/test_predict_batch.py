@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from app.ml.metrics import METRIC_NAMES, compute_batch_metrics
+
+
+@pytest.mark.parametrize(
+    "payload, count, failed",
+    [
+        ({"rows": []}, 0, 0),
+        ({"columns": {}}, 0, 0),
+        ({"rows": [5, 6]}, 2, 2),
+    ],
+)
+def test_batch_without_valid_rows(client, payload, count, failed):
+    r = client.post("/predict/batch", json=payload)
+    assert r.status_code == 200
+    body = r.get_json()
+    assert (body["count"], body["failed"]) == (count, failed)
+    assert client.get("/predictions").get_json() == []
+
+
+def test_batch_mixed_rows(client):
+    r = client.post("/predict/batch", json={"rows": [{"a": 1, "b": 2}, 7]})
+    assert r.status_code == 200
+    results = r.get_json()["results"]
+    assert results[0]["prediction_id"] and results[1]["error"]
+    assert len(client.get("/predictions").get_json()) == 1
+
+
+def test_compute_batch_metrics_empty():
+    metrics = compute_batch_metrics(np.zeros(0), np.zeros((0, 3)), np.zeros(0))
+    assert set(metrics) == set(METRIC_NAMES)
+    assert all(len(v) == 0 for v in metrics.values())
+    assert "error_abs" not in compute_batch_metrics(np.zeros(0), [])
+
+
+def test_compute_batch_metrics_single_vector():
+    metrics = compute_batch_metrics(np.array([2.0]), np.array([3.0, 4.0]))
+    assert metrics["features_l2"].tolist() == [5.0]
+
+
+@pytest.mark.parametrize(
+    "payload",
+    [
+        {"rows": [{"a": 1}, {"a": "inf"}, {"a": 2}]},
+        {"columns": {"a": [1, "inf", 2]}},
+        {"rows": [{"a": 1}, {"a": "nan"}, {"a": 2}], "y_true": [1, 2, 3]},
+    ],
+)
+def test_batch_non_finite_row_fails_alone(client, payload):
+    r = client.post("/predict/batch", json=payload)
+    assert r.status_code == 200
+    body = r.get_json()
+    assert body["failed"] == 1
+    first, bad, last = body["results"]
+    assert bad["error"] == "features must be finite numbers"
+    assert "prediction_id" not in bad
+    assert (first["prediction"], last["prediction"]) == (1.0, 2.0)
+    assert len(client.get("/predictions").get_json()) == 2
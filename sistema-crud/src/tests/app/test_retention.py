@@ -0,0 +1,116 @@
+import json
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app import retention, services
+from app.models import ModelRegistry, Prediction, PredictionMetric
+
+
+def _counts(engine):
+    with Session(engine) as session:
+        return tuple(
+            session.execute(select(func.count()).select_from(t)).scalar()
+            for t in (Prediction, PredictionMetric)
+        )
+
+
+def test_purge_removes_only_rows_older_than_retention(engine, add_prediction):
+    old = datetime.utcnow() - timedelta(days=40)
+    for i in range(5):
+        add_prediction(created_at=old + timedelta(seconds=i), value=float(i))
+    kept = add_prediction()
+    totals = retention.purge(engine, days=30, chunk_size=2, pause_s=0)
+    assert (totals["predictions"], totals["metrics"]) == (5, 5)
+    assert _counts(engine) == (1, 1)
+    with Session(engine) as session:
+        assert session.execute(select(Prediction.id)).scalar() == kept
+
+
+def test_purge_by_model_and_archive(engine, add_prediction, tmp_path):
+    old = datetime.utcnow() - timedelta(days=40)
+    with Session(engine) as session:
+        other = ModelRegistry(flavor="sklearn", version="t2")
+        session.add(other)
+        session.commit()
+        other_id = other.id
+    mine = add_prediction(created_at=old, value=7.0)
+    add_prediction(created_at=old, model_id=other_id)
+    totals = retention.purge(
+        engine,
+        days=30,
+        model_id=add_prediction.model_id,
+        pause_s=0,
+        archive_dir=str(tmp_path),
+    )
+    assert totals["predictions"] == 1
+    assert _counts(engine) == (1, 1)
+    with open(totals["archive"], encoding="utf-8") as fh:
+        records = [json.loads(line) for line in fh]
+    assert [(r["id"], r["features"], r["metrics"]) for r in records] == [
+        (mine, {"a": 7.0}, {"v": 7.0})
+    ]
+
+
+def test_purge_requires_positive_days(engine):
+    with pytest.raises(ValueError):
+        retention.purge(engine, days=0)
+
+
+def test_admin_purge_is_closed_without_token(client, monkeypatch):
+    monkeypatch.setattr(services.settings, "admin_token", "")
+    assert client.post("/admin/purge", json={"days": 30}).status_code == 403
+    r = client.post("/admin/purge", json={"days": 30}, headers={"X-Admin-Token": ""})
+    assert r.status_code == 403
+
+
+def test_admin_purge_with_token(client, engine, add_prediction, monkeypatch):
+    monkeypatch.setattr(services.settings, "admin_token", "s3cret")
+    add_prediction(created_at=datetime.utcnow() - timedelta(days=40))
+    wrong = client.post(
+        "/admin/purge", json={"days": 30}, headers={"X-Admin-Token": "nope"}
+    )
+    assert wrong.status_code == 401
+    auth = {"X-Admin-Token": "s3cret"}
+    r = client.post("/admin/purge", json={"days": 30}, headers=auth)
+    assert r.status_code == 202
+    job_id = r.get_json()["id"]
+    for _ in range(100):
+        job = client.get("/admin/purge/%s" % job_id, headers=auth).get_json()
+        if job["status"] != "running":
+            break
+        time.sleep(0.05)
+    assert job["status"] == "done"
+    assert job["result"]["predictions"] == 1
+    assert _counts(engine) == (0, 0)
+
+
+def test_purge_reaches_predictions_of_deleted_models(engine, add_prediction):
+    old = datetime.utcnow() - timedelta(days=40)
+    with Session(engine) as session:
+        gone = ModelRegistry(flavor="sklearn", version="gone")
+        session.add(gone)
+        session.commit()
+        gone_id = gone.id
+    add_prediction(created_at=old, model_id=gone_id)
+    kept = add_prediction(model_id=gone_id)
+    with Session(engine) as session:
+        session.delete(session.get(ModelRegistry, gone_id))
+        session.commit()
+    totals = retention.purge(engine, days=30, pause_s=0)
+    assert (totals["predictions"], totals["metrics"]) == (1, 1)
+    with Session(engine) as session:
+        assert list(session.execute(select(Prediction.id)).scalars()) == [kept]
+
+
+def test_admin_purge_rejected_with_several_workers(client, engine, monkeypatch):
+    monkeypatch.setattr(services.settings, "admin_token", "s3cret")
+    monkeypatch.setenv("SERVER_WORKERS", "4")
+    r = client.post(
+        "/admin/purge", json={"days": 30}, headers={"X-Admin-Token": "s3cret"}
+    )
+    assert r.status_code == 409
+    assert "single worker" in r.get_json()["error"]
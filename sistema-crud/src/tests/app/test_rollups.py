@@ -0,0 +1,125 @@
+import uuid
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+from click.testing import CliRunner
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+import manage
+from app import aggregates, persistence
+from app.ml.sketch import QuantileSketch
+from app.models import MetricRollup
+
+T0 = datetime(2026, 1, 1, 10, 0, 0)
+ALPHA = QuantileSketch().alpha
+
+
+def _values(seed, n):
+    return np.random.default_rng(seed).lognormal(size=n).tolist()
+
+
+# (hora desde T0, valores): duas horas no dia 1 e uma no dia 2
+DATA = [(0, _values(1, 300)), (1, _values(2, 200)), (24, _values(3, 50))]
+
+
+def _write(engine, model_id, data=DATA):
+    """Grava como o /predict faria (write_predictions), uma predição por valor."""
+    pred_rows, metric_rows = [], []
+    for hour, values in data:
+        for i, v in enumerate(values):
+            pred_id = uuid.uuid4().hex
+            created_at = T0 + timedelta(hours=hour, seconds=i)
+            pred_rows.append(
+                {
+                    "id": pred_id,
+                    "model_id": model_id,
+                    "features": {"a": v},
+                    "prediction": v,
+                    "created_at": created_at,
+                }
+            )
+            metric_rows.append(
+                {
+                    "prediction_id": pred_id,
+                    "name": "error_abs",
+                    "value": v,
+                    "created_at": created_at,
+                }
+            )
+    with Session(engine) as session:
+        persistence.write_predictions(session, pred_rows, metric_rows)
+        session.commit()
+
+
+def _summary(client, monkeypatch, rollups, **args):
+    monkeypatch.setattr(aggregates.settings, "rollups_enabled", rollups)
+    r = client.get(
+        "/metrics/summary",
+        query_string={"name": "error_abs", "percentiles": "0.5,0.9,0.99", **args},
+    )
+    assert r.status_code == 200
+    body = r.get_json()
+    assert body["source"] == ("rollup" if rollups else "raw")
+    return body["series"]
+
+
+def _assert_matches(rollup, raw, groups):
+    assert [(s["model_id"], s["bucket"]) for s in rollup] == [
+        (s["model_id"], s["bucket"]) for s in raw
+    ]
+    for r, s, values in zip(rollup, raw, groups):
+        assert r["count"] == s["count"]
+        for key in ("mean", "std", "min", "max"):
+            assert r[key] == pytest.approx(s[key], rel=1e-9)
+        for key, q in (("p50", 50), ("p90", 90), ("p99", 99)):
+            exact = np.percentile(values, q, method="lower")
+            assert r[key] == pytest.approx(exact, rel=ALPHA)
+
+
+@pytest.mark.parametrize("bucket", ["hour", "day"])
+def test_rollup_summary_matches_raw(
+    client, engine, add_prediction, monkeypatch, bucket
+):
+    monkeypatch.setattr(persistence._settings, "rollups_enabled", True)
+    _write(engine, add_prediction.model_id)
+    raw = _summary(client, monkeypatch, False, bucket=bucket)
+    rollup = _summary(client, monkeypatch, True, bucket=bucket)
+    if bucket == "hour":
+        groups = [values for _, values in DATA]
+    else:
+        groups = [DATA[0][1] + DATA[1][1], DATA[2][1]]
+    _assert_matches(rollup, raw, groups)
+
+
+def test_rebuild_rollups_backfills_and_drops_deleted(
+    client, engine, add_prediction, monkeypatch
+):
+    # Gravadas sem rollup: o rebuild faz o backfill
+    _write(engine, add_prediction.model_id)
+    with Session(engine) as session:
+        count = select(func.count()).select_from(MetricRollup)
+        assert session.execute(count).scalar() == 0
+    result = CliRunner().invoke(
+        manage.cli, ["rebuild-rollups", "--chunk-rows", "120"]
+    )
+    assert result.exit_code == 0, result.output
+    assert "550 métricas" in result.output
+    raw = _summary(client, monkeypatch, False)
+    _assert_matches(_summary(client, monkeypatch, True), raw, [v for _, v in DATA])
+
+    # Rollup guarda o que foi apagado até o próximo rebuild
+    pred_id = client.get("/predictions?limit=1").get_json()[0]["id"]
+    client.delete("/records/predictions/%s" % pred_id)
+    before = {s["bucket"]: s["count"] for s in _summary(client, monkeypatch, True)}
+    assert sum(before.values()) == 550
+    result = CliRunner().invoke(
+        manage.cli, ["rebuild-rollups", "--model-id", str(add_prediction.model_id)]
+    )
+    assert result.exit_code == 0, result.output
+    after = _summary(client, monkeypatch, True)
+    assert sum(s["count"] for s in after) == 549
+    assert [s["count"] for s in after] == [
+        s["count"] for s in _summary(client, monkeypatch, False)
+    ]
@@ -0,0 +1,80 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.orm import Session
+
+from app.models import PredictionMetric
+from app.snapshot import WATERMARK_FILE, export_parquet, read_watermark
+
+pq = pytest.importorskip("pyarrow.parquet")
+
+T0 = datetime(2026, 1, 1, 12, 0, 0)
+
+
+@pytest.fixture
+def add(engine, add_prediction):
+    """Predição com features livres e, opcionalmente, um error_abs."""
+    n = iter(range(1000))
+
+    def add(features, error=None):
+        i = next(n)
+        created_at = T0 + timedelta(minutes=i)
+        pred_id = add_prediction(created_at=created_at, features=features)
+        if error is not None:
+            with Session(engine) as session:
+                session.add(
+                    PredictionMetric(
+                        prediction_id=pred_id, name="error_abs", value=error
+                    )
+                )
+                session.commit()
+        return pred_id
+
+    return add
+
+
+def _read(root):
+    return pq.read_table(str(root)).sort_by("created_at").to_pylist()
+
+
+def test_chunks_with_different_shapes_share_one_schema(engine, add, tmp_path):
+    add({"a": 1, "b": 2})
+    add({"a": 2, "b": 3})
+    # Segundo bloco: "a" vira texto, "b" some, "c" aparece, e surge uma métrica
+    add({"a": "x", "c": 3}, error=0.5)
+    add({"a": 4, "c": 4}, error=1.5)
+    total = export_parquet(engine, str(tmp_path), chunk_rows=2, settle_seconds=0)
+    assert total == 4
+
+    rows = _read(tmp_path)
+    assert [r["feature_a"] for r in rows] == [1.0, 2.0, None, 4.0]
+    assert [r["feature_b"] for r in rows] == [2.0, 3.0, None, None]
+    assert "feature_c" not in rows[0]
+    assert [r["features_extra"] for r in rows] == [
+        None,
+        None,
+        json.dumps({"a": "x", "c": 3}, separators=(",", ":")),
+        json.dumps({"c": 4}, separators=(",", ":")),
+    ]
+    assert [r["metric_error_abs"] for r in rows] == [None, None, 0.5, 1.5]
+    # Métrica fora de METRIC_NAMES (a "v" do fixture) não vira coluna
+    assert "metric_v" not in rows[0]
+    assert read_watermark(str(tmp_path))["features"] == {
+        "a": "float64",
+        "b": "float64",
+    }
+
+
+def test_incremental_run_reuses_the_persisted_schema(engine, add, tmp_path):
+    add({"a": "x"})
+    assert export_parquet(engine, str(tmp_path), settle_seconds=0) == 1
+    last = add({"a": 5, "z": 1})
+    assert export_parquet(engine, str(tmp_path), settle_seconds=0) == 1
+
+    rows = _read(tmp_path)
+    assert [r["feature_a"] for r in rows] == ["x", "5.0"]
+    assert rows[1]["features_extra"] == '{"z":1}'
+    watermark = json.loads((tmp_path / WATERMARK_FILE).read_text())
+    assert watermark["id"] == last
+    assert watermark["features"] == {"a": "string"}